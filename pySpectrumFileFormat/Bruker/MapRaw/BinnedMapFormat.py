@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.BinnedMapFormat
+   :synopsis: Lazy spatial and spectral binned view of a raw map.
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Lazy spatial and spectral binned view of a raw map.
+
+The binned map is computed from the memory map of the raw map when a query needs it: the reductions stream blocks of
+binned rows sized to the memory budget, and a spectrum only bins the source rows of its binned row. The recently used
+binned rows are kept in a cache bounded in bytes. The pixels and channels left over by the binning are dropped.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import logging
+import copy
+from collections import OrderedDict
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.StripeReducers as StripeReducers
+
+# Globals and constants variables.
+
+class BinnedMapFormat(object):
+    def __init__(self, mapRaw, spatial=1, spectral=1, cacheSize_B=None):
+        """
+        Binned view of mapRaw, the binned rows returned by :py:meth:`getSpectrum` are cached up to cacheSize_B bytes,
+        the memory budget of mapRaw if None.
+        """
+        if spatial < 1 or spectral < 1:
+            raise ValueError("Binning factors must be positive: %s, %s" % (spatial, spectral))
+
+        self._mapRaw = mapRaw
+        self.spatial = int(spatial)
+        self.spectral = int(spectral)
+        if cacheSize_B is None:
+            cacheSize_B = mapRaw.memoryBudget_B
+        self.cacheSize_B = cacheSize_B
+
+        sourceParameters = mapRaw.getParameters()
+        self._accumulatorType = mapRaw._getAccumulatorType()
+
+        self._parameters = copy.deepcopy(sourceParameters)
+        self._parameters.width = sourceParameters.width // self.spatial
+        self._parameters.height = sourceParameters.height // self.spatial
+        self._parameters.depth = sourceParameters.depth // self.spectral
+        self._parameters.dataLength_B = np.dtype(self._accumulatorType).itemsize
+        if sourceParameters.pixel_size_nm is not None:
+            self._parameters.pixel_size_nm = sourceParameters.pixel_size_nm*self.spatial
+
+        self._cache = OrderedDict()
+        self._cache_B = 0
+
+        logging.info("Binned map: %i x %i x %i", self._parameters.width, self._parameters.height,
+                     self._parameters.depth)
+
+    def getParameters(self):
+        return self._parameters
+
+    def getSpectrum(self, pixelX, pixelY):
+        spectrum = self._getRow(pixelY)[pixelX, :]
+
+        channels = np.arange(0, self._parameters.depth)
+
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
+    def getDataCube(self):
+        shape = (self._parameters.height, self._parameters.width, self._parameters.depth)
+        datacube = np.zeros(shape, dtype=self._accumulatorType)
+
+        for rowStart, block in self._iterBlocks():
+            datacube[rowStart:rowStart + len(block)] = block
+
+        channels = np.arange(0, self._parameters.depth)
+
+        return channels, datacube
+
+    def getROISpectrum(self, pixelXmin, pixelXmax, pixelYmin, pixelYmax):
+        """
+        Return the sum spectrum of the binned pixels of the inclusive rectangle, clipped to the map.
+        """
+        spectrum = np.zeros(self._parameters.depth, dtype=self._accumulatorType)
+        channels = np.arange(0, self._parameters.depth)
+
+        pixelXstart, pixelXend, pixelYstart, pixelYend = StripeReducers.clipRectangles(
+            [pixelXmin, pixelXmax, pixelYmin, pixelYmax], self._parameters.width, self._parameters.height)[0]
+        if pixelXstart == pixelXend:
+            return channels, spectrum
+
+        for _rowStart, block in self._iterBlocks(pixelYstart, pixelYend):
+            spectrum += np.sum(block[:, pixelXstart:pixelXend, :], axis=(0, 1))
+
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
+    def getROISpectra(self, rectangles):
+        """
+        Return the (rectangles, depth) spectra of the inclusive (pixelXmin, pixelXmax, pixelYmin, pixelYmax)
+        rectangles, clipped to the map.
+        """
+        rectangles = np.asarray(rectangles, dtype=np.intp).reshape(-1, 4)
+        channels = np.arange(0, self._parameters.depth)
+
+        spectra = np.zeros((len(rectangles), self._parameters.depth), dtype=self._accumulatorType)
+        for rectangleId, rectangle in enumerate(rectangles):
+            _channels, spectra[rectangleId] = self.getROISpectrum(*rectangle)
+
+        return channels, spectra
+
+    def getSumSpectrum(self):
+        return self.getTotalSpectrum()
+
+    def getTotalSpectrum(self):
+        spectrum = np.zeros(self._parameters.depth, dtype=self._accumulatorType)
+
+        for _rowStart, block in self._iterBlocks():
+            spectrum += np.sum(block, axis=(0, 1))
+
+        channels = np.arange(0, self._parameters.depth)
+
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
+    def getTotalIntensityImage(self):
+        return self.getRoiIntensityImage((0, self._parameters.depth))
+
+    def getRoiIntensityImage(self, channelRange):
+        return self.getRoiIntensityImages([channelRange])[0]
+
+    def getRoiIntensityImages(self, channelRanges):
+        """
+        Return the (ranges, height, width) intensity images of the [channel_min, channel_max) ranges in one pass.
+        """
+        channelStarts, channelStops = StripeReducers.getChannelBounds(channelRanges, self._parameters.depth)
+
+        return StripeReducers.reduceRoiIntensityImages(self._mapStripes, channelStarts, channelStops,
+                                                       self._parameters.height, self._parameters.width,
+                                                       self._accumulatorType)
+
+    def getMaximumPixelSpectrum(self):
+        spectrum = None
+
+        for _rowStart, block in self._iterBlocks():
+            blockSpectrum = np.amax(block, axis=(0, 1))
+            if spectrum is None:
+                spectrum = blockSpectrum
+            else:
+                np.maximum(spectrum, blockSpectrum, out=spectrum)
+
+        channels = np.arange(0, self._parameters.depth)
+
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
+    def getMaximumPixelSpectrumPixels(self):
+        """
+        Return the (x, y) binned pixel of the maximum of each channel as a (depth, 2) array.
+        """
+        _spectrum, flatPixels = StripeReducers.reduceMaximumPixels(self._mapStripes, self._parameters.width,
+                                                                   self._parameters.depth)
+
+        return StripeReducers.getPixelsFromFlatIndices(flatPixels, self._parameters.width)
+
+    def getMaximumPixelSpectrum2(self):
+        channels = np.arange(0, self._parameters.depth)
+        spectrum, _flatPixels = StripeReducers.reduceMaximumPixels(self._mapStripes, self._parameters.width,
+                                                                   self._parameters.depth)
+
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
+    def scan(self):
+        """
+        Compute the total spectrum, total intensity image, maximum pixel spectrum and its pixels, and the per-channel
+        minimum, mean and variance of the binned map in one pass.
+        """
+        return StripeReducers.scan(self._mapStripes, self._parameters.height, self._parameters.width,
+                                   self._parameters.depth, self._accumulatorType)
+
+    def _mapStripes(self, function, rowStart=0, rowEnd=None, itemSize_B=None):
+        """
+        Apply function on each block of binned rows and yield (rowStart, rowEnd, result).
+
+        Use itemSize_B to size the blocks on the working type of function instead of the accumulator type.
+        """
+        for blockStart, block in self._iterBlocks(rowStart, rowEnd, itemSize_B):
+            yield blockStart, blockStart + len(block), function(block)
+
+    def _getBlockNumberRows(self, itemSize_B=None):
+        """
+        Return the number of binned rows of a block, sized on the binned values of the accumulator type or itemSize_B
+        to fit in the memory budget.
+        """
+        if itemSize_B is None:
+            itemSize_B = np.dtype(self._accumulatorType).itemsize
+
+        # Sized on the binned row, spatial^2*spectral times fewer values than its source rows.
+        row_B = self._parameters.width*self._parameters.depth*itemSize_B
+        numberRows = int(self._mapRaw.memoryBudget_B // max(1, row_B))
+
+        return max(1, numberRows)
+
+    def _iterBlocks(self, rowStart=0, rowEnd=None, itemSize_B=None):
+        """
+        Yield (rowStart, block) of the blocks of binned rows [rowStart, rowEnd) sized by :py:meth:`_getBlockNumberRows`.
+        """
+        if rowEnd is None:
+            rowEnd = self._parameters.height
+        rowEnd = min(rowEnd, self._parameters.height)
+
+        blockNumberRows = self._getBlockNumberRows(itemSize_B)
+        for blockStart in range(rowStart, rowEnd, blockNumberRows):
+            yield blockStart, self._binRows(blockStart, min(blockStart + blockNumberRows, rowEnd))
+
+    def _getRow(self, pixelY):
+        """
+        Return the (width, depth) binned row pixelY, binned from its source rows only and cached.
+        """
+        if pixelY in self._cache:
+            self._cache.move_to_end(pixelY)
+            return self._cache[pixelY]
+
+        row = self._binRows(pixelY, pixelY + 1)[0]
+
+        self._cache[pixelY] = row
+        self._cache_B += row.nbytes
+        while self._cache_B > self.cacheSize_B and len(self._cache) > 1:
+            _pixelY, removedRow = self._cache.popitem(last=False)
+            self._cache_B -= removedRow.nbytes
+
+        return row
+
+    def _binRows(self, rowStart, rowEnd):
+        width = self._parameters.width
+        depth = self._parameters.depth
+        logging.debug("Binning rows: %i-%i", rowStart, rowEnd)
+
+        stripe = self._mapRaw._getStripe(rowStart*self.spatial, rowEnd*self.spatial)
+        stripe = stripe[:, :width*self.spatial, :depth*self.spectral]
+        stripe = stripe.reshape(rowEnd - rowStart, self.spatial, width, self.spatial, depth, self.spectral)
+
+        return np.sum(stripe, axis=(1, 3, 5), dtype=self._accumulatorType)
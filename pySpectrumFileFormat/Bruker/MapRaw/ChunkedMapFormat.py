@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.ChunkedMapFormat
+   :synopsis: Chunked and compressed container for spectrum image maps.
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Chunked and compressed container for spectrum image maps.
+
+The container is a directory with the parameters of the map in a rpl file, an index of the chunks in a json file and
+one compressed npz file for each (rows, columns, depth) chunk of the map. Chunks with only zero counts are not written.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import os.path
+import logging
+import json
+import copy
+from collections import OrderedDict
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.ParametersFile as ParametersFile
+import pySpectrumFileFormat.Bruker.MapRaw.StripeReducers as StripeReducers
+
+# Globals and constants variables.
+PARAMETERS_FILENAME = "map.rpl"
+INDEX_FILENAME = "chunks.json"
+
+DEFAULT_CHUNK_SHAPE = (32, 32)
+DEFAULT_CACHE_SIZE = 16
+
+def _getChunkFilename(chunkRow, chunkColumn):
+    return "chunk_%i_%i.npz" % (chunkRow, chunkColumn)
+
+def exportChunkedMap(mapRaw, directory, chunkShape=DEFAULT_CHUNK_SHAPE):
+    """
+    Export a :py:class:`MapRawFormat` map in a chunked container, reading one row of chunks at a time.
+    """
+    logging.info("Exporting chunked map: %s", directory)
+
+    parameters = mapRaw.getParameters()
+    chunkHeight, chunkWidth = chunkShape
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    chunks = []
+    for rowStart in range(0, parameters.height, chunkHeight):
+        rowEnd = min(rowStart + chunkHeight, parameters.height)
+        stripe = np.ascontiguousarray(mapRaw._getStripe(rowStart, rowEnd))
+
+        for columnStart in range(0, parameters.width, chunkWidth):
+            chunk = stripe[:, columnStart:columnStart + chunkWidth, :]
+            if not chunk.any():
+                continue
+
+            chunkRow = rowStart // chunkHeight
+            chunkColumn = columnStart // chunkWidth
+            np.savez_compressed(os.path.join(directory, _getChunkFilename(chunkRow, chunkColumn)), data=chunk)
+            chunks.append([chunkRow, chunkColumn])
+
+    logging.info("Number of non-empty chunks: %i", len(chunks))
+
+    chunkedParameters = copy.deepcopy(parameters)
+    chunkedParameters.offset = 0
+    chunkedParameters.recordBy = ParametersFile.RECORED_BY_VECTOR
+    chunkedParameters.write(os.path.join(directory, PARAMETERS_FILENAME))
+
+    index = {"chunkShape": list(chunkShape), "dataType": mapRaw._getDataType().str, "chunks": chunks}
+    with open(os.path.join(directory, INDEX_FILENAME), 'w') as indexFile:
+        json.dump(index, indexFile)
+
+class ChunkedMapFormat(object):
+    def __init__(self, directory, cacheSize=DEFAULT_CACHE_SIZE):
+        logging.info("Chunked map: %s", directory)
+
+        self._directory = directory
+        self.cacheSize = cacheSize
+
+        self._parameters = ParametersFile.ParametersFile()
+        self._parameters.read(os.path.join(directory, PARAMETERS_FILENAME))
+
+        with open(os.path.join(directory, INDEX_FILENAME), 'r') as indexFile:
+            index = json.load(indexFile)
+
+        self._chunkShape = tuple(index["chunkShape"])
+        self._dataType = np.dtype(index["dataType"])
+        self._chunks = set(tuple(chunk) for chunk in index["chunks"])
+
+        self._cache = OrderedDict()
+
+    def getParameters(self):
+        return self._parameters
+
+    def getSpectrum(self, pixelX, pixelY):
+        """
+        Return the spectrum of the pixel, a read-only view of the cached chunk.
+        """
+        StripeReducers.checkPixel(pixelX, pixelY, self._parameters.width, self._parameters.height)
+
+        chunkHeight, chunkWidth = self._chunkShape
+        channels = np.arange(0, self._parameters.depth)
+
+        chunk = self._getChunk(pixelY // chunkHeight, pixelX // chunkWidth)
+        if chunk is None:
+            spectrum = np.zeros(self._parameters.depth, dtype=self._dataType)
+        else:
+            spectrum = chunk[pixelY % chunkHeight, pixelX % chunkWidth, :]
+
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
+    def getDataCube(self):
+        shape = (self._parameters.height, self._parameters.width, self._parameters.depth)
+        datacube = np.zeros(shape, dtype=self._dataType)
+
+        for rowStart, columnStart, chunk in self._iterChunks():
+            datacube[rowStart:rowStart + chunk.shape[0], columnStart:columnStart + chunk.shape[1], :] = chunk
+
+        channels = np.arange(0, self._parameters.depth)
+
+        return channels, datacube
+
+    def getROISpectrum(self, pixelXmin, pixelXmax, pixelYmin, pixelYmax):
+        """
+        Return the sum spectrum of the pixels of the inclusive rectangle, clipped to the map.
+        """
+        spectrum = np.zeros(self._parameters.depth, dtype=self._getAccumulatorType())
+        channels = np.arange(0, self._parameters.depth)
+
+        pixelXstart, pixelXend, pixelYstart, pixelYend = StripeReducers.clipRectangles(
+            [pixelXmin, pixelXmax, pixelYmin, pixelYmax], self._parameters.width, self._parameters.height)[0]
+        if pixelXstart == pixelXend or pixelYstart == pixelYend:
+            return channels, spectrum
+
+        for rowStart, columnStart, chunk in self._iterChunks(pixelXstart, pixelXend - 1, pixelYstart, pixelYend - 1):
+            rows = slice(max(pixelYstart - rowStart, 0), pixelYend - rowStart)
+            columns = slice(max(pixelXstart - columnStart, 0), pixelXend - columnStart)
+            spectrum += np.sum(chunk[rows, columns, :], axis=(0, 1), dtype=spectrum.dtype)
+
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
+    def getROISpectra(self, rectangles):
+        """
+        Return the (rectangles, depth) spectra of the inclusive (pixelXmin, pixelXmax, pixelYmin, pixelYmax)
+        rectangles, clipped to the map.
+        """
+        rectangles = np.asarray(rectangles, dtype=np.intp).reshape(-1, 4)
+        channels = np.arange(0, self._parameters.depth)
+
+        spectra = np.zeros((len(rectangles), self._parameters.depth), dtype=self._getAccumulatorType())
+        for rectangleId, rectangle in enumerate(rectangles):
+            _channels, spectra[rectangleId] = self.getROISpectrum(*rectangle)
+
+        return channels, spectra
+
+    def getSumSpectrum(self):
+        return self.getTotalSpectrum()
+
+    def getTotalSpectrum(self):
+        spectrum = np.zeros(self._parameters.depth, dtype=self._getAccumulatorType())
+
+        for _rowStart, _columnStart, chunk in self._iterChunks():
+            spectrum += np.sum(chunk, axis=(0, 1), dtype=spectrum.dtype)
+
+        channels = np.arange(0, self._parameters.depth)
+
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
+    def getTotalIntensityImage(self):
+        return self.getRoiIntensityImage((0, self._parameters.depth))
+
+    def getRoiIntensityImage(self, channelRange):
+        return self.getRoiIntensityImages([channelRange])[0]
+
+    def getRoiIntensityImages(self, channelRanges):
+        """
+        Return the (ranges, height, width) intensity images of the [channel_min, channel_max) ranges in one pass.
+        """
+        channelStarts, channelStops = StripeReducers.getChannelBounds(channelRanges, self._parameters.depth)
+
+        return StripeReducers.reduceRoiIntensityImages(self._mapStripes, channelStarts, channelStops,
+                                                       self._parameters.height, self._parameters.width,
+                                                       self._getAccumulatorType())
+
+    def getMaximumPixelSpectrum(self):
+        spectrum = None
+
+        for _rowStart, _columnStart, chunk in self._iterChunks():
+            chunkSpectrum = np.amax(chunk, axis=(0, 1))
+            if spectrum is None:
+                spectrum = chunkSpectrum
+            else:
+                np.maximum(spectrum, chunkSpectrum, out=spectrum)
+
+        # Chunks not written only have zero counts.
+        if spectrum is None:
+            spectrum = np.zeros(self._parameters.depth, dtype=self._dataType)
+        elif len(self._chunks) < self._getNumberChunks():
+            np.maximum(spectrum, 0, out=spectrum)
+
+        channels = np.arange(0, self._parameters.depth)
+
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
+    def getMaximumPixelSpectrumPixels(self):
+        """
+        Return the (x, y) pixel of the maximum of each channel as a (depth, 2) array.
+        """
+        _spectrum, flatPixels = StripeReducers.reduceMaximumPixels(self._mapStripes, self._parameters.width,
+                                                                   self._parameters.depth)
+
+        return StripeReducers.getPixelsFromFlatIndices(flatPixels, self._parameters.width)
+
+    def getMaximumPixelSpectrum2(self):
+        channels = np.arange(0, self._parameters.depth)
+        spectrum, _flatPixels = StripeReducers.reduceMaximumPixels(self._mapStripes, self._parameters.width,
+                                                                   self._parameters.depth)
+
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
+    def scan(self):
+        """
+        Compute the total spectrum, total intensity image, maximum pixel spectrum and its pixels, and the per-channel
+        minimum, mean and variance in one pass over the map.
+        """
+        return StripeReducers.scan(self._mapStripes, self._parameters.height, self._parameters.width,
+                                   self._parameters.depth, self._getAccumulatorType())
+
+    def _getAccumulatorType(self):
+        if self._dataType.kind == 'u':
+            return np.uint64
+        elif self._dataType.kind == 'i':
+            return np.int64
+        else:
+            return np.float64
+
+    def _getNumberChunks(self):
+        chunkHeight, chunkWidth = self._chunkShape
+        numberChunkRows = -(-self._parameters.height // chunkHeight)
+        numberChunkColumns = -(-self._parameters.width // chunkWidth)
+
+        return numberChunkRows*numberChunkColumns
+
+    def _iterChunks(self, pixelXmin=0, pixelXmax=None, pixelYmin=0, pixelYmax=None):
+        """
+        Yield (rowStart, columnStart, chunk) of the non-empty chunks overlapping the inclusive pixel rectangle.
+        """
+        if pixelXmax is None:
+            pixelXmax = self._parameters.width - 1
+        if pixelYmax is None:
+            pixelYmax = self._parameters.height - 1
+
+        chunkHeight, chunkWidth = self._chunkShape
+        for chunkRow in range(pixelYmin // chunkHeight, pixelYmax // chunkHeight + 1):
+            for chunkColumn in range(pixelXmin // chunkWidth, pixelXmax // chunkWidth + 1):
+                chunk = self._getChunk(chunkRow, chunkColumn)
+                if chunk is not None:
+                    yield chunkRow*chunkHeight, chunkColumn*chunkWidth, chunk
+
+    def _mapStripes(self, function, rowStart=0, rowEnd=None, itemSize_B=None):
+        """
+        Apply function on each (rows, width, depth) stripe of one row of chunks, with zeros for the chunks not
+        written, and yield (rowStart, rowEnd, result).
+
+        The stripes are always one row of chunks high, itemSize_B is only accepted for the shared reducers.
+        """
+        if rowEnd is None:
+            rowEnd = self._parameters.height
+        rowEnd = min(rowEnd, self._parameters.height)
+
+        chunkHeight, chunkWidth = self._chunkShape
+        width = self._parameters.width
+        for chunkRow in range(rowStart // chunkHeight, -(-rowEnd // chunkHeight)):
+            stripeStart = max(rowStart, chunkRow*chunkHeight)
+            stripeEnd = min(rowEnd, (chunkRow + 1)*chunkHeight)
+
+            stripe = np.zeros((stripeEnd - stripeStart, width, self._parameters.depth), dtype=self._dataType)
+            for columnStart in range(0, width, chunkWidth):
+                chunk = self._getChunk(chunkRow, columnStart // chunkWidth)
+                if chunk is not None:
+                    rows = slice(stripeStart - chunkRow*chunkHeight, stripeEnd - chunkRow*chunkHeight)
+                    stripe[:, columnStart:columnStart + chunk.shape[1], :] = chunk[rows]
+
+            yield stripeStart, stripeEnd, function(stripe)
+
+    def _getChunk(self, chunkRow, chunkColumn):
+        key = (chunkRow, chunkColumn)
+        if key not in self._chunks:
+            return None
+
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        chunkFilepath = os.path.join(self._directory, _getChunkFilename(chunkRow, chunkColumn))
+        logging.debug("Decompressing chunk: %s", chunkFilepath)
+        with np.load(chunkFilepath) as chunkFile:
+            chunk = chunkFile["data"]
+        # The spectra returned are views of the cached chunk.
+        chunk.flags.writeable = False
+
+        self._cache[key] = chunk
+        while len(self._cache) > self.cacheSize:
+            self._cache.popitem(last=False)
+
+        return chunk
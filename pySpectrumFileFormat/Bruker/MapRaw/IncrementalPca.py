@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.IncrementalPca
+   :synopsis: Out-of-core principal component analysis of raw map spectra.
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Out-of-core principal component analysis of raw map spectra.
+
+The pixel spectra are read by row stripes of the memory map of the raw map. The mean spectrum and the (depth, depth)
+scatter matrix of each stripe are merged into the running ones, so the peak memory is set by the memory budget of the
+map and the number of channels, not by the number of pixels. With the Poisson weighting, the spectra are scaled by
+the square root of the normalized total intensity image and total spectrum before the analysis.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import logging
+import copy
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.ParametersFile as ParametersFile
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawWriter as MapRawWriter
+
+# Globals and constants variables.
+DEFAULT_NUMBER_COMPONENTS = 8
+
+class IncrementalPca(object):
+    def __init__(self, mapRaw, numberComponents=DEFAULT_NUMBER_COMPONENTS, poissonWeighting=False):
+        depth = mapRaw.getParameters().depth
+        if numberComponents < 1 or numberComponents > depth:
+            raise ValueError("Number of components must be between 1 and %i: %s" % (depth, numberComponents))
+
+        self._mapRaw = mapRaw
+        self.numberComponents = int(numberComponents)
+        self.poissonWeighting = poissonWeighting
+
+        self._imageWeights = None
+        self._spectrumWeights = None
+
+        self.numberPixels = 0
+        self.meanSpectrum = None
+        self.components = None
+        self.explainedVariance = None
+
+    def fit(self):
+        """
+        Compute the principal components of the pixel spectra in one pass, or two with the Poisson weighting.
+        """
+        parameters = self._mapRaw.getParameters()
+        depth = parameters.depth
+
+        if self.poissonWeighting:
+            self._computePoissonWeights()
+
+        numberPixels = 0
+        meanSpectrum = np.zeros(depth, dtype=np.float64)
+        scatter = np.zeros((depth, depth), dtype=np.float64)
+
+        def reduceStripe(rowStart, rowEnd, stripe):
+            spectra = self._getWeightedSpectra(rowStart, rowEnd, stripe)
+            stripeMean = np.mean(spectra, axis=0)
+            spectra -= stripeMean
+            return len(spectra), stripeMean, np.dot(spectra.T, spectra)
+
+        # Merge the mean spectra and scatter matrices of the stripes (Chan et al.).
+        for _rowStart, _rowEnd, (stripeNumberPixels, stripeMean, stripeScatter) in \
+                self._mapRaw._mapRowStripes(reduceStripe, itemSize_B=np.dtype(np.float64).itemsize):
+            total = numberPixels + stripeNumberPixels
+            delta = stripeMean - meanSpectrum
+            scatter += stripeScatter
+            scatter += np.outer(delta, delta)*(numberPixels*stripeNumberPixels/float(total))
+            meanSpectrum += delta*(stripeNumberPixels/float(total))
+            numberPixels = total
+
+        covariance = scatter/max(1, numberPixels - 1)
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        order = np.argsort(eigenvalues)[::-1][:self.numberComponents]
+
+        components = eigenvectors[:, order].T
+        # Fix the sign of each component for reproducible results.
+        signs = np.sign(components[np.arange(len(components)), np.argmax(np.abs(components), axis=1)])
+        signs[signs == 0] = 1
+        components *= signs[:, np.newaxis]
+
+        self.numberPixels = numberPixels
+        self.meanSpectrum = meanSpectrum
+        self.components = components
+        self.explainedVariance = np.maximum(eigenvalues[order], 0.0)
+
+        logging.info("PCA of %i pixels: explained variance %s", numberPixels, self.explainedVariance)
+
+        return self
+
+    def getExplainedVarianceRatio(self):
+        self._checkFitted()
+
+        totalVariance = np.sum(self.explainedVariance)
+        if totalVariance == 0.0:
+            return np.zeros_like(self.explainedVariance)
+
+        return self.explainedVariance/totalVariance
+
+    def getScoreImages(self):
+        """
+        Return the (components, height, width) score images of the pixel spectra.
+        """
+        self._checkFitted()
+
+        parameters = self._mapRaw.getParameters()
+        images = np.zeros((self.numberComponents, parameters.height, parameters.width), dtype=np.float64)
+
+        def reduceStripe(rowStart, rowEnd, stripe):
+            spectra = self._getWeightedSpectra(rowStart, rowEnd, stripe)
+            spectra -= self.meanSpectrum
+            return np.dot(spectra, self.components.T)
+
+        for rowStart, rowEnd, scores in \
+                self._mapRaw._mapRowStripes(reduceStripe, itemSize_B=np.dtype(np.float64).itemsize):
+            images[:, rowStart:rowEnd, :] = scores.T.reshape(self.numberComponents, rowEnd - rowStart, -1)
+
+        return images
+
+    def reconstruct(self, outputRawFilepath, dataType=np.float32):
+        """
+        Write the map reconstructed from the principal components to a new record-by-vector raw/rpl pair, one row
+        stripe at a time.
+        """
+        self._checkFitted()
+
+        parameters = self._mapRaw.getParameters()
+        width = parameters.width
+        depth = parameters.depth
+        dataType = np.dtype(dataType)
+
+        outputParameters = copy.deepcopy(parameters)
+        outputParameters.recordBy = ParametersFile.RECORED_BY_VECTOR
+        MapRawWriter.setParametersDataType(outputParameters, dataType)
+
+        logging.info("Writing PCA reconstruction with %i components: %s", self.numberComponents, outputRawFilepath)
+
+        projection = np.dot(self.components.T, self.components)
+
+        def reduceStripe(rowStart, rowEnd, stripe):
+            spectra = self._getWeightedSpectra(rowStart, rowEnd, stripe)
+            spectra -= self.meanSpectrum
+            spectra = np.dot(spectra, projection)
+            spectra += self.meanSpectrum
+            if self.poissonWeighting:
+                spectra *= self._imageWeights[rowStart*width:rowEnd*width, np.newaxis]
+                spectra *= self._spectrumWeights
+
+            if dataType.kind in 'ui':
+                spectra = np.rint(spectra)
+                information = np.iinfo(dataType)
+                np.clip(spectra, information.min, information.max, out=spectra)
+
+            return spectra.reshape(rowEnd - rowStart, width, depth)
+
+        with MapRawWriter.MapRawWriter(outputRawFilepath, outputParameters) as writer:
+            for rowStart, _rowEnd, rows in \
+                    self._mapRaw._mapRowStripes(reduceStripe, itemSize_B=np.dtype(np.float64).itemsize):
+                writer.writeRows(rowStart, rows)
+
+    def _computePoissonWeights(self):
+        image = self._mapRaw.getTotalIntensityImage().astype(np.float64)
+        _channels, spectrum = self._mapRaw.getTotalSpectrum()
+        spectrum = spectrum.astype(np.float64)
+
+        imageMean = np.mean(image)
+        spectrumMean = np.mean(spectrum)
+        if imageMean > 0.0:
+            image /= imageMean
+        if spectrumMean > 0.0:
+            spectrum /= spectrumMean
+
+        # Pixels or channels without counts are left unscaled.
+        self._imageWeights = np.sqrt(image).ravel()
+        self._imageWeights[self._imageWeights == 0.0] = 1.0
+        self._spectrumWeights = np.sqrt(spectrum)
+        self._spectrumWeights[self._spectrumWeights == 0.0] = 1.0
+
+    def _getWeightedSpectra(self, rowStart, rowEnd, stripe):
+        """
+        Return a float64 copy of the (pixels, depth) spectra of the stripe, divided by the Poisson weights if used.
+        """
+        depth = self._mapRaw.getParameters().depth
+        spectra = np.array(stripe, dtype=np.float64, order='C').reshape(-1, depth)
+
+        if self.poissonWeighting:
+            width = self._mapRaw.getParameters().width
+            spectra /= self._imageWeights[rowStart*width:rowEnd*width, np.newaxis]
+            spectra /= self._spectrumWeights
+
+        return spectra
+
+    def _checkFitted(self):
+        if self.components is None:
+            raise RuntimeError("Call fit() before using the principal components.")
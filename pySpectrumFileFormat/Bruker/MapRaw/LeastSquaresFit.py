@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.LeastSquaresFit
+   :synopsis: Linear least squares fit of reference spectra to all the pixels of a raw map.
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Linear least squares fit of reference spectra to all the pixels of a raw map.
+
+The pixel spectra are fitted by row stripes of the memory map of the raw map with matrix products between the
+(pixels, depth) spectra of the stripe and the (references, depth) reference spectra. The ordinary solution of a pixel
+without negative coefficient is also its non-negative solution, the non-negative least squares are only solved with
+:py:func:`scipy.optimize.nnls` for the other pixels.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import logging
+
+# Third party modules.
+import numpy as np
+import scipy.optimize
+
+# Local modules.
+
+# Project modules.
+
+# Globals and constants variables.
+
+class LeastSquaresFit(object):
+    def __init__(self, mapRaw, references, maximumIterations=None):
+        """
+        The maximumIterations of the non-negative solver defaults to the one of :py:func:`scipy.optimize.nnls`.
+        """
+        depth = mapRaw.getParameters().depth
+        references = np.atleast_2d(np.asarray(references, dtype=np.float64))
+        if references.shape[1] != depth:
+            raise ValueError("Reference spectra must have %i channels: %s" % (depth, references.shape))
+
+        self._mapRaw = mapRaw
+        self.references = references
+        self.maximumIterations = maximumIterations
+
+        self._gram = np.dot(references, references.T)
+        if np.linalg.matrix_rank(self._gram) < len(references):
+            raise ValueError("Reference spectra are linearly dependent.")
+        self._pseudoInverse = np.linalg.pinv(references)
+        self._referencesT = np.ascontiguousarray(references.T)
+
+    def fit(self, nonNegative=False):
+        """
+        Return the (references, height, width) coefficient maps and the (height, width) map of the sum of the squared
+        residuals of each pixel.
+        """
+        parameters = self._mapRaw.getParameters()
+        height = parameters.height
+        width = parameters.width
+        numberReferences = len(self.references)
+
+        coefficientMaps = np.zeros((numberReferences, height, width), dtype=np.float64)
+        residualMap = np.zeros((height, width), dtype=np.float64)
+
+        def reduceStripe(stripe):
+            spectra = np.array(stripe, dtype=np.float64, order='C').reshape(-1, parameters.depth)
+
+            coefficients = np.dot(spectra, self._pseudoInverse)
+            if nonNegative:
+                coefficients = self._fitNonNegative(spectra, coefficients)
+
+            spectra -= np.dot(coefficients, self.references)
+            residuals = np.einsum('ij,ij->i', spectra, spectra)
+
+            return coefficients, residuals
+
+        for rowStart, rowEnd, (coefficients, residuals) in \
+                self._mapRaw._mapStripes(reduceStripe, itemSize_B=np.dtype(np.float64).itemsize):
+            numberRows = rowEnd - rowStart
+            coefficientMaps[:, rowStart:rowEnd, :] = coefficients.T.reshape(numberReferences, numberRows, width)
+            residualMap[rowStart:rowEnd, :] = residuals.reshape(numberRows, width)
+
+        return coefficientMaps, residualMap
+
+    def _fitNonNegative(self, spectra, coefficients):
+        """
+        Replace the ordinary solution of the spectra with a negative coefficient by their non-negative solution.
+        """
+        infeasiblePixels = np.flatnonzero(np.any(coefficients < 0.0, axis=1))
+        logging.debug("Non-negative fit of %i of %i pixels", len(infeasiblePixels), len(spectra))
+
+        for pixelId in infeasiblePixels:
+            coefficients[pixelId], _residual = scipy.optimize.nnls(self._referencesT, spectra[pixelId],
+                                                                   maxiter=self.maximumIterations)
+
+        return coefficients
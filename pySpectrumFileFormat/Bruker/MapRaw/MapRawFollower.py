@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.MapRawFollower
+   :synopsis: Follow a raw map while it is still being acquired.
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Follow a raw map while it is still being acquired.
+
+The size of the raw file is polled and only the rows completed since the last update are mapped to update the sum
+spectrum and the total intensity image. Only the record-by-vector layout can be followed, a record-by-image file has
+no complete row before its last channel is written.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import os.path
+import logging
+import time
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.ParametersFile as ParametersFile
+
+# Globals and constants variables.
+DEFAULT_POLL_INTERVAL_s = 1.0
+
+class MapRawFollower(object):
+    """
+    Follow the rows of a record-by-vector raw map as the acquisition appends them to the raw file.
+
+    The progress is measured by the size of the raw file, so only a file that grows as its rows are written is
+    followed. A preallocated file, such as the one of :py:class:`MapRawWriter.MapRawWriter`, has its final size from
+    the start and is seen complete at once: pass the number of completed rows known to the writer to :py:meth:`update`
+    instead.
+    """
+    def __init__(self, mapRaw, pollInterval_s=DEFAULT_POLL_INTERVAL_s):
+        parameters = mapRaw.getParameters()
+        if parameters.recordBy != ParametersFile.RECORED_BY_VECTOR:
+            raise ValueError('Only a record-by-vector map can be followed: %s' % parameters.recordBy)
+
+        self._mapRaw = mapRaw
+        self._parameters = parameters
+        self.pollInterval_s = pollInterval_s
+
+        self._row_B = parameters.width*parameters.depth*parameters.dataLength_B
+        self._callbacks = []
+
+        self.numberRows = 0
+        self._sumSpectrum = np.zeros(parameters.depth, dtype=mapRaw._getAccumulatorType())
+        self._totalIntensityImage = np.zeros((parameters.height, parameters.width), dtype=self._sumSpectrum.dtype)
+
+    def __iter__(self):
+        return self.follow()
+
+    def subscribe(self, callback):
+        """
+        Call callback(follower, rowStart, rowEnd) each time new rows are completed.
+        """
+        self._callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        self._callbacks.remove(callback)
+
+    def isComplete(self):
+        return self.numberRows == self._parameters.height
+
+    def getNumberCompletedRows(self):
+        """
+        Return the number of complete rows in the raw file, processed or not.
+        """
+        rawFilepath = self._mapRaw._rawFilepath
+        if not os.path.isfile(rawFilepath):
+            return 0
+
+        size_B = os.path.getsize(rawFilepath) - self._parameters.offset
+
+        return int(min(self._parameters.height, max(0, size_B) // self._row_B))
+
+    def update(self, numberCompletedRows=None):
+        """
+        Process the rows completed since the last update and return the number of new rows.
+
+        The number of completed rows is read from the size of the raw file when numberCompletedRows is None.
+        """
+        rowStart = self.numberRows
+        if numberCompletedRows is None:
+            rowEnd = self.getNumberCompletedRows()
+        else:
+            rowEnd = min(self._parameters.height, numberCompletedRows)
+        if rowEnd <= rowStart:
+            return 0
+
+        logging.debug("New rows: %i-%i", rowStart, rowEnd)
+
+        width = self._parameters.width
+        depth = self._parameters.depth
+        numberRows = self._mapRaw._getStripeNumberRows()
+
+        for stripeStart in range(rowStart, rowEnd, numberRows):
+            stripeEnd = min(stripeStart + numberRows, rowEnd)
+            stripe = np.memmap(self._mapRaw._rawFilepath, dtype=self._mapRaw._getDataType(), mode='r',
+                               offset=self._parameters.offset + stripeStart*self._row_B,
+                               shape=(stripeEnd - stripeStart, width, depth))
+
+            self._sumSpectrum += np.sum(stripe, axis=(0, 1), dtype=self._sumSpectrum.dtype)
+            self._totalIntensityImage[stripeStart:stripeEnd] = np.sum(stripe, axis=2, dtype=self._sumSpectrum.dtype)
+
+            del stripe
+
+        self.numberRows = rowEnd
+
+        for callback in list(self._callbacks):
+            callback(self, rowStart, rowEnd)
+
+        return rowEnd - rowStart
+
+    def follow(self, timeout_s=None):
+        """
+        Yield (rowStart, rowEnd) of the new rows until the map is complete or the file did not grow for timeout_s.
+        """
+        lastUpdateTime = time.time()
+
+        while not self.isComplete():
+            rowStart = self.numberRows
+            if self.update() > 0:
+                lastUpdateTime = time.time()
+                yield rowStart, self.numberRows
+                continue
+
+            if timeout_s is not None and time.time() - lastUpdateTime >= timeout_s:
+                logging.info("Stopped following %s after %i rows", self._mapRaw._rawFilepath, self.numberRows)
+                return
+
+            time.sleep(self.pollInterval_s)
+
+    def getSumSpectrum(self):
+        """
+        Return the sum spectrum of the rows processed so far.
+        """
+        spectrum = self._sumSpectrum.copy()
+        channels = np.arange(0, self._parameters.depth)
+
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
+    def getTotalIntensityImage(self):
+        """
+        Return the total intensity image with zero for the rows not processed yet.
+        """
+        return self._totalIntensityImage.copy()
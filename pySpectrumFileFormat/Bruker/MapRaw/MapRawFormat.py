@@ -29,29 +29,63 @@ Read Oxford Instruments map in the raw format.
 # Standard library modules.
 import os.path
 import logging
+import hashlib
+import copy
+import collections
+from concurrent.futures import ThreadPoolExecutor
 
 # Third party modules.
 import matplotlib.pyplot as plt
 import numpy as np
+import scipy.sparse
 
 # Local modules.
 
 # Project modules.
 import pySpectrumFileFormat.Bruker.MapRaw.ParametersFile as ParametersFile
+import pySpectrumFileFormat.Bruker.MapRaw.BinnedMapFormat as BinnedMapFormat
+import pySpectrumFileFormat.Bruker.MapRaw.SparseMapFormat as SparseMapFormat
+import pySpectrumFileFormat.Bruker.MapRaw.SpectrumCache as SpectrumCache
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawWriter as MapRawWriter
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawFollower as MapRawFollower
+import pySpectrumFileFormat.Bruker.MapRaw.StatisticsCache as StatisticsCache
+import pySpectrumFileFormat.Bruker.MapRaw.ReadAheadReader as ReadAheadReader
+import pySpectrumFileFormat.Bruker.MapRaw.StripeReducers as StripeReducers
 
 # Globals and constants variables.
+DEFAULT_MEMORY_BUDGET_B = 256*1024*1024
+
+ROI_INDEX_EXTENSION = ".sat.npy"
+ENERGY_INDEX_EXTENSION = ".csum.npy"
+SPARSE_EXTENSION = ".csr.npz"
+SIDECAR_KEY_EXTENSION = ".key"
+
+DEFAULT_SPECTRUM_TILE_SIZE = 16
+
+MapStatistics = StripeReducers.MapStatistics
 
 class MapRawFormat(object):
-    def __init__(self, rawFilepath):
+    def __init__(self, rawFilepath, memoryBudget_B=DEFAULT_MEMORY_BUDGET_B, workers=1):
         logging.info("Raw file: %s", rawFilepath)
 
         self._rawFilepath = rawFilepath
+        self.memoryBudget_B = memoryBudget_B
+        self.workers = workers
         parametersFilepath = self._rawFilepath.replace('.raw', '.rpl')
 
         self._parameters = ParametersFile.ParametersFile()
         self._parameters.read(parametersFilepath)
 
         self._data = None
+        self._roiIndex = None
+        self._roiIndexKey = None
+        self._energyIndex = None
+        self._energyIndexKey = None
+        self._spectrumCache = None
+        self._statisticsCache = None
+        self._readAheadChunkSize_B = None
+        self._lastReadAheadReader = None
+        self._spectrumTileSize = DEFAULT_SPECTRUM_TILE_SIZE
 
         self._format = self._generateFormat(self._parameters)
 
@@ -167,6 +201,9 @@ class MapRawFormat(object):
         imageOffset = self._parameters.width*self._parameters.height
         logging.debug("File offset: %i", imageOffset)
 
+        if self._spectrumCache is not None:
+            return self._getCachedSpectrum(pixelX, pixelY)
+
         self._read_data()
 
         if self._parameters.recordBy == ParametersFile.RECORED_BY_IMAGE:
@@ -180,6 +217,99 @@ class MapRawFormat(object):
         assert len(channels) == len(spectrum)
         return channels, spectrum
 
+    def enableSpectrumCache(self, maximumSize_B=SpectrumCache.DEFAULT_CACHE_SIZE_B,
+                            tileSize=DEFAULT_SPECTRUM_TILE_SIZE):
+        """
+        Cache the spectra returned by :py:meth:`getSpectrum`, a miss reads the tileSize x tileSize pixels around the
+        requested pixel.
+        """
+        self._spectrumCache = SpectrumCache.SpectrumCache(maximumSize_B)
+        self._spectrumTileSize = tileSize
+
+    def disableSpectrumCache(self):
+        self._spectrumCache = None
+
+    def getSpectrumCache(self):
+        return self._spectrumCache
+
+    def enableStatisticsCache(self, statisticsCache=None):
+        """
+        Store the total spectrum, total intensity image and maximum pixel spectrum in a
+        :py:class:`StatisticsCache.StatisticsCache`, the default one if None, and reuse them while the raw/rpl pair
+        does not change.
+        """
+        if statisticsCache is None:
+            statisticsCache = StatisticsCache.StatisticsCache()
+
+        self._statisticsCache = statisticsCache
+
+    def disableStatisticsCache(self):
+        self._statisticsCache = None
+
+    def invalidateStatisticsCache(self):
+        if self._statisticsCache is not None:
+            self._statisticsCache.invalidate(self._rawFilepath)
+
+    def enableReadAhead(self, chunkSize_B=ReadAheadReader.DEFAULT_CHUNK_SIZE_B):
+        """
+        Read the row stripes of a record-by-vector file and the channel planes of a record-by-image file with large
+        sequential reads on a background thread instead of the memory map.
+
+        The chunks are at most chunkSize_B bytes and the memory budget, and are processed in order by one worker.
+        """
+        self._readAheadChunkSize_B = chunkSize_B
+
+    def disableReadAhead(self):
+        self._readAheadChunkSize_B = None
+
+    def getReadThroughput_MBps(self):
+        """
+        Return the throughput of the last read-ahead pass in MB/s, or None.
+        """
+        if self._lastReadAheadReader is None:
+            return None
+
+        return self._lastReadAheadReader.getThroughput_MBps()
+
+    def _getCachedStatistic(self, name, function):
+        """
+        Return the statistic name from the statistics cache if enabled, otherwise compute it with function.
+        """
+        if self._statisticsCache is None:
+            return function()
+
+        sourceKey = self._getSourceKey()
+        value = self._statisticsCache.get(self._rawFilepath, sourceKey, name)
+        if value is None:
+            value = function()
+            self._statisticsCache.put(self._rawFilepath, sourceKey, name, value)
+
+        return value
+
+    def _getCachedSpectrum(self, pixelX, pixelY):
+        channels = np.arange(0, self._parameters.depth)
+
+        spectrum = self._spectrumCache.get((pixelX, pixelY))
+        if spectrum is not None:
+            return channels, spectrum
+
+        halfTileSize = self._spectrumTileSize // 2
+        pixelXmin = max(0, pixelX - halfTileSize)
+        pixelXmax = min(self._parameters.width, pixelXmin + self._spectrumTileSize)
+        pixelYmin = max(0, pixelY - halfTileSize)
+        pixelYmax = min(self._parameters.height, pixelYmin + self._spectrumTileSize)
+        logging.debug("Reading spectrum tile: %i-%i, %i-%i", pixelXmin, pixelXmax, pixelYmin, pixelYmax)
+
+        tile = np.array(self._getStripe(pixelYmin, pixelYmax)[:, pixelXmin:pixelXmax, :])
+        for tileY, tileRow in enumerate(tile):
+            for tileX, tileSpectrum in enumerate(tileRow):
+                self._spectrumCache.put((pixelXmin + tileX, pixelYmin + tileY), tileSpectrum)
+
+        spectrum = tile[pixelY - pixelYmin, pixelX - pixelXmin]
+
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
     def getDataCube(self):
 
         self._read_data()
@@ -198,37 +328,292 @@ class MapRawFormat(object):
         return channels, datacube
 
     def getROISpectrum(self, pixelXmin, pixelXmax, pixelYmin, pixelYmax):
-        imageOffset = self._parameters.width*self._parameters.height
-        logging.debug("File offset: %i", imageOffset)
+        """
+        Return the sum spectrum of the pixels of the inclusive rectangle, clipped to the map.
+        """
+        channels = np.arange(0, self._parameters.depth)
+        bounds = StripeReducers.clipRectangles([pixelXmin, pixelXmax, pixelYmin, pixelYmax], self._parameters.width,
+                                               self._parameters.height)
 
-        self._read_data()
+        if self._getRoiIndex() is not None:
+            spectrum = self._getIndexedROISpectra(bounds)[0]
+            return channels, spectrum
 
-        if self._parameters.recordBy == ParametersFile.RECORED_BY_IMAGE:
-            spectrum = np.sum(self._data[:, pixelYmin:pixelYmax+1, pixelXmin:pixelXmax+1], axis=(1,2))
+        pixelXstart, pixelXend, pixelYstart, pixelYend = bounds[0]
+        accumulatorType = self._getAccumulatorType()
+        spectrum = np.zeros(self._parameters.depth, dtype=accumulatorType)
+        if pixelXstart == pixelXend:
+            return channels, spectrum
 
-        elif self._parameters.recordBy == ParametersFile.RECORED_BY_VECTOR:
-            spectrum = np.sum(self._data[pixelYmin:pixelYmax+1, pixelXmin:pixelXmax+1, :], axis=(0,1))
+        def reduceStripe(stripe):
+            return np.sum(stripe[:, pixelXstart:pixelXend, :], axis=(0, 1), dtype=accumulatorType)
 
-        channels = np.arange(0, self._parameters.depth)
+        for _rowStart, _rowEnd, partialSpectrum in self._mapStripes(reduceStripe, pixelYstart, pixelYend):
+            spectrum += partialSpectrum
 
         assert len(channels) == len(spectrum)
         return channels, spectrum
 
+    def getROISpectra(self, rectangles):
+        """
+        Return the (rectangles, depth) spectra of the inclusive (pixelXmin, pixelXmax, pixelYmin, pixelYmax)
+        rectangles, clipped to the map.
+        """
+        rectangles = np.asarray(rectangles, dtype=np.intp).reshape(-1, 4)
+        channels = np.arange(0, self._parameters.depth)
+
+        if self._getRoiIndex() is not None:
+            spectra = self._getIndexedROISpectra(StripeReducers.clipRectangles(rectangles, self._parameters.width,
+                                                                               self._parameters.height))
+        else:
+            spectra = np.zeros((len(rectangles), self._parameters.depth), dtype=self._getAccumulatorType())
+            for rectangleId, rectangle in enumerate(rectangles):
+                _channels, spectra[rectangleId] = self.getROISpectrum(*rectangle)
+
+        return channels, spectra
+
+    def getLabelSpectra(self, labels, numberLabels=None):
+        """
+        Return the (labels, depth) sum spectra and the pixel counts of each label of a (height, width) label image.
+
+        Pixels with a negative label are ignored.
+        """
+        labels = np.asarray(labels)
+        shape = (self._parameters.height, self._parameters.width)
+        if labels.shape != shape:
+            raise ValueError("Label image shape %s does not match the map %s" % (labels.shape, shape))
+        if not np.issubdtype(labels.dtype, np.integer):
+            raise ValueError("Label image must be integer: %s" % labels.dtype)
+
+        if numberLabels is None:
+            numberLabels = max(0, int(labels.max()) + 1) if labels.size else 0
+
+        depth = self._parameters.depth
+        accumulatorType = self._getAccumulatorType()
+        spectra = np.zeros((numberLabels, depth), dtype=accumulatorType)
+        counts = np.bincount(labels[labels >= 0].ravel(), minlength=numberLabels)[:numberLabels]
+
+        def reduceStripe(rowStart, rowEnd, stripe):
+            stripeLabels = labels[rowStart:rowEnd].ravel()
+            pixelIds = np.flatnonzero((stripeLabels >= 0) & (stripeLabels < numberLabels))
+            if len(pixelIds) == 0:
+                return None, None
+
+            # Group the pixels of each label together and sum each group at once.
+            pixelIds = pixelIds[np.argsort(stripeLabels[pixelIds], kind='stable')]
+            sortedLabels = stripeLabels[pixelIds]
+            groupStarts = np.flatnonzero(np.r_[True, sortedLabels[1:] != sortedLabels[:-1]])
+            pixels = np.asarray(stripe).reshape(-1, depth)[pixelIds]
+            return sortedLabels[groupStarts], np.add.reduceat(pixels, groupStarts, axis=0, dtype=accumulatorType)
+
+        for _rowStart, _rowEnd, (stripeLabels, stripeSpectra) in self._mapRowStripes(reduceStripe):
+            if stripeLabels is not None:
+                spectra[stripeLabels] += stripeSpectra
+
+        return spectra, counts
+
+    def buildRoiIndex(self, persist=True):
+        """
+        Build the summed-area table of the map used by the ROI spectrum methods.
+
+        The (height+1, width+1, depth) table takes 8 bytes per value, for example 34 GB for a 1024 x 1024 map of 4096
+        channels. It is saved next to the raw file and memory mapped when persist is True, otherwise it is kept in
+        memory and a ValueError is raised when it does not fit in the memory budget.
+        """
+        sourceKey = self._getSourceKey()
+        accumulatorType = self._getAccumulatorType()
+        shape = (self._parameters.height + 1, self._parameters.width + 1, self._parameters.depth)
+        itemSize_B = np.dtype(accumulatorType).itemsize
+        index_B = int(np.prod(shape))*itemSize_B
+        if not persist and index_B > self.memoryBudget_B:
+            raise ValueError("ROI index of %i bytes exceeds the memory budget of %i bytes, use persist=True" %
+                             (index_B, self.memoryBudget_B))
+
+        # The previous index may memory map the file replaced by the new one.
+        self._roiIndex = None
+        self._roiIndexKey = None
+        roiIndex = self._createIndex(ROI_INDEX_EXTENSION, shape, persist)
+
+        def reduceStripe(stripe):
+            return np.cumsum(np.cumsum(stripe, axis=1, dtype=accumulatorType), axis=0)
+
+        for rowStart, rowEnd, partialIndex in self._mapStripes(reduceStripe, itemSize_B=itemSize_B):
+            partialIndex += roiIndex[rowStart, 1:]
+            roiIndex[rowStart+1:rowEnd+1, 1:] = partialIndex
+
+        if persist:
+            roiIndex.flush()
+            del roiIndex
+            self._saveIndex(ROI_INDEX_EXTENSION, sourceKey)
+            self.loadRoiIndex()
+        else:
+            self._roiIndex = roiIndex
+            self._roiIndexKey = sourceKey
+
+    def loadRoiIndex(self):
+        """
+        Load the ROI index saved next to the raw file, return False if it is missing or does not match the map.
+        """
+        shape = (self._parameters.height + 1, self._parameters.width + 1, self._parameters.depth)
+        self._roiIndex, self._roiIndexKey = self._loadIndex(ROI_INDEX_EXTENSION, shape)
+
+        return self._roiIndex is not None
+
+    def buildEnergyIndex(self, persist=False):
+        """
+        Build the cumulative sum over the channels of the map used by :py:meth:`getRoiIntensityImage`.
+
+        The (depth+1, height, width) cumulative planes take 8 bytes per value, for example 1.1 GB for a 256 x 256
+        map of 2048 channels. They are saved next to the raw file and memory mapped when persist is True, otherwise
+        they are kept in memory and a ValueError is raised when they do not fit in the memory budget.
+        """
+        sourceKey = self._getSourceKey()
+        accumulatorType = self._getAccumulatorType()
+        shape = (self._parameters.depth + 1, self._parameters.height, self._parameters.width)
+        itemSize_B = np.dtype(accumulatorType).itemsize
+        index_B = int(np.prod(shape))*itemSize_B
+        if not persist and index_B > self.memoryBudget_B:
+            raise ValueError("Energy index of %i bytes exceeds the memory budget of %i bytes, use persist=True" %
+                             (index_B, self.memoryBudget_B))
+
+        # The previous index may memory map the file replaced by the new one.
+        self._energyIndex = None
+        self._energyIndexKey = None
+        energyIndex = self._createIndex(ENERGY_INDEX_EXTENSION, shape, persist)
+
+        def reduceStripe(stripe):
+            return np.moveaxis(np.cumsum(stripe, axis=2, dtype=accumulatorType), 2, 0)
+
+        for rowStart, rowEnd, partialIndex in self._mapStripes(reduceStripe, itemSize_B=itemSize_B):
+            energyIndex[1:, rowStart:rowEnd, :] = partialIndex
+
+        if persist:
+            energyIndex.flush()
+            del energyIndex
+            self._saveIndex(ENERGY_INDEX_EXTENSION, sourceKey)
+            self.loadEnergyIndex()
+        else:
+            self._energyIndex = energyIndex
+            self._energyIndexKey = sourceKey
+
+    def loadEnergyIndex(self):
+        """
+        Load the energy index saved next to the raw file, return False if it is missing or does not match the map.
+        """
+        shape = (self._parameters.depth + 1, self._parameters.height, self._parameters.width)
+        self._energyIndex, self._energyIndexKey = self._loadIndex(ENERGY_INDEX_EXTENSION, shape)
+
+        return self._energyIndex is not None
+
+    def checkIndex(self):
+        """
+        Drop the indexes built or loaded before the map changed, return False if any was dropped.
+
+        Each query only compares the size and modification time of the raw file with the ones of the index, this
+        method also compares the digest of the rpl file.
+        """
+        if self._roiIndex is None and self._energyIndex is None:
+            return True
+
+        sourceKey = self._getSourceKey()
+        isCurrent = True
+
+        if self._roiIndex is not None and self._roiIndexKey != sourceKey:
+            logging.warning("Map changed since the ROI index was built: %s", self._rawFilepath)
+            self._roiIndex = None
+            self._roiIndexKey = None
+            isCurrent = False
+
+        if self._energyIndex is not None and self._energyIndexKey != sourceKey:
+            logging.warning("Map changed since the energy index was built: %s", self._rawFilepath)
+            self._energyIndex = None
+            self._energyIndexKey = None
+            isCurrent = False
+
+        return isCurrent
+
+    def _getRoiIndex(self):
+        if self._roiIndex is not None and not self._isRawCurrent(self._roiIndexKey):
+            logging.warning("Map changed since the ROI index was built: %s", self._rawFilepath)
+            self._roiIndex = None
+            self._roiIndexKey = None
+
+        return self._roiIndex
+
+    def _getEnergyIndex(self):
+        if self._energyIndex is not None and not self._isRawCurrent(self._energyIndexKey):
+            logging.warning("Map changed since the energy index was built: %s", self._rawFilepath)
+            self._energyIndex = None
+            self._energyIndexKey = None
+
+        return self._energyIndex
+
+    def _createIndex(self, extension, shape, persist):
+        accumulatorType = self._getAccumulatorType()
+
+        if persist:
+            indexFilepath = self._getSidecarFilepath(extension)
+            logging.info("Building index: %s", indexFilepath)
+            return np.lib.format.open_memmap(indexFilepath + ".tmp", mode='w+', dtype=accumulatorType, shape=shape)
+        else:
+            return np.zeros(shape, dtype=accumulatorType)
+
+    def _saveIndex(self, extension, sourceKey):
+        """
+        Replace the index file by the one built, no memory map of either file must be left open.
+        """
+        indexFilepath = self._getSidecarFilepath(extension)
+
+        os.replace(indexFilepath + ".tmp", indexFilepath)
+
+        self._writeSidecarKey(indexFilepath, sourceKey)
+
+    def _loadIndex(self, extension, shape):
+        indexFilepath = self._getSidecarFilepath(extension)
+        sourceKey = self._getSourceKey()
+        if not self._isSidecarCurrent(indexFilepath, sourceKey):
+            return None, None
+
+        index = np.load(indexFilepath, mmap_mode='r')
+        if index.shape != shape:
+            logging.warning("Index with the wrong shape %s: %s", index.shape, indexFilepath)
+            return None, None
+
+        return index, sourceKey
+
+    def _getIndexedROISpectra(self, bounds):
+        pixelXmin = bounds[:, 0]
+        pixelXmax = bounds[:, 1]
+        pixelYmin = bounds[:, 2]
+        pixelYmax = bounds[:, 3]
+
+        # Differences of the positive column sums first to avoid wrapping unsigned accumulators.
+        roiIndex = self._roiIndex
+        rightColumn = roiIndex[pixelYmax, pixelXmax] - roiIndex[pixelYmin, pixelXmax]
+        leftColumn = roiIndex[pixelYmax, pixelXmin] - roiIndex[pixelYmin, pixelXmin]
+
+        return np.asarray(rightColumn - leftColumn)
+
     def getSumSpectrum(self):
         x = np.arange(0, self._parameters.depth)
-        y = np.zeros_like(x)
-
-        self._read_data()
 
         if self._parameters.recordBy == ParametersFile.RECORED_BY_IMAGE:
-            raise NotImplementedError
+            y = self._getCachedStatistic("totalSpectrum", self._computeSumSpectrumByPlanes)
 
         elif self._parameters.recordBy == ParametersFile.RECORED_BY_VECTOR:
-            y = self._data.sum(axis=(0, 1))
+            _x, y = self.getTotalSpectrum()
 
         assert len(x) == len(y)
         return x, y
 
+    def _computeSumSpectrumByPlanes(self):
+        spectrum = np.zeros(self._parameters.depth, dtype=self._getAccumulatorType())
+
+        for channelStart, planes in self._iterChannelPlanes():
+            spectrum[channelStart:channelStart + len(planes)] = np.sum(planes, axis=1, dtype=spectrum.dtype)
+
+        return spectrum
+
     def getSumSpectrumOld(self):
         numberPixels = self._parameters.width*self._parameters.height
         logging.info("Numbe rof pixels: %i", numberPixels)
@@ -243,117 +628,377 @@ class MapRawFormat(object):
         return x, ySum
 
     def getTotalIntensityImage(self):
-        self._read_data()
+        return self._getCachedStatistic("totalIntensityImage", self._computeTotalIntensityImage)
 
-        if self._parameters.recordBy == ParametersFile.RECORED_BY_IMAGE:
-            image = np.sum(self._data, axis=0)
+    def _computeTotalIntensityImage(self):
+        accumulatorType = self._getAccumulatorType()
+        image = np.zeros((self._parameters.height, self._parameters.width), dtype=accumulatorType)
 
-        elif self._parameters.recordBy == ParametersFile.RECORED_BY_VECTOR:
-            image = np.sum(self._data, axis=2)
+        def reduceStripe(stripe):
+            return np.sum(stripe, axis=2, dtype=accumulatorType)
+
+        for rowStart, rowEnd, partialImage in self._mapStripes(reduceStripe):
+            image[rowStart:rowEnd] = partialImage
 
         return image
 
     def getRoiIntensityImage(self, channelRange):
-        channel_min, channel_max = channelRange
+        return self.getRoiIntensityImages([channelRange])[0]
 
-        self._read_data()
+    def getRoiIntensityImages(self, channelRanges):
+        """
+        Return the (ranges, height, width) intensity images of the [channel_min, channel_max) ranges in one pass.
+        """
+        channelStarts, channelStops = StripeReducers.getChannelBounds(channelRanges, self._parameters.depth)
 
-        if self._parameters.recordBy == ParametersFile.RECORED_BY_IMAGE:
-            image = np.sum(self._data[channel_min:channel_max, ...], axis=0)
+        energyIndex = self._getEnergyIndex()
+        if energyIndex is not None:
+            return energyIndex[channelStops] - energyIndex[channelStarts]
 
-        elif self._parameters.recordBy == ParametersFile.RECORED_BY_VECTOR:
-            image = np.sum(self._data[...,channel_min:channel_max], axis=2)
-
-        return image
+        return StripeReducers.reduceRoiIntensityImages(self._mapStripes, channelStarts, channelStops,
+                                                       self._parameters.height, self._parameters.width,
+                                                       self._getAccumulatorType())
 
     def getMaximumPixelSpectrum(self):
-        self._read_data()
+        spectrum = self._getCachedStatistic("maximumPixelSpectrum", self._computeMaximumPixelSpectrum)
+        channels = np.arange(0, self._parameters.depth)
 
-        if self._parameters.recordBy == ParametersFile.RECORED_BY_IMAGE:
-            spectrum = np.amax(self._data, axis=(1,2))
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
 
-        elif self._parameters.recordBy == ParametersFile.RECORED_BY_VECTOR:
-            spectrum = np.amax(self._data, axis=(0,1))
+    def _computeMaximumPixelSpectrum(self):
+        spectrum = None
+
+        def reduceStripe(stripe):
+            return np.amax(stripe, axis=(0, 1))
+
+        for _rowStart, _rowEnd, partialSpectrum in self._mapStripes(reduceStripe):
+            if spectrum is None:
+                spectrum = partialSpectrum
+            else:
+                np.maximum(spectrum, partialSpectrum, out=spectrum)
+
+        return spectrum
 
+    def getMaximumPixelSpectrumPixels(self):
+        """
+        Return the (x, y) pixel of the maximum of each channel as a (depth, 2) array.
+        """
+        _spectrum, flatPixels = StripeReducers.reduceMaximumPixels(self._mapStripes, self._parameters.width,
+                                                                   self._parameters.depth)
+
+        return StripeReducers.getPixelsFromFlatIndices(flatPixels, self._parameters.width)
+
+    def getMaximumPixelSpectrum2(self):
         channels = np.arange(0, self._parameters.depth)
+        spectrum, _flatPixels = StripeReducers.reduceMaximumPixels(self._mapStripes, self._parameters.width,
+                                                                   self._parameters.depth)
 
         assert len(channels) == len(spectrum)
         return channels, spectrum
 
-    def getMaximumPixelSpectrumPixels(self):
-        self._read_data()
-        flat_pixels = np.zeros(self._parameters.depth)
+    def getTotalSpectrum(self):
+        spectrum = self._getCachedStatistic("totalSpectrum", self._computeTotalSpectrum)
+        channels = np.arange(0, self._parameters.depth)
 
-        if self._parameters.recordBy == ParametersFile.RECORED_BY_IMAGE:
-            flat_pixels = np.argmax(self._data, axis=0)
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
+    def _computeTotalSpectrum(self):
+        accumulatorType = self._getAccumulatorType()
+        spectrum = np.zeros(self._parameters.depth, dtype=accumulatorType)
+
+        def reduceStripe(stripe):
+            return np.sum(stripe, axis=(0, 1), dtype=accumulatorType)
 
+        for _rowStart, _rowEnd, partialSpectrum in self._mapStripes(reduceStripe):
+            spectrum += partialSpectrum
+
+        return spectrum
+
+    def scan(self):
+        """
+        Compute the total spectrum, total intensity image, maximum pixel spectrum and its pixels, and the per-channel
+        minimum, mean and variance in one pass over the map.
+        """
+        return StripeReducers.scan(self._mapStripes, self._parameters.height, self._parameters.width,
+                                   self._parameters.depth, self._getAccumulatorType())
+
+    def convertRecordBy(self, outputRawFilepath):
+        """
+        Write the map in the other record-by layout to a new raw/rpl pair, one row stripe at a time.
+        """
+        outputParameters = copy.deepcopy(self._parameters)
+        if self._parameters.recordBy == ParametersFile.RECORED_BY_IMAGE:
+            outputParameters.recordBy = ParametersFile.RECORED_BY_VECTOR
         elif self._parameters.recordBy == ParametersFile.RECORED_BY_VECTOR:
-            for channel in np.arange(0, self._parameters.depth):
-                flat_pixels[channel] = np.argmax(self._data[:,:,channel])
+            outputParameters.recordBy = ParametersFile.RECORED_BY_IMAGE
+        else:
+            raise ValueError('Unknown "record-by" layout: %s' % self._parameters.recordBy)
+
+        logging.info("Converting %s to record-by %s: %s", self._rawFilepath, outputParameters.recordBy,
+                     outputRawFilepath)
+
+        with MapRawWriter.MapRawWriter(outputRawFilepath, outputParameters) as writer:
+            for rowStart, rowEnd in self._iterRowStripes():
+                writer.writeRows(rowStart, self._getStripe(rowStart, rowEnd))
+
+    def binned(self, spatial=1, spectral=1):
+        """
+        Return a lazy :py:class:`BinnedMapFormat.BinnedMapFormat` view of the map with spatial x spatial pixels and
+        spectral channels summed together.
+        """
+        return BinnedMapFormat.BinnedMapFormat(self, spatial, spectral)
+
+    def follow(self, pollInterval_s=MapRawFollower.DEFAULT_POLL_INTERVAL_s):
+        """
+        Return a :py:class:`MapRawFollower.MapRawFollower` updating the sum spectrum and total intensity image as the
+        rows of a raw file still being acquired are completed.
+        """
+        return MapRawFollower.MapRawFollower(self, pollInterval_s)
+
+    def getSparseMap(self, persist=False):
+        """
+        Return the map as a :py:class:`SparseMapFormat.SparseMapFormat`.
+
+        The sparse matrix is loaded from the file saved next to the raw file when it matches the map, otherwise it is
+        built in one pass and saved when persist is True.
+        """
+        sourceKey = self._getSourceKey()
+        accumulatorType = self._getAccumulatorType()
+        sparseFilepath = self._getSidecarFilepath(SPARSE_EXTENSION)
+
+        if self._isSidecarCurrent(sparseFilepath, sourceKey):
+            logging.info("Loading sparse map: %s", sparseFilepath)
+            matrix = scipy.sparse.load_npz(sparseFilepath)
+            return SparseMapFormat.SparseMapFormat(self._parameters, matrix, accumulatorType)
+
+        depth = self._parameters.depth
+
+        def reduceStripe(stripe):
+            return scipy.sparse.csr_matrix(np.asarray(stripe).reshape(-1, depth))
+
+        matrices = [partialMatrix for _rowStart, _rowEnd, partialMatrix in self._mapStripes(reduceStripe)]
+        matrix = scipy.sparse.vstack(matrices, format='csr')
+
+        if persist:
+            temporaryFilepath = sparseFilepath + ".tmp.npz"
+            scipy.sparse.save_npz(temporaryFilepath, matrix)
+            os.replace(temporaryFilepath, sparseFilepath)
+            self._writeSidecarKey(sparseFilepath, sourceKey)
+
+        return SparseMapFormat.SparseMapFormat(self._parameters, matrix, accumulatorType)
 
+    def getParameters(self):
+        return self._parameters
 
-        pixels = []
-        for pixel in flat_pixels:
-            j = int(pixel/self._parameters.width)
-            i = int(pixel % self._parameters.width)
-            pixels.append((i, j))
+    def _getSidecarFilepath(self, extension):
+        return os.path.splitext(self._rawFilepath)[0] + extension
 
-        return pixels
+    def _getSourceKey(self):
+        """
+        Key identifying the content of the raw/rpl pair: size and modification time of the raw file and digest of
+        the rpl file.
+        """
+        parametersFilepath = self._rawFilepath.replace('.raw', '.rpl')
+        with open(parametersFilepath, 'rb') as parametersFile:
+            parametersDigest = hashlib.sha1(parametersFile.read()).hexdigest()
 
-    def getMaximumPixelSpectrum2(self):
+        return "%s:%s" % (self._getRawKey(), parametersDigest)
+
+    def _getRawKey(self):
+        """
+        Size and modification time part of the key of :py:meth:`_getSourceKey`, cheap enough for each query.
+        """
+        rawStat = os.stat(self._rawFilepath)
+
+        return "%i:%i" % (rawStat.st_size, rawStat.st_mtime_ns)
+
+    def _isRawCurrent(self, sourceKey):
+        return sourceKey.rsplit(':', 1)[0] == self._getRawKey()
+
+    def _writeSidecarKey(self, sidecarFilepath, sourceKey):
+        with open(sidecarFilepath + SIDECAR_KEY_EXTENSION, 'w') as keyFile:
+            keyFile.write(sourceKey)
+
+    def _isSidecarCurrent(self, sidecarFilepath, sourceKey):
+        keyFilepath = sidecarFilepath + SIDECAR_KEY_EXTENSION
+        if not os.path.isfile(sidecarFilepath) or not os.path.isfile(keyFilepath):
+            return False
+
+        with open(keyFilepath, 'r') as keyFile:
+            sidecarKey = keyFile.read().strip()
+
+        if sidecarKey != sourceKey:
+            logging.info("Sidecar does not match the map: %s", sidecarFilepath)
+            return False
+
+        return True
+
+    def _getAccumulatorType(self):
+        if self._parameters.dataType == ParametersFile.DATA_TYPE_UNSIGNED:
+            return np.uint64
+        elif self._parameters.dataType == ParametersFile.DATA_TYPE_SIGNED:
+            return np.int64
+        else:
+            return np.float64
+
+    def _getStripeNumberRows(self, itemSize_B=None):
+        if itemSize_B is None:
+            itemSize_B = self._parameters.dataLength_B
+
+        # The stripes processed concurrently by the workers share the memory budget.
+        row_B = self._parameters.width*self._parameters.depth*itemSize_B*max(1, self.workers)
+        numberRows = int(self.memoryBudget_B // row_B)
+
+        return max(1, numberRows)
+
+    def _iterRowStripes(self, rowStart=0, rowEnd=None, itemSize_B=None):
+        if rowEnd is None:
+            rowEnd = self._parameters.height
+        rowEnd = min(rowEnd, self._parameters.height)
+
+        numberRows = self._getStripeNumberRows(itemSize_B)
+        if self.workers > 1:
+            numberRows = min(numberRows, max(1, -(-(rowEnd - rowStart) // self.workers)))
+
+        for stripeStart in range(rowStart, rowEnd, numberRows):
+            yield stripeStart, min(stripeStart + numberRows, rowEnd)
+
+    def _getStripe(self, rowStart, rowEnd):
+        """
+        Return a (rows, width, depth) view of the rows [rowStart, rowEnd) whatever the record-by layout.
+        """
         self._read_data()
-        channels = np.arange(0, self._parameters.depth)
-        spectrum = np.zeros_like(channels)
 
         if self._parameters.recordBy == ParametersFile.RECORED_BY_IMAGE:
-            spectrum = np.amax(self._data, axis=(1,2))
+            stripe = np.moveaxis(self._data[:, rowStart:rowEnd, :], 0, 2)
 
         elif self._parameters.recordBy == ParametersFile.RECORED_BY_VECTOR:
-            for channel in channels:
-                spectrum[channel] = np.amax(self._data[:,:,channel])
+            stripe = self._data[rowStart:rowEnd, :, :]
 
-        assert len(channels) == len(spectrum)
-        return channels, spectrum
+        return stripe
+
+    def _mapStripes(self, function, rowStart=0, rowEnd=None, itemSize_B=None):
+        """
+        Apply function on each row stripe sized to the memory budget and yield (rowStart, rowEnd, result).
+
+        Use itemSize_B to size the stripes on the working type of function instead of the data type.
+        The stripes are spread over a thread pool when more than one worker is requested, the results are still
+        yielded in row order.
+        """
+        def reduceStripe(stripeStart, stripeEnd, stripe):
+            return function(stripe)
+
+        return self._mapRowStripes(reduceStripe, rowStart, rowEnd, itemSize_B)
+
+    def _mapRowStripes(self, function, rowStart=0, rowEnd=None, itemSize_B=None):
+        """
+        Same as :py:meth:`_mapStripes` with function called as function(rowStart, rowEnd, stripe).
+        """
+        if self._readAheadChunkSize_B is not None and self._parameters.recordBy == ParametersFile.RECORED_BY_VECTOR:
+            for stripeStart, stripeEnd, stripe in self._iterReadAheadStripes(rowStart, rowEnd, itemSize_B):
+                yield stripeStart, stripeEnd, function(stripeStart, stripeEnd, stripe)
+            return
 
-    def getTotalSpectrum(self):
         self._read_data()
+        stripes = list(self._iterRowStripes(rowStart, rowEnd, itemSize_B))
+
+        def reduceStripe(rows):
+            stripeStart, stripeEnd = rows
+            logging.debug("Stripe rows: %i-%i", stripeStart, stripeEnd)
+            return function(stripeStart, stripeEnd, self._getStripe(stripeStart, stripeEnd))
+
+        if self.workers > 1 and len(stripes) > 1:
+            # At most one stripe per worker is in flight so the results stay within the memory budget.
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = collections.deque()
+                for rows in stripes:
+                    if len(futures) == self.workers:
+                        (stripeStart, stripeEnd), future = futures.popleft()
+                        yield stripeStart, stripeEnd, future.result()
+                    futures.append((rows, executor.submit(reduceStripe, rows)))
+
+                while futures:
+                    (stripeStart, stripeEnd), future = futures.popleft()
+                    yield stripeStart, stripeEnd, future.result()
+        else:
+            for stripeStart, stripeEnd in stripes:
+                yield stripeStart, stripeEnd, reduceStripe((stripeStart, stripeEnd))
+
+    def _iterReadAheadStripes(self, rowStart=0, rowEnd=None, itemSize_B=None):
+        """
+        Yield (rowStart, rowEnd, stripe) of a record-by-vector file read by a
+        :py:class:`ReadAheadReader.ReadAheadReader`, the stripe is only valid until the next one is requested.
+        """
+        if rowEnd is None:
+            rowEnd = self._parameters.height
+        rowEnd = min(rowEnd, self._parameters.height)
+        if rowEnd <= rowStart:
+            return
+
+        width = self._parameters.width
+        depth = self._parameters.depth
+        row_B = width*depth*self._parameters.dataLength_B
+        numberRows = max(1, min(self._readAheadChunkSize_B // row_B, self._getStripeNumberRows(itemSize_B)))
+
+        reader = ReadAheadReader.ReadAheadReader(self._rawFilepath, self._parameters.offset + rowStart*row_B,
+                                                 (rowEnd - rowStart)*row_B, numberRows*row_B)
+        self._lastReadAheadReader = reader
+        dataType = self._getDataType()
+
+        stripeStart = rowStart
+        for chunk in reader:
+            stripe = chunk.view(dataType).reshape(-1, width, depth)
+            stripeEnd = stripeStart + len(stripe)
+            logging.debug("Read-ahead stripe rows: %i-%i", stripeStart, stripeEnd)
+
+            yield stripeStart, stripeEnd, stripe
+            stripeStart = stripeEnd
+
+    def _iterChannelPlanes(self):
+        """
+        Yield (channelStart, planes) for a record-by-image file, reading the (channels, height*width) planes in file
+        order into one reused buffer bounded by the memory budget.
+        """
+        numberPixels = self._parameters.width*self._parameters.height
+        depth = self._parameters.depth
+        plane_B = numberPixels*self._parameters.dataLength_B
+        numberPlanes = int(min(depth, max(1, self.memoryBudget_B // plane_B)))
 
-        if self._parameters.recordBy == ParametersFile.RECORED_BY_IMAGE:
-            spectrum = np.sum(self._data, axis=(1,2))
+        if self._readAheadChunkSize_B is not None:
+            numberPlanes = int(max(1, min(numberPlanes, self._readAheadChunkSize_B // plane_B)))
+            reader = ReadAheadReader.ReadAheadReader(self._rawFilepath, self._parameters.offset, depth*plane_B,
+                                                     numberPlanes*plane_B)
+            self._lastReadAheadReader = reader
 
-        elif self._parameters.recordBy == ParametersFile.RECORED_BY_VECTOR:
-            spectrum = np.sum(self._data, axis=(0,1))
+            channelStart = 0
+            for chunk in reader:
+                planes = chunk.view(self._getDataType()).reshape(-1, numberPixels)
+                yield channelStart, planes
+                channelStart += len(planes)
+            return
 
-        channels = np.arange(0, self._parameters.depth)
+        buffer = np.empty((numberPlanes, numberPixels), dtype=self._getDataType())
 
-        assert len(channels) == len(spectrum)
-        return channels, spectrum
+        with open(self._rawFilepath, 'rb') as rawFile:
+            rawFile.seek(self._parameters.offset)
 
-    def getParameters(self):
-        return self._parameters
+            for channelStart in range(0, depth, numberPlanes):
+                planes = buffer[:min(numberPlanes, depth - channelStart)]
+                numberBytes = rawFile.readinto(planes)
+                if numberBytes != planes.nbytes:
+                    raise IOError("Unexpected end of file at channel %i: %s" % (channelStart, self._rawFilepath))
+
+                yield channelStart, planes
+
+    def _getDataType(self):
+        return ParametersFile.getDataType(self._parameters)
 
     def _read_data(self):
         mmap_mode = 'c'
         if self._data is None:
-            if self._parameters.dataType == 'signed':
-                data_type = 'int'
-            elif self._parameters.dataType == 'unsigned':
-                data_type = 'uint'
-            elif self._parameters.dataType == 'float':
-                pass
-            else:
-                raise TypeError('Unknown "data-type" string.')
-
-            if self._parameters.byteOrder == 'big-endian':
-                endian = '>'
-            elif self._parameters.byteOrder == 'little-endian':
-                endian = '<'
-            else:
-                endian = '='
-
-            data_type = data_type + str(int(self._parameters.dataLength_B) * 8)
-            data_type = np.dtype(data_type)
-            data_type = data_type.newbyteorder(endian)
+            data_type = self._getDataType()
 
             self._data = np.memmap(self._rawFilepath, offset=self._parameters.offset, dtype=data_type, mode=mmap_mode)
 
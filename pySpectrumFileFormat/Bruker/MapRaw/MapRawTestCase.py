@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.MapRawTestCase
+   :synopsis: Shared fixtures for the tests of the map formats.
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Shared fixtures for the tests of the map formats.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import unittest
+import tempfile
+import shutil
+import os.path
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.ParametersFile as ParametersFile
+
+# Globals and constants variables.
+RECORD_BYS = [ParametersFile.RECORED_BY_VECTOR, ParametersFile.RECORED_BY_IMAGE]
+
+def createMapRawFile(rawFilepath, datacube, recordBy):
+    """
+    Write a (height, width, depth) datacube as a raw/rpl pair using the record-by layout.
+    """
+    height, width, depth = datacube.shape
+
+    parameters = ParametersFile.ParametersFile()
+    parameters.width = width
+    parameters.height = height
+    parameters.depth = depth
+    parameters.offset = 0
+    parameters.dataLength_B = datacube.dtype.itemsize
+    if datacube.dtype.kind == 'u':
+        parameters.dataType = ParametersFile.DATA_TYPE_UNSIGNED
+    elif datacube.dtype.kind == 'f':
+        parameters.dataType = ParametersFile.DATA_TYPE_FLOAT
+    else:
+        parameters.dataType = ParametersFile.DATA_TYPE_SIGNED
+    parameters.byteOrder = ParametersFile.BYTE_ORDER_LITTLE_ENDIAN
+    parameters.recordBy = recordBy
+    parameters.energy_keV = 20.0
+    parameters.pixel_size_nm = 10.0
+    parameters.write(rawFilepath.replace('.raw', '.rpl'))
+
+    if recordBy == ParametersFile.RECORED_BY_IMAGE:
+        datacube = np.moveaxis(datacube, 2, 0)
+    np.ascontiguousarray(datacube).astype(datacube.dtype.newbyteorder('<')).tofile(rawFilepath)
+
+class MapRawTestCase(unittest.TestCase):
+    """
+    Base TestCase writing the datacube of :py:meth:`createDatacube` as one raw/rpl pair per record-by layout in a
+    temporary directory.
+    """
+
+    def setUp(self):
+        """
+        Setup method.
+        """
+
+        unittest.TestCase.setUp(self)
+
+        self.path = tempfile.mkdtemp()
+
+        self.datacube = self.createDatacube(np.random.RandomState(12345))
+
+        self.rawFilepaths = {}
+        for recordBy in RECORD_BYS:
+            rawFilepath = os.path.join(self.path, "map_%s.raw" % recordBy)
+            createMapRawFile(rawFilepath, self.datacube, recordBy)
+            self.rawFilepaths[recordBy] = rawFilepath
+
+    def tearDown(self):
+        """
+        Teardown method.
+        """
+
+        unittest.TestCase.tearDown(self)
+
+        shutil.rmtree(self.path)
+
+    def createDatacube(self, randomState):
+        """
+        Return the (height, width, depth) datacube of the maps, override to test other counts.
+        """
+        return randomState.randint(0, 50, size=(9, 7, 11)).astype(np.uint16)
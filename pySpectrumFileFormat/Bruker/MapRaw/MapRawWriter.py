@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.MapRawWriter
+   :synopsis: Streaming writer of raw/rpl spectrum image maps.
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Streaming writer of raw/rpl spectrum image maps.
+
+The raw file is preallocated as a writable memory map and the pixel spectra, rows or tiles are written in it as they
+come, in either record-by layout. The rpl file is only written when the writer is closed, so a map with a rpl file
+is complete. A writer used as a context manager discards the partial raw file when its block raises.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import os
+import logging
+import copy
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.ParametersFile as ParametersFile
+
+# Globals and constants variables.
+DEFAULT_FLUSH_INTERVAL_B = 64*1024*1024
+
+def setParametersDataType(parameters, dataType):
+    """
+    Set the data type, data length and byte order of the parameters from a numpy data type.
+    """
+    dataType = np.dtype(dataType)
+
+    if dataType.kind == 'u':
+        parameters.dataType = ParametersFile.DATA_TYPE_UNSIGNED
+    elif dataType.kind == 'i':
+        parameters.dataType = ParametersFile.DATA_TYPE_SIGNED
+    elif dataType.kind == 'f':
+        parameters.dataType = ParametersFile.DATA_TYPE_FLOAT
+    else:
+        raise TypeError("Unsupported data type: %s" % dataType)
+
+    parameters.dataLength_B = dataType.itemsize
+    parameters.byteOrder = ParametersFile.BYTE_ORDER_LITTLE_ENDIAN
+
+class MapRawWriter(object):
+    def __init__(self, rawFilepath, parameters, flushInterval_B=DEFAULT_FLUSH_INTERVAL_B):
+        """
+        Preallocate the raw file of a map with the width, height, depth, data type and record-by layout of the
+        parameters. The data are written little-endian without offset.
+        """
+        logging.info("Writing raw file: %s", rawFilepath)
+
+        self._rawFilepath = rawFilepath
+        self.flushInterval_B = flushInterval_B
+
+        self._parameters = copy.deepcopy(parameters)
+        self._parameters.offset = 0
+        self._parameters.byteOrder = ParametersFile.BYTE_ORDER_LITTLE_ENDIAN
+
+        height = self._parameters.height
+        width = self._parameters.width
+        depth = self._parameters.depth
+        if self._parameters.recordBy == ParametersFile.RECORED_BY_VECTOR:
+            shape = (height, width, depth)
+        elif self._parameters.recordBy == ParametersFile.RECORED_BY_IMAGE:
+            shape = (depth, height, width)
+        else:
+            raise ValueError('Unknown "record-by" layout: %s' % self._parameters.recordBy)
+
+        self._data = np.memmap(rawFilepath, dtype=ParametersFile.getDataType(self._parameters), mode='w+', shape=shape)
+        self._rawFile = open(rawFilepath, 'r+b')
+
+        self._unflushed_B = 0
+        self.written_B = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        if exceptionType is None:
+            self.close()
+        else:
+            self.discard()
+
+    def getParameters(self):
+        return self._parameters
+
+    def isClosed(self):
+        return self._data is None
+
+    def writeSpectrum(self, pixelX, pixelY, spectrum):
+        self._checkOpen()
+
+        if self._parameters.recordBy == ParametersFile.RECORED_BY_VECTOR:
+            self._data[pixelY, pixelX, :] = spectrum
+        else:
+            self._data[:, pixelY, pixelX] = spectrum
+
+        self._addWritten(self._parameters.depth)
+
+    def writeRows(self, rowStart, rows):
+        """
+        Write the (rows, width, depth) spectra starting at the row rowStart.
+        """
+        self._checkOpen()
+
+        rows = np.asarray(rows)
+        rowEnd = rowStart + len(rows)
+
+        if self._parameters.recordBy == ParametersFile.RECORED_BY_VECTOR:
+            self._data[rowStart:rowEnd, :, :] = rows
+        else:
+            self._data[:, rowStart:rowEnd, :] = np.moveaxis(rows, 2, 0)
+
+        self._addWritten(rows.size)
+
+    def writeTile(self, pixelX, pixelY, tile):
+        """
+        Write the (rows, columns, depth) spectra with the top left pixel at (pixelX, pixelY).
+        """
+        self._checkOpen()
+
+        tile = np.asarray(tile)
+        pixelXmax = pixelX + tile.shape[1]
+        pixelYmax = pixelY + tile.shape[0]
+
+        if self._parameters.recordBy == ParametersFile.RECORED_BY_VECTOR:
+            self._data[pixelY:pixelYmax, pixelX:pixelXmax, :] = tile
+        else:
+            self._data[:, pixelY:pixelYmax, pixelX:pixelXmax] = np.moveaxis(tile, 2, 0)
+
+        self._addWritten(tile.size)
+
+    def flush(self):
+        """
+        Flush the memory map and force the raw file to disk.
+        """
+        self._checkOpen()
+
+        self._data.flush()
+        os.fsync(self._rawFile.fileno())
+        self._unflushed_B = 0
+
+    def close(self):
+        """
+        Flush the raw file and write the rpl file next to it.
+        """
+        if self.isClosed():
+            return
+
+        self.flush()
+
+        self._data = None
+        self._rawFile.close()
+        self._rawFile = None
+
+        parametersFilepath = self._rawFilepath.replace('.raw', '.rpl')
+        temporaryFilepath = parametersFilepath + ".tmp"
+        self._parameters.write(temporaryFilepath)
+        os.replace(temporaryFilepath, parametersFilepath)
+
+        logging.info("Raw file written: %i bytes", self.written_B)
+
+    def discard(self):
+        """
+        Close the writer without writing the rpl file and remove the partial raw file.
+        """
+        if self.isClosed():
+            return
+
+        logging.warning("Discarding partial raw file: %s", self._rawFilepath)
+
+        self._data = None
+        self._rawFile.close()
+        self._rawFile = None
+
+        if os.path.isfile(self._rawFilepath):
+            os.remove(self._rawFilepath)
+
+    def _addWritten(self, numberValues):
+        numberBytes = numberValues*self._parameters.dataLength_B
+        self.written_B += numberBytes
+        self._unflushed_B += numberBytes
+
+        if self.flushInterval_B is not None and self._unflushed_B >= self.flushInterval_B:
+            self.flush()
+
+    def _checkOpen(self):
+        if self.isClosed():
+            raise ValueError("Writer is closed: %s" % self._rawFilepath)
@@ -30,6 +30,7 @@ Parameters of the raw map file.
 import logging
 
 # Third party modules.
+import numpy as np
 
 # Local modules.
 
@@ -38,6 +39,7 @@ import logging
 # Globals and constants variables.
 DATA_TYPE_UNSIGNED = "unsigned"
 DATA_TYPE_SIGNED = "signed"
+DATA_TYPE_FLOAT = "float"
 
 BYTE_ORDER_DONT_CARE = "dont-care"
 BYTE_ORDER_LITTLE_ENDIAN = "little-endian"
@@ -56,6 +58,32 @@ KEY_RECORED_BY = "record-by"
 KEY_ENERGY_keV = "E0_kV"
 KEY_PIXEL_SIZE_nm = "px_size_nm"
 
+def getDataType(parameters):
+    """
+    Return the numpy data type of the values of the raw file described by the parameters.
+    """
+    if parameters.dataType == DATA_TYPE_SIGNED:
+        data_type = 'int'
+    elif parameters.dataType == DATA_TYPE_UNSIGNED:
+        data_type = 'uint'
+    elif parameters.dataType == DATA_TYPE_FLOAT:
+        data_type = 'float'
+    else:
+        raise TypeError('Unknown "data-type" string.')
+
+    if parameters.byteOrder == 'big-endian':
+        endian = '>'
+    elif parameters.byteOrder == BYTE_ORDER_LITTLE_ENDIAN:
+        endian = '<'
+    else:
+        endian = '='
+
+    data_type = data_type + str(int(parameters.dataLength_B) * 8)
+    data_type = np.dtype(data_type)
+    data_type = data_type.newbyteorder(endian)
+
+    return data_type
+
 class ParametersFile(object):
     def __init__(self):
         self._parameters = {}
@@ -96,6 +124,9 @@ class ParametersFile(object):
             lines = []
             keywords = self._getKeywords()
             for keyword in keywords:
+                if self._parameters[keyword] is None:
+                    continue
+
                 line = "%12s \t %s\n" % (keyword, self._parameters[keyword])
                 lines.append(line)
 
@@ -140,6 +171,8 @@ class ParametersFile(object):
             return DATA_TYPE_UNSIGNED
         elif valueStr == DATA_TYPE_SIGNED:
             return DATA_TYPE_SIGNED
+        elif valueStr == DATA_TYPE_FLOAT:
+            return DATA_TYPE_FLOAT
 
     def _extractByteOrder(self, valueStr):
         valueStr = valueStr.strip().lower()
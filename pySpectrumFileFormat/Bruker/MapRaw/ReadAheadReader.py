@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.ReadAheadReader
+   :synopsis: Double-buffered sequential reader of large files.
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Double-buffered sequential reader of large files.
+
+A background thread reads the next chunk of the file in one of two reused buffers while the previous chunk is
+processed. Large sequential reads are much faster than the page faults of a memory map on network shares.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import logging
+import threading
+import time
+import queue
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+
+# Globals and constants variables.
+DEFAULT_CHUNK_SIZE_B = 16*1024*1024
+
+class ReadAheadReader(object):
+    def __init__(self, filepath, offset=0, length_B=None, chunkSize_B=DEFAULT_CHUNK_SIZE_B):
+        """
+        Read length_B bytes, or up to the end of the file if None, starting at offset by chunks of chunkSize_B bytes.
+        """
+        if chunkSize_B < 1:
+            raise ValueError("Chunk size must be positive: %s" % chunkSize_B)
+
+        self.filepath = filepath
+        self.offset = offset
+        self.length_B = length_B
+        self.chunkSize_B = int(chunkSize_B)
+
+        self.read_B = 0
+        self.readTime_s = 0.0
+        self.elapsedTime_s = 0.0
+
+    def __iter__(self):
+        """
+        Yield each chunk as a uint8 array, valid only until the next chunk is requested.
+        """
+        buffers = [np.empty(self.chunkSize_B, dtype=np.uint8) for _index in range(2)]
+        freeBuffers = queue.Queue()
+        for buffer in buffers:
+            freeBuffers.put(buffer)
+        filledBuffers = queue.Queue()
+        stopEvent = threading.Event()
+
+        thread = threading.Thread(target=self._readChunks, args=(freeBuffers, filledBuffers, stopEvent))
+        thread.daemon = True
+
+        self.read_B = 0
+        self.readTime_s = 0.0
+        startTime = time.time()
+        thread.start()
+
+        try:
+            while True:
+                buffer, numberBytes, error = filledBuffers.get()
+                if error is not None:
+                    raise error
+                if buffer is None:
+                    break
+
+                yield buffer[:numberBytes]
+                freeBuffers.put(buffer)
+        finally:
+            stopEvent.set()
+            freeBuffers.put(None)
+            thread.join()
+
+            self.elapsedTime_s = time.time() - startTime
+            logging.info("Read %i bytes from %s at %.1f MB/s", self.read_B, self.filepath, self.getThroughput_MBps())
+
+    def getThroughput_MBps(self):
+        """
+        Return the throughput of the last iteration, including the processing of the chunks, in MB/s.
+        """
+        if self.elapsedTime_s <= 0.0:
+            return 0.0
+
+        return self.read_B/self.elapsedTime_s/1.0e6
+
+    def getReadThroughput_MBps(self):
+        """
+        Return the throughput of the reads alone of the last iteration in MB/s.
+        """
+        if self.readTime_s <= 0.0:
+            return 0.0
+
+        return self.read_B/self.readTime_s/1.0e6
+
+    def _readChunks(self, freeBuffers, filledBuffers, stopEvent):
+        try:
+            with open(self.filepath, 'rb') as inputFile:
+                inputFile.seek(self.offset)
+                remaining_B = self.length_B
+
+                while remaining_B is None or remaining_B > 0:
+                    buffer = freeBuffers.get()
+                    if buffer is None or stopEvent.is_set():
+                        return
+
+                    size_B = self.chunkSize_B if remaining_B is None else min(self.chunkSize_B, remaining_B)
+                    readStartTime = time.time()
+                    numberBytes = inputFile.readinto(memoryview(buffer)[:size_B])
+                    self.readTime_s += time.time() - readStartTime
+
+                    if numberBytes == 0 and remaining_B is None:
+                        break
+                    if numberBytes != size_B and remaining_B is not None:
+                        raise IOError("Unexpected end of file at byte %i: %s" %
+                                      (self.offset + self.read_B + numberBytes, self.filepath))
+
+                    self.read_B += numberBytes
+                    if remaining_B is not None:
+                        remaining_B -= numberBytes
+                    filledBuffers.put((buffer, numberBytes, None))
+
+            filledBuffers.put((None, 0, None))
+        except (IOError, OSError) as error:
+            filledBuffers.put((None, 0, error))
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.SparseMapFormat
+   :synopsis: Sparse representation of a raw map.
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Sparse representation of a raw map.
+
+The map is stored as a compressed sparse row matrix with one row per pixel, in row-major pixel order, and one column
+per channel. Use :py:meth:`MapRawFormat.MapRawFormat.getSparseMap` to create it.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import logging
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.StripeReducers as StripeReducers
+
+# Globals and constants variables.
+
+class SparseMapFormat(object):
+    def __init__(self, parameters, matrix, accumulatorType):
+        self._parameters = parameters
+        self._matrix = matrix.tocsr()
+        self._accumulatorType = accumulatorType
+
+        logging.info("Sparse map: %i non-zero values, density %.4f", self._matrix.nnz, self.getDensity())
+
+    def getParameters(self):
+        return self._parameters
+
+    def getMatrix(self):
+        return self._matrix
+
+    def getDensity(self):
+        numberValues = self._parameters.width*self._parameters.height*self._parameters.depth
+        return self._matrix.nnz/float(numberValues)
+
+    def getSpectrum(self, pixelX, pixelY):
+        StripeReducers.checkPixel(pixelX, pixelY, self._parameters.width, self._parameters.height)
+
+        pixelId = pixelY*self._parameters.width + pixelX
+        valueStart = self._matrix.indptr[pixelId]
+        valueEnd = self._matrix.indptr[pixelId + 1]
+
+        spectrum = np.zeros(self._parameters.depth, dtype=self._matrix.dtype)
+        spectrum[self._matrix.indices[valueStart:valueEnd]] = self._matrix.data[valueStart:valueEnd]
+
+        channels = np.arange(0, self._parameters.depth)
+
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
+    def getROISpectrum(self, pixelXmin, pixelXmax, pixelYmin, pixelYmax):
+        """
+        Return the sum spectrum of the pixels of the inclusive rectangle, clipped to the map.
+        """
+        width = self._parameters.width
+        pixelXstart, pixelXend, pixelYstart, pixelYend = StripeReducers.clipRectangles(
+            [pixelXmin, pixelXmax, pixelYmin, pixelYmax], width, self._parameters.height)[0]
+
+        channels = np.arange(0, self._parameters.depth)
+        if pixelXstart == pixelXend or pixelYstart == pixelYend:
+            return channels, np.zeros(self._parameters.depth, dtype=self._accumulatorType)
+
+        rows = np.arange(pixelYstart, pixelYend)[:, np.newaxis]*width
+        pixelIds = (rows + np.arange(pixelXstart, pixelXend)).ravel()
+
+        spectrum = self._sumValues(self._matrix[pixelIds], axis=0)
+
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
+    def getROISpectra(self, rectangles):
+        """
+        Return the (rectangles, depth) spectra of the inclusive (pixelXmin, pixelXmax, pixelYmin, pixelYmax)
+        rectangles, clipped to the map.
+        """
+        rectangles = np.asarray(rectangles, dtype=np.intp).reshape(-1, 4)
+        channels = np.arange(0, self._parameters.depth)
+
+        spectra = np.zeros((len(rectangles), self._parameters.depth), dtype=self._accumulatorType)
+        for rectangleId, rectangle in enumerate(rectangles):
+            _channels, spectra[rectangleId] = self.getROISpectrum(*rectangle)
+
+        return channels, spectra
+
+    def getSumSpectrum(self):
+        return self.getTotalSpectrum()
+
+    def getTotalSpectrum(self):
+        spectrum = self._sumValues(self._matrix, axis=0)
+
+        channels = np.arange(0, self._parameters.depth)
+
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
+    def getTotalIntensityImage(self):
+        image = self._sumValues(self._matrix, axis=1)
+
+        return image.reshape(self._parameters.height, self._parameters.width)
+
+    def getRoiIntensityImage(self, channelRange):
+        channel_min, channel_max = channelRange
+
+        image = self._sumValues(self._matrix[:, channel_min:channel_max], axis=1)
+
+        return image.reshape(self._parameters.height, self._parameters.width)
+
+    def _sumValues(self, matrix, axis):
+        values = matrix.sum(axis=axis, dtype=self._accumulatorType)
+
+        return np.asarray(values).ravel()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.SpectrumCache
+   :synopsis: Least recently used cache of pixel spectra.
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Least recently used cache of pixel spectra bounded by the size in bytes of the cached spectra.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import logging
+from collections import OrderedDict
+
+# Third party modules.
+
+# Local modules.
+
+# Project modules.
+
+# Globals and constants variables.
+DEFAULT_CACHE_SIZE_B = 64*1024*1024
+
+class SpectrumCache(object):
+    def __init__(self, maximumSize_B=DEFAULT_CACHE_SIZE_B):
+        self.maximumSize_B = maximumSize_B
+
+        self._spectra = OrderedDict()
+        self.size_B = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._spectra)
+
+    def __contains__(self, pixel):
+        return pixel in self._spectra
+
+    def get(self, pixel):
+        """
+        Return the cached spectrum of the (x, y) pixel or None, and count the hit or miss.
+        """
+        spectrum = self._spectra.get(pixel)
+
+        if spectrum is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._spectra.move_to_end(pixel)
+
+        return spectrum
+
+    def put(self, pixel, spectrum):
+        if pixel in self._spectra:
+            self.size_B -= self._spectra.pop(pixel).nbytes
+
+        spectrum = spectrum.copy()
+        spectrum.flags.writeable = False
+
+        self._spectra[pixel] = spectrum
+        self.size_B += spectrum.nbytes
+
+        while self.size_B > self.maximumSize_B and self._spectra:
+            _pixel, evictedSpectrum = self._spectra.popitem(last=False)
+            self.size_B -= evictedSpectrum.nbytes
+
+    def clear(self):
+        logging.debug("Spectrum cache cleared: %i hits, %i misses", self.hits, self.misses)
+
+        self._spectra.clear()
+        self.size_B = 0
+        self.hits = 0
+        self.misses = 0
+
+    def getHitRatio(self):
+        numberRequests = self.hits + self.misses
+        if numberRequests == 0:
+            return 0.0
+
+        return self.hits/float(numberRequests)
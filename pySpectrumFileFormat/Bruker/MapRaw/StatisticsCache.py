@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.StatisticsCache
+   :synopsis: Persistent cache of the derived statistics of raw maps.
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Persistent cache of the derived statistics of raw maps.
+
+The statistics of each raw file are stored in one compressed npz file of a global cache directory, named after the
+path of the raw file. The entry also stores the key of the raw/rpl pair (size, modification time and rpl digest) and
+is discarded when the key does not match anymore. The least recently used entries are removed when the cache
+directory is larger than its maximum size.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import os
+import logging
+import hashlib
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+
+# Globals and constants variables.
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "pySpectrumFileFormat", "MapRaw")
+DEFAULT_CACHE_SIZE_B = 256*1024*1024
+
+ENTRY_EXTENSION = ".npz"
+KEY_SOURCE_KEY = "__sourceKey__"
+KEY_RAW_FILEPATH = "__rawFilepath__"
+
+class StatisticsCache(object):
+    def __init__(self, directory=DEFAULT_CACHE_DIRECTORY, maximumSize_B=DEFAULT_CACHE_SIZE_B):
+        self.directory = directory
+        self.maximumSize_B = maximumSize_B
+
+    def get(self, rawFilepath, sourceKey, name):
+        """
+        Return the cached statistic name of the raw file or None if it is missing or the raw/rpl pair changed.
+        """
+        statistics = self._readEntry(rawFilepath, sourceKey)
+        if name not in statistics:
+            return None
+
+        # Keep the recently used entries when the cache is pruned, another process may have removed it meanwhile.
+        try:
+            os.utime(self._getEntryFilepath(rawFilepath))
+        except OSError:
+            logging.debug("Cached statistics removed while read: %s", rawFilepath)
+
+        return statistics[name]
+
+    def put(self, rawFilepath, sourceKey, name, value):
+        statistics = self._readEntry(rawFilepath, sourceKey)
+        statistics[name] = np.asarray(value)
+        statistics[KEY_SOURCE_KEY] = np.array(sourceKey)
+        statistics[KEY_RAW_FILEPATH] = np.array(os.path.abspath(rawFilepath))
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        entryFilepath = self._getEntryFilepath(rawFilepath)
+        temporaryFilepath = "%s.%i.tmp" % (entryFilepath, os.getpid())
+        with open(temporaryFilepath, 'wb') as entryFile:
+            np.savez_compressed(entryFile, **statistics)
+        os.replace(temporaryFilepath, entryFilepath)
+
+        self._prune(entryFilepath)
+
+    def invalidate(self, rawFilepath):
+        entryFilepath = self._getEntryFilepath(rawFilepath)
+        if os.path.isfile(entryFilepath):
+            logging.info("Invalidating cached statistics: %s", rawFilepath)
+            self._removeEntry(entryFilepath)
+
+    def clear(self):
+        for entryFilepath in self._getEntryFilepaths():
+            self._removeEntry(entryFilepath)
+
+    def getSize_B(self):
+        return sum(entrySize_B for _mtime, entrySize_B, _entryFilepath in self._getEntries())
+
+    def _getEntryFilepath(self, rawFilepath):
+        name = hashlib.sha1(os.path.abspath(rawFilepath).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name + ENTRY_EXTENSION)
+
+    def _getEntryFilepaths(self):
+        if not os.path.isdir(self.directory):
+            return []
+
+        return [os.path.join(self.directory, filename) for filename in os.listdir(self.directory)
+                if filename.endswith(ENTRY_EXTENSION)]
+
+    def _readEntry(self, rawFilepath, sourceKey):
+        entryFilepath = self._getEntryFilepath(rawFilepath)
+        if not os.path.isfile(entryFilepath):
+            return {}
+
+        try:
+            with np.load(entryFilepath) as entryFile:
+                statistics = dict((name, entryFile[name]) for name in entryFile.files)
+        except (IOError, OSError, ValueError) as error:
+            logging.warning("Unreadable cached statistics %s: %s", entryFilepath, error)
+            return {}
+
+        if KEY_SOURCE_KEY not in statistics or str(statistics[KEY_SOURCE_KEY]) != sourceKey:
+            logging.info("Cached statistics do not match the map: %s", rawFilepath)
+            return {}
+
+        return statistics
+
+    def _prune(self, keepFilepath):
+        """
+        Remove the least recently used entries, except keepFilepath, until the cache fits in its maximum size.
+        """
+        entries = self._getEntries()
+        size_B = sum(entrySize_B for _mtime, entrySize_B, _entryFilepath in entries)
+
+        for _mtime, entrySize_B, entryFilepath in sorted(entries):
+            if size_B <= self.maximumSize_B:
+                break
+            if entryFilepath == keepFilepath:
+                continue
+
+            logging.debug("Removing cached statistics: %s", entryFilepath)
+            self._removeEntry(entryFilepath)
+            size_B -= entrySize_B
+
+    def _getEntries(self):
+        """
+        Return the (mtime, size, filepath) of the entries, skipping the ones removed meanwhile by another process.
+        """
+        entries = []
+        for entryFilepath in self._getEntryFilepaths():
+            try:
+                entryStat = os.stat(entryFilepath)
+            except OSError:
+                continue
+            entries.append((entryStat.st_mtime, entryStat.st_size, entryFilepath))
+
+        return entries
+
+    def _removeEntry(self, entryFilepath):
+        """
+        Remove the entry file, the cache directory is shared so another process may have removed it already.
+        """
+        try:
+            os.remove(entryFilepath)
+        except OSError:
+            logging.debug("Cached statistics already removed: %s", entryFilepath)
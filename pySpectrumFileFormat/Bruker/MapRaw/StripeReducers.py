@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.StripeReducers
+   :synopsis: Reductions of spectrum image maps shared by the map formats.
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Reductions of spectrum image maps shared by the map formats.
+
+Each reduction takes the mapStripes method of a map format, called as mapStripes(function, itemSize_B=itemSize_B),
+which applies function on each (rows, width, depth) row stripe of the map and yields (rowStart, rowEnd, result) in
+row order.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+
+# Globals and constants variables.
+
+class MapStatistics(object):
+    """
+    Statistics of a map computed in one pass by :py:func:`scan`.
+    """
+    def __init__(self):
+        self.channels = None
+        self.numberPixels = 0
+        self.totalSpectrum = None
+        self.totalIntensityImage = None
+        self.maximumPixelSpectrum = None
+        self.maximumPixelSpectrumPixels = None
+        self.minimumPixelSpectrum = None
+        self.meanSpectrum = None
+        self.varianceSpectrum = None
+
+def checkPixel(pixelX, pixelY, width, height):
+    """
+    Raise an IndexError when the pixel is outside the map.
+    """
+    if not (0 <= pixelX < width and 0 <= pixelY < height):
+        raise IndexError("Pixel (%i, %i) outside the %i x %i map" % (pixelX, pixelY, width, height))
+
+def clipRectangles(rectangles, width, height):
+    """
+    Return the [pixelXstart, pixelXend, pixelYstart, pixelYend) bounds of the inclusive (pixelXmin, pixelXmax,
+    pixelYmin, pixelYmax) rectangles clipped to the map, an empty bound has its end equal to its start.
+    """
+    rectangles = np.asarray(rectangles, dtype=np.intp).reshape(-1, 4)
+
+    pixelXstart = np.clip(rectangles[:, 0], 0, width)
+    pixelXend = np.clip(rectangles[:, 1] + 1, pixelXstart, width)
+    pixelYstart = np.clip(rectangles[:, 2], 0, height)
+    pixelYend = np.clip(rectangles[:, 3] + 1, pixelYstart, height)
+
+    return np.column_stack((pixelXstart, pixelXend, pixelYstart, pixelYend))
+
+def getChannelBounds(channelRanges, depth):
+    """
+    Return the channel starts and stops of the [channel_min, channel_max) ranges with the slice semantic.
+    """
+    channelStarts = []
+    channelStops = []
+    for channel_min, channel_max in channelRanges:
+        channel_min, channel_max, _step = slice(channel_min, channel_max).indices(depth)
+        channelStarts.append(channel_min)
+        channelStops.append(max(channel_min, channel_max))
+
+    return channelStarts, channelStops
+
+def getPixelsFromFlatIndices(flatPixels, width):
+    flatPixels = np.asarray(flatPixels)
+    pixels = np.column_stack((flatPixels % width, flatPixels // width))
+
+    return pixels
+
+def getMaximumPixels(pixels):
+    """
+    Return the maximum of each channel and its pixel index for a (pixels, depth) array.
+    """
+    flatPixels = np.argmax(pixels, axis=0)
+    maximumSpectrum = np.asarray(pixels[flatPixels, np.arange(pixels.shape[1])])
+
+    return maximumSpectrum, flatPixels
+
+def mergeMaximumPixels(maximumSpectrum, flatPixels, stripeMaximumSpectrum, stripeFlatPixels):
+    if maximumSpectrum is None:
+        return stripeMaximumSpectrum, stripeFlatPixels
+
+    # Strictly greater keeps the first pixel in file order, as np.argmax does.
+    isNewMaximum = stripeMaximumSpectrum > maximumSpectrum
+    maximumSpectrum[isNewMaximum] = stripeMaximumSpectrum[isNewMaximum]
+    flatPixels[isNewMaximum] = stripeFlatPixels[isNewMaximum]
+
+    return maximumSpectrum, flatPixels
+
+def reduceMaximumPixels(mapStripes, width, depth):
+    """
+    Return the maximum pixel spectrum and the flat index of the pixel of the maximum of each channel.
+    """
+    def reduceStripe(stripe):
+        return getMaximumPixels(np.asarray(stripe).reshape(-1, depth))
+
+    maximumSpectrum = None
+    flatPixels = None
+    for rowStart, _rowEnd, (stripeMaximumSpectrum, stripeFlatPixels) in mapStripes(reduceStripe):
+        maximumSpectrum, flatPixels = mergeMaximumPixels(maximumSpectrum, flatPixels, stripeMaximumSpectrum,
+                                                         stripeFlatPixels + rowStart*width)
+
+    return maximumSpectrum, flatPixels
+
+def reduceRoiIntensityImages(mapStripes, channelStarts, channelStops, height, width, accumulatorType):
+    """
+    Return the (ranges, height, width) intensity images of the [channelStarts, channelStops) windows in one pass.
+    """
+    images = np.zeros((len(channelStarts), height, width), dtype=accumulatorType)
+
+    # Sum the segments between the window boundaries once, each window is a difference of their cumulative sum.
+    boundaries = np.unique(list(channelStarts) + list(channelStops))
+    if len(boundaries) < 2:
+        return images
+    startSegments = np.searchsorted(boundaries, channelStarts)
+    stopSegments = np.searchsorted(boundaries, channelStops)
+
+    def reduceStripe(stripe):
+        segments = np.add.reduceat(stripe[..., :boundaries[-1]], boundaries[:-1], axis=2, dtype=accumulatorType)
+        cumulativeSegments = np.zeros(segments.shape[:2] + (len(boundaries),), dtype=accumulatorType)
+        np.cumsum(segments, axis=2, out=cumulativeSegments[..., 1:])
+        partialImages = cumulativeSegments[..., stopSegments] - cumulativeSegments[..., startSegments]
+        return np.moveaxis(partialImages, 2, 0)
+
+    for rowStart, rowEnd, partialImages in mapStripes(reduceStripe):
+        images[:, rowStart:rowEnd, :] = partialImages
+
+    return images
+
+def scan(mapStripes, height, width, depth, accumulatorType):
+    """
+    Return the :py:class:`MapStatistics` of the map computed in one pass.
+
+    The mean and variance of a map without pixels are zero and its maximum and minimum pixel spectra are None.
+    """
+    statistics = MapStatistics()
+    statistics.channels = np.arange(0, depth)
+    statistics.totalSpectrum = np.zeros(depth, dtype=accumulatorType)
+    statistics.totalIntensityImage = np.zeros((height, width), dtype=accumulatorType)
+    statistics.meanSpectrum = np.zeros(depth, dtype=np.float64)
+    sumSquaredDeviations = np.zeros(depth, dtype=np.float64)
+
+    if height*width == 0:
+        statistics.varianceSpectrum = sumSquaredDeviations
+        return statistics
+
+    def reduceStripe(stripe):
+        pixels = np.asarray(stripe).reshape(-1, depth)
+        stripeSpectrum = np.sum(pixels, axis=0, dtype=accumulatorType)
+        stripeImage = np.sum(pixels, axis=1, dtype=accumulatorType).reshape(stripe.shape[:2])
+        stripeMaximum, stripeFlatPixels = getMaximumPixels(pixels)
+        stripeMinimum = np.amin(pixels, axis=0)
+        stripeMean = stripeSpectrum/float(len(pixels))
+        stripeSumSquaredDeviations = np.sum((pixels - stripeMean)**2, axis=0)
+        return (len(pixels), stripeSpectrum, stripeImage, stripeMaximum, stripeFlatPixels, stripeMinimum,
+                stripeMean, stripeSumSquaredDeviations)
+
+    # The deviations and their squares are two float64 temporaries of the size of the stripe.
+    flatPixels = None
+    for rowStart, rowEnd, partial in mapStripes(reduceStripe, itemSize_B=2*np.dtype(np.float64).itemsize):
+        (stripeNumberPixels, stripeSpectrum, stripeImage, stripeMaximum, stripeFlatPixels, stripeMinimum,
+         stripeMean, stripeSumSquaredDeviations) = partial
+
+        statistics.totalSpectrum += stripeSpectrum
+        statistics.totalIntensityImage[rowStart:rowEnd] = stripeImage
+
+        statistics.maximumPixelSpectrum, flatPixels = mergeMaximumPixels(
+            statistics.maximumPixelSpectrum, flatPixels, stripeMaximum, stripeFlatPixels + rowStart*width)
+
+        if statistics.minimumPixelSpectrum is None:
+            statistics.minimumPixelSpectrum = stripeMinimum
+        else:
+            np.minimum(statistics.minimumPixelSpectrum, stripeMinimum, out=statistics.minimumPixelSpectrum)
+
+        # Merge the stripe mean and variance with the parallel algorithm of Chan et al.
+        numberPixels = statistics.numberPixels + stripeNumberPixels
+        delta = stripeMean - statistics.meanSpectrum
+        statistics.meanSpectrum += delta*stripeNumberPixels/numberPixels
+        sumSquaredDeviations += stripeSumSquaredDeviations + \
+            delta**2*statistics.numberPixels*stripeNumberPixels/numberPixels
+        statistics.numberPixels = numberPixels
+
+    statistics.varianceSpectrum = sumSquaredDeviations/statistics.numberPixels
+    statistics.maximumPixelSpectrumPixels = getPixelsFromFlatIndices(flatPixels, width)
+
+    return statistics
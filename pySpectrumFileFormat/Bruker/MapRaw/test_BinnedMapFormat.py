@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.test_BinnedMapFormat
+   :synopsis: Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.BinnedMapFormat`
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.BinnedMapFormat`.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.BinnedMapFormat as BinnedMapFormat
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawFormat as MapRawFormat
+import pySpectrumFileFormat.Bruker.MapRaw.ParametersFile as ParametersFile
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawTestCase as MapRawTestCase
+
+# Globals and constants variables.
+
+class TestBinnedMapFormat(MapRawTestCase.MapRawTestCase):
+    """
+    TestCase class for the module `BinnedMapFormat`.
+    """
+
+    def setUp(self):
+        """
+        Setup method.
+        """
+
+        MapRawTestCase.MapRawTestCase.setUp(self)
+
+        # Binning by 2x2 pixels and 3 channels drops the last row, column and channels.
+        self.binnedDatacube = self.datacube[:8, :6, :9].reshape(4, 2, 3, 2, 3, 3).sum(axis=(1, 3, 5))
+
+        self.binnedMaps = {}
+        for recordBy, rawFilepath in self.rawFilepaths.items():
+            # Budget of two binned uint64 rows gives blocks of two binned rows, one with the float64 scan temporaries.
+            mapRaw = MapRawFormat.MapRawFormat(rawFilepath, memoryBudget_B=2*3*3*8)
+            self.binnedMaps[recordBy] = mapRaw.binned(spatial=2, spectral=3)
+
+    def tearDown(self):
+        """
+        Teardown method.
+        """
+
+        self.binnedMaps = {}
+
+        MapRawTestCase.MapRawTestCase.tearDown(self)
+
+    def testSkeleton(self):
+        """
+        First test to check if the testcase is working with the testing framework.
+        """
+
+        #self.fail("Test if the testcase is working.")
+        self.assertTrue(True)
+
+    def test_getParameters(self):
+        parameters = self.binnedMaps[ParametersFile.RECORED_BY_IMAGE].getParameters()
+
+        self.assertEqual(3, parameters.width)
+        self.assertEqual(4, parameters.height)
+        self.assertEqual(3, parameters.depth)
+        self.assertEqual(8, parameters.dataLength_B)
+        self.assertEqual(20.0, parameters.pixel_size_nm)
+
+        self.assertRaises(ValueError, BinnedMapFormat.BinnedMapFormat, None, 0, 1)
+
+    def test_getSpectrum(self):
+        for binnedMap in self.binnedMaps.values():
+            for pixelX, pixelY in [(0, 0), (2, 1), (1, 3)]:
+                channels, spectrum = binnedMap.getSpectrum(pixelX, pixelY)
+                np.testing.assert_array_equal(np.arange(3), channels)
+                np.testing.assert_array_equal(self.binnedDatacube[pixelY, pixelX, :], spectrum)
+
+            self.assertEqual([1, 3], list(binnedMap._cache))
+            binnedMap.getSpectrum(0, 2)
+            self.assertEqual([3, 2], list(binnedMap._cache))
+            binnedMap.getTotalSpectrum()
+            self.assertEqual([3, 2], list(binnedMap._cache))
+
+    def test_getSpectrumSourceRows(self):
+        binnedMap = self.binnedMaps[ParametersFile.RECORED_BY_VECTOR]
+        mapRaw = binnedMap._mapRaw
+        getStripe = mapRaw._getStripe
+        sourceRows = []
+
+        def recordStripe(rowStart, rowEnd):
+            sourceRows.append((rowStart, rowEnd))
+            return getStripe(rowStart, rowEnd)
+
+        mapRaw._getStripe = recordStripe
+        _channels, spectrum = binnedMap.getSpectrum(2, 3)
+        np.testing.assert_array_equal(self.binnedDatacube[3, 2, :], spectrum)
+        self.assertEqual([(6, 8)], sourceRows)
+
+    def test_cacheSize_B(self):
+        # A binned row of 3 pixels and 3 channels takes 72 bytes.
+        binnedMap = BinnedMapFormat.BinnedMapFormat(self.binnedMaps[ParametersFile.RECORED_BY_IMAGE]._mapRaw, 2, 3,
+                                                    cacheSize_B=150)
+        self.assertEqual(150, binnedMap.cacheSize_B)
+        self.assertEqual(2*3*3*8, self.binnedMaps[ParametersFile.RECORED_BY_IMAGE].cacheSize_B)
+
+        for pixelY in range(4):
+            _channels, spectrum = binnedMap.getSpectrum(1, pixelY)
+            np.testing.assert_array_equal(self.binnedDatacube[pixelY, 1, :], spectrum)
+
+        self.assertEqual([2, 3], list(binnedMap._cache))
+        self.assertEqual(2*72, binnedMap._cache_B)
+
+    def test_blockSize(self):
+        for binnedMap in self.binnedMaps.values():
+            blocks = list(binnedMap._mapStripes(lambda block: block.nbytes))
+            self.assertEqual([(0, 2, 144), (2, 4, 144)], blocks)
+
+            blocks = list(binnedMap._mapStripes(lambda block: block.nbytes, itemSize_B=16))
+            self.assertEqual([(0, 1, 72), (1, 2, 72), (2, 3, 72), (3, 4, 72)], blocks)
+
+            # Without binning a block is at least one row of uint64 values, not a budget of source rows.
+            unbinnedMap = BinnedMapFormat.BinnedMapFormat(binnedMap._mapRaw)
+            unbinnedMap._mapRaw.memoryBudget_B = 3*7*11*8
+            blocks = list(unbinnedMap._mapStripes(lambda block: block.nbytes))
+            self.assertEqual([(0, 3, 3*7*11*8), (3, 6, 3*7*11*8), (6, 9, 3*7*11*8)], blocks)
+
+    def test_getDataCube(self):
+        for binnedMap in self.binnedMaps.values():
+            _channels, datacube = binnedMap.getDataCube()
+            np.testing.assert_array_equal(self.binnedDatacube, datacube)
+
+    def test_reductions(self):
+        for binnedMap in self.binnedMaps.values():
+            _channels, spectrum = binnedMap.getTotalSpectrum()
+            np.testing.assert_array_equal(np.sum(self.binnedDatacube, axis=(0, 1)), spectrum)
+
+            _channels, spectrum = binnedMap.getSumSpectrum()
+            np.testing.assert_array_equal(np.sum(self.binnedDatacube, axis=(0, 1)), spectrum)
+
+            _channels, spectrum = binnedMap.getROISpectrum(1, 2, 1, 2)
+            np.testing.assert_array_equal(np.sum(self.binnedDatacube[1:3, 1:3, :], axis=(0, 1)), spectrum)
+
+            image = binnedMap.getTotalIntensityImage()
+            np.testing.assert_array_equal(np.sum(self.binnedDatacube, axis=2), image)
+
+            image = binnedMap.getRoiIntensityImage((1, 3))
+            np.testing.assert_array_equal(np.sum(self.binnedDatacube[..., 1:3], axis=2), image)
+
+            _channels, spectrum = binnedMap.getMaximumPixelSpectrum()
+            np.testing.assert_array_equal(np.amax(self.binnedDatacube, axis=(0, 1)), spectrum)
+
+    def test_mapRawFormatMethods(self):
+        pixels = self.binnedDatacube.reshape(-1, 3)
+        flatPixels = np.argmax(pixels, axis=0)
+        rectangles = [[1, 2, 1, 2], [-1, 1, 2, 9], [5, 6, 0, 3]]
+        expectedSpectra = [np.sum(self.binnedDatacube[1:3, 1:3, :], axis=(0, 1)),
+                           np.sum(self.binnedDatacube[2:4, 0:2, :], axis=(0, 1)), np.zeros(3)]
+
+        for binnedMap in self.binnedMaps.values():
+            np.testing.assert_array_equal(np.column_stack((flatPixels % 3, flatPixels // 3)),
+                                          binnedMap.getMaximumPixelSpectrumPixels())
+
+            _channels, spectrum = binnedMap.getMaximumPixelSpectrum2()
+            np.testing.assert_array_equal(np.amax(pixels, axis=0), spectrum)
+
+            images = binnedMap.getRoiIntensityImages([(0, 2), (1, 3)])
+            np.testing.assert_array_equal([np.sum(self.binnedDatacube[..., 0:2], axis=2),
+                                           np.sum(self.binnedDatacube[..., 1:3], axis=2)], images)
+
+            _channels, spectra = binnedMap.getROISpectra(rectangles)
+            np.testing.assert_array_equal(expectedSpectra, spectra)
+
+            statistics = binnedMap.scan()
+            self.assertEqual(12, statistics.numberPixels)
+            np.testing.assert_array_equal(np.sum(pixels, axis=0), statistics.totalSpectrum)
+            np.testing.assert_array_equal(np.amin(pixels, axis=0), statistics.minimumPixelSpectrum)
+            np.testing.assert_allclose(np.mean(pixels, axis=0), statistics.meanSpectrum)
+            np.testing.assert_allclose(np.var(pixels, axis=0), statistics.varianceSpectrum)
+
+if __name__ == '__main__':  # pragma: no cover
+    import nose
+    nose.runmodule()
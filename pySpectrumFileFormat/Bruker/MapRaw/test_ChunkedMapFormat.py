@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.test_ChunkedMapFormat
+   :synopsis: Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.ChunkedMapFormat`
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.ChunkedMapFormat`.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import os.path
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.ChunkedMapFormat as ChunkedMapFormat
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawFormat as MapRawFormat
+import pySpectrumFileFormat.Bruker.MapRaw.ParametersFile as ParametersFile
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawTestCase as MapRawTestCase
+
+# Globals and constants variables.
+
+class TestChunkedMapFormat(MapRawTestCase.MapRawTestCase):
+    """
+    TestCase class for the module `ChunkedMapFormat`.
+    """
+
+    def setUp(self):
+        """
+        Setup method.
+        """
+
+        MapRawTestCase.MapRawTestCase.setUp(self)
+
+        self.chunkedMaps = {}
+        for recordBy, rawFilepath in self.rawFilepaths.items():
+            directory = os.path.join(self.path, "chunked_%s" % recordBy)
+            ChunkedMapFormat.exportChunkedMap(MapRawFormat.MapRawFormat(rawFilepath), directory, chunkShape=(4, 4))
+            self.chunkedMaps[recordBy] = ChunkedMapFormat.ChunkedMapFormat(directory, cacheSize=2)
+
+    def tearDown(self):
+        """
+        Teardown method.
+        """
+
+        self.chunkedMaps = {}
+
+        MapRawTestCase.MapRawTestCase.tearDown(self)
+
+    def createDatacube(self, randomState):
+        datacube = randomState.poisson(0.05, size=(9, 7, 11)).astype(np.uint16)
+        # Leave the first chunk empty.
+        datacube[:4, :4, :] = 0
+        return datacube
+
+    def testSkeleton(self):
+        """
+        First test to check if the testcase is working with the testing framework.
+        """
+
+        #self.fail("Test if the testcase is working.")
+        self.assertTrue(True)
+
+    def test_exportChunkedMap(self):
+        directory = os.path.join(self.path, "chunked_%s" % ParametersFile.RECORED_BY_IMAGE)
+
+        self.assertFalse(os.path.isfile(os.path.join(directory, "chunk_0_0.npz")))
+        self.assertTrue(os.path.isfile(os.path.join(directory, "chunk_2_1.npz")))
+
+        chunkedMap = self.chunkedMaps[ParametersFile.RECORED_BY_IMAGE]
+        self.assertEqual(5, len(chunkedMap._chunks))
+        self.assertEqual(6, chunkedMap._getNumberChunks())
+
+        parameters = chunkedMap.getParameters()
+        self.assertEqual(7, parameters.width)
+        self.assertEqual(9, parameters.height)
+        self.assertEqual(11, parameters.depth)
+        self.assertEqual(ParametersFile.RECORED_BY_VECTOR, parameters.recordBy)
+
+    def test_getSpectrum(self):
+        for chunkedMap in self.chunkedMaps.values():
+            for pixelX, pixelY in [(0, 0), (3, 2), (6, 8), (4, 3)]:
+                channels, spectrum = chunkedMap.getSpectrum(pixelX, pixelY)
+                np.testing.assert_array_equal(np.arange(11), channels)
+                np.testing.assert_array_equal(self.datacube[pixelY, pixelX, :], spectrum)
+
+            self.assertTrue(len(chunkedMap._cache) <= 2)
+
+            for pixelX, pixelY in [(-1, 0), (0, -1), (7, 0), (0, 9)]:
+                self.assertRaises(IndexError, chunkedMap.getSpectrum, pixelX, pixelY)
+
+            # A spectrum of a cached chunk cannot change the later queries.
+            chunkRow, chunkColumn = sorted(chunkedMap._chunks)[0]
+            _channels, spectrum = chunkedMap.getSpectrum(chunkColumn*4, chunkRow*4)
+            self.assertFalse(spectrum.flags.writeable)
+            self.assertRaises(ValueError, spectrum.fill, 0)
+
+    def test_getDataCube(self):
+        for chunkedMap in self.chunkedMaps.values():
+            _channels, datacube = chunkedMap.getDataCube()
+            np.testing.assert_array_equal(self.datacube, datacube)
+
+    def test_reductions(self):
+        for chunkedMap in self.chunkedMaps.values():
+            _channels, spectrum = chunkedMap.getTotalSpectrum()
+            np.testing.assert_array_equal(np.sum(self.datacube, axis=(0, 1)), spectrum)
+
+            _channels, spectrum = chunkedMap.getSumSpectrum()
+            np.testing.assert_array_equal(np.sum(self.datacube, axis=(0, 1)), spectrum)
+
+            _channels, spectrum = chunkedMap.getROISpectrum(2, 5, 1, 6)
+            np.testing.assert_array_equal(np.sum(self.datacube[1:7, 2:6, :], axis=(0, 1)), spectrum)
+
+            image = chunkedMap.getTotalIntensityImage()
+            np.testing.assert_array_equal(np.sum(self.datacube, axis=2), image)
+
+            image = chunkedMap.getRoiIntensityImage((3, 8))
+            np.testing.assert_array_equal(np.sum(self.datacube[..., 3:8], axis=2), image)
+
+            _channels, spectrum = chunkedMap.getMaximumPixelSpectrum()
+            np.testing.assert_array_equal(np.amax(self.datacube, axis=(0, 1)), spectrum)
+
+    def test_mapRawFormatMethods(self):
+        mapRaw = MapRawFormat.MapRawFormat(os.path.join(self.path, "map_%s.raw" % ParametersFile.RECORED_BY_VECTOR))
+        rectangles = [[2, 5, 1, 6], [-2, 3, 5, 12], [8, 10, 0, 8]]
+        channelRanges = [(3, 8), (-4, -1), (7, 2)]
+        expectedStatistics = mapRaw.scan()
+
+        for chunkedMap in self.chunkedMaps.values():
+            np.testing.assert_array_equal(mapRaw.getMaximumPixelSpectrumPixels(),
+                                          chunkedMap.getMaximumPixelSpectrumPixels())
+            np.testing.assert_array_equal(mapRaw.getMaximumPixelSpectrum2()[1],
+                                          chunkedMap.getMaximumPixelSpectrum2()[1])
+            np.testing.assert_array_equal(mapRaw.getRoiIntensityImages(channelRanges),
+                                          chunkedMap.getRoiIntensityImages(channelRanges))
+            np.testing.assert_array_equal(mapRaw.getROISpectra(rectangles)[1], chunkedMap.getROISpectra(rectangles)[1])
+
+            statistics = chunkedMap.scan()
+            self.assertEqual(expectedStatistics.numberPixels, statistics.numberPixels)
+            np.testing.assert_array_equal(expectedStatistics.totalIntensityImage, statistics.totalIntensityImage)
+            np.testing.assert_array_equal(expectedStatistics.maximumPixelSpectrumPixels,
+                                          statistics.maximumPixelSpectrumPixels)
+            np.testing.assert_array_equal(expectedStatistics.minimumPixelSpectrum, statistics.minimumPixelSpectrum)
+            np.testing.assert_allclose(expectedStatistics.meanSpectrum, statistics.meanSpectrum)
+            np.testing.assert_allclose(expectedStatistics.varianceSpectrum, statistics.varianceSpectrum)
+
+if __name__ == '__main__':  # pragma: no cover
+    import nose
+    nose.runmodule()
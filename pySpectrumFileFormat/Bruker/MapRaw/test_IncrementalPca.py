@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.test_IncrementalPca
+   :synopsis: Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.IncrementalPca`
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.IncrementalPca`.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import os.path
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.IncrementalPca as IncrementalPca
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawFormat as MapRawFormat
+import pySpectrumFileFormat.Bruker.MapRaw.ParametersFile as ParametersFile
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawTestCase as MapRawTestCase
+
+# Globals and constants variables.
+
+class TestIncrementalPca(MapRawTestCase.MapRawTestCase):
+    """
+    TestCase class for the module `IncrementalPca`.
+    """
+
+    def setUp(self):
+        """
+        Setup method.
+        """
+
+        MapRawTestCase.MapRawTestCase.setUp(self)
+
+        self.mapRaws = {}
+        for recordBy, rawFilepath in self.rawFilepaths.items():
+            # Budget of about two float64 rows to force several stripes.
+            self.mapRaws[recordBy] = MapRawFormat.MapRawFormat(rawFilepath, memoryBudget_B=2*7*11*8)
+
+    def tearDown(self):
+        """
+        Teardown method.
+        """
+
+        self.mapRaws = {}
+
+        MapRawTestCase.MapRawTestCase.tearDown(self)
+
+    def createDatacube(self, randomState):
+        # Rank two map: two reference spectra mixed with integer abundances.
+        references = randomState.randint(0, 20, size=(2, 11))
+        abundances = randomState.randint(1, 6, size=(9, 7, 2))
+        return np.dot(abundances, references).astype(np.uint16)
+
+    def testSkeleton(self):
+        """
+        First test to check if the testcase is working with the testing framework.
+        """
+
+        #self.fail("Test if the testcase is working.")
+        self.assertTrue(True)
+
+    def test_fit(self):
+        spectra = self.datacube.reshape(-1, 11).astype(np.float64)
+        expectedVariance = np.sort(np.linalg.eigvalsh(np.cov(spectra.T)))[::-1][:3]
+
+        for mapRaw in self.mapRaws.values():
+            for workers in [1, 2]:
+                mapRaw.workers = workers
+                pca = IncrementalPca.IncrementalPca(mapRaw, numberComponents=3).fit()
+
+                self.assertEqual(63, pca.numberPixels)
+                self.assertEqual((3, 11), pca.components.shape)
+                np.testing.assert_allclose(np.mean(spectra, axis=0), pca.meanSpectrum)
+                np.testing.assert_allclose(expectedVariance, pca.explainedVariance, atol=1.0e-8)
+                np.testing.assert_allclose(np.eye(3), np.dot(pca.components, pca.components.T), atol=1.0e-10)
+                np.testing.assert_allclose(1.0, np.sum(pca.getExplainedVarianceRatio()[:2]))
+
+        self.assertRaises(ValueError, IncrementalPca.IncrementalPca, mapRaw, numberComponents=12)
+        self.assertRaises(RuntimeError, IncrementalPca.IncrementalPca(mapRaw).getScoreImages)
+
+    def test_getScoreImages(self):
+        mapRaw = self.mapRaws[ParametersFile.RECORED_BY_IMAGE]
+        pca = IncrementalPca.IncrementalPca(mapRaw, numberComponents=2).fit()
+
+        images = pca.getScoreImages()
+
+        self.assertEqual((2, 9, 7), images.shape)
+        spectra = self.datacube.reshape(-1, 11) - pca.meanSpectrum
+        np.testing.assert_allclose(np.dot(spectra, pca.components.T).T.reshape(2, 9, 7), images)
+
+    def test_reconstruct(self):
+        for poissonWeighting in [False, True]:
+            for recordBy, mapRaw in self.mapRaws.items():
+                pca = IncrementalPca.IncrementalPca(mapRaw, numberComponents=2, poissonWeighting=poissonWeighting)
+                pca.fit()
+
+                outputRawFilepath = os.path.join(self.path, "pca_%s_%s.raw" % (recordBy, poissonWeighting))
+                pca.reconstruct(outputRawFilepath)
+
+                outputMapRaw = MapRawFormat.MapRawFormat(outputRawFilepath)
+                parameters = outputMapRaw.getParameters()
+                self.assertEqual(ParametersFile.DATA_TYPE_FLOAT, parameters.dataType)
+                self.assertEqual(4, parameters.dataLength_B)
+                self.assertEqual(ParametersFile.RECORED_BY_VECTOR, parameters.recordBy)
+
+                # Two components reconstruct the rank two map.
+                _channels, datacube = outputMapRaw.getDataCube()
+                np.testing.assert_allclose(self.datacube, datacube, atol=1.0e-3)
+
+                integerRawFilepath = outputRawFilepath.replace(".raw", "_uint16.raw")
+                pca.reconstruct(integerRawFilepath, dataType=np.uint16)
+                _channels, datacube = MapRawFormat.MapRawFormat(integerRawFilepath).getDataCube()
+                np.testing.assert_array_equal(self.datacube, datacube)
+
+if __name__ == '__main__':  # pragma: no cover
+    import nose
+    nose.runmodule()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.test_LeastSquaresFit
+   :synopsis: Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.LeastSquaresFit`
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.LeastSquaresFit`.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import os.path
+
+# Third party modules.
+import numpy as np
+import scipy.optimize
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.LeastSquaresFit as LeastSquaresFit
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawFormat as MapRawFormat
+import pySpectrumFileFormat.Bruker.MapRaw.ParametersFile as ParametersFile
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawTestCase as MapRawTestCase
+
+# Globals and constants variables.
+
+class TestLeastSquaresFit(MapRawTestCase.MapRawTestCase):
+    """
+    TestCase class for the module `LeastSquaresFit`.
+    """
+
+    def setUp(self):
+        """
+        Setup method.
+        """
+
+        MapRawTestCase.MapRawTestCase.setUp(self)
+
+        self.mapRaws = {}
+        for recordBy, rawFilepath in self.rawFilepaths.items():
+            # Budget of about two float64 rows to force several stripes.
+            self.mapRaws[recordBy] = MapRawFormat.MapRawFormat(rawFilepath, memoryBudget_B=2*7*11*8)
+
+    def tearDown(self):
+        """
+        Teardown method.
+        """
+
+        self.mapRaws = {}
+
+        MapRawTestCase.MapRawTestCase.tearDown(self)
+
+    def createDatacube(self, randomState):
+        self.references = randomState.randint(0, 20, size=(3, 11)).astype(np.float64)
+        return randomState.randint(0, 50, size=(9, 7, 11)).astype(np.uint16)
+
+    def testSkeleton(self):
+        """
+        First test to check if the testcase is working with the testing framework.
+        """
+
+        #self.fail("Test if the testcase is working.")
+        self.assertTrue(True)
+
+    def test_fit(self):
+        spectra = self.datacube.reshape(-1, 11).astype(np.float64)
+        expectedCoefficients, _residuals, _rank, _values = np.linalg.lstsq(self.references.T, spectra.T, rcond=None)
+        expectedResiduals = np.sum((spectra - np.dot(expectedCoefficients.T, self.references))**2, axis=1)
+
+        for mapRaw in self.mapRaws.values():
+            for workers in [1, 2]:
+                mapRaw.workers = workers
+                coefficientMaps, residualMap = LeastSquaresFit.LeastSquaresFit(mapRaw, self.references).fit()
+
+                self.assertEqual((3, 9, 7), coefficientMaps.shape)
+                self.assertEqual((9, 7), residualMap.shape)
+                np.testing.assert_allclose(expectedCoefficients.reshape(3, 9, 7), coefficientMaps, atol=1.0e-10)
+                np.testing.assert_allclose(expectedResiduals.reshape(9, 7), residualMap)
+
+    def test_fitNonNegative(self):
+        spectra = self.datacube.reshape(-1, 11).astype(np.float64)
+        expectedCoefficients = np.array([scipy.optimize.nnls(self.references.T, spectrum)[0] for spectrum in spectra])
+
+        for mapRaw in self.mapRaws.values():
+            coefficientMaps, residualMap = LeastSquaresFit.LeastSquaresFit(mapRaw, self.references).fit(True)
+
+            self.assertTrue(np.all(coefficientMaps >= 0.0))
+            np.testing.assert_allclose(expectedCoefficients.T.reshape(3, 9, 7), coefficientMaps, atol=1.0e-6)
+            residuals = spectra - np.dot(coefficientMaps.reshape(3, -1).T, self.references)
+            np.testing.assert_allclose(np.sum(residuals**2, axis=1).reshape(9, 7), residualMap)
+
+    def test_fitNonNegativeOverlapping(self):
+        # Three strongly overlapping peaks and an isolated narrow one.
+        channels = np.arange(64)
+        references = np.array([np.exp(-0.5*((channels - center)/width)**2)
+                               for center, width in [(20, 6), (21, 6), (22, 6), (40, 3)]])
+
+        randomState = np.random.RandomState(12345)
+        abundances = randomState.uniform(0.0, 5.0, size=(9, 7, 4))
+        abundances[randomState.random_sample((9, 7, 4)) < 0.3] = 0.0
+        datacube = np.dot(abundances, references) + randomState.normal(0.0, 0.05, size=(9, 7, 64))
+        spectra = datacube.reshape(-1, 64)
+        expectedCoefficients = np.array([scipy.optimize.nnls(references.T, spectrum)[0] for spectrum in spectra])
+
+        rawFilepath = os.path.join(self.path, "overlapping.raw")
+        MapRawTestCase.createMapRawFile(rawFilepath, datacube, ParametersFile.RECORED_BY_VECTOR)
+        mapRaw = MapRawFormat.MapRawFormat(rawFilepath, memoryBudget_B=2*7*64*8)
+
+        coefficientMaps, residualMap = LeastSquaresFit.LeastSquaresFit(mapRaw, references).fit(True)
+
+        self.assertTrue(np.all(coefficientMaps >= 0.0))
+        self.assertTrue(np.any(coefficientMaps == 0.0))
+        np.testing.assert_allclose(expectedCoefficients.T.reshape(4, 9, 7), coefficientMaps, atol=1.0e-8)
+        residuals = spectra - np.dot(coefficientMaps.reshape(4, -1).T, references)
+        np.testing.assert_allclose(np.sum(residuals**2, axis=1).reshape(9, 7), residualMap)
+
+    def test_references(self):
+        mapRaw = self.mapRaws[ParametersFile.RECORED_BY_VECTOR]
+
+        self.assertRaises(ValueError, LeastSquaresFit.LeastSquaresFit, mapRaw, self.references[:, :10])
+        self.assertRaises(ValueError, LeastSquaresFit.LeastSquaresFit, mapRaw, self.references[[0, 0]])
+
+if __name__ == '__main__':  # pragma: no cover
+    import nose
+    nose.runmodule()
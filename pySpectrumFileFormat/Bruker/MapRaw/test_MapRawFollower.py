@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.test_MapRawFollower
+   :synopsis: Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.MapRawFollower`
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.MapRawFollower`.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawFollower as MapRawFollower
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawFormat as MapRawFormat
+import pySpectrumFileFormat.Bruker.MapRaw.ParametersFile as ParametersFile
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawTestCase as MapRawTestCase
+
+# Globals and constants variables.
+
+class TestMapRawFollower(MapRawTestCase.MapRawTestCase):
+    """
+    TestCase class for the module `MapRawFollower`.
+    """
+
+    def setUp(self):
+        """
+        Setup method.
+        """
+
+        MapRawTestCase.MapRawTestCase.setUp(self)
+
+        # Acquisition in progress: the rpl file is written and the raw file is empty.
+        self.rawFilepath = self.rawFilepaths[ParametersFile.RECORED_BY_VECTOR]
+        open(self.rawFilepath, 'wb').close()
+
+        self.mapRaw = MapRawFormat.MapRawFormat(self.rawFilepath, memoryBudget_B=2*7*11*2)
+
+    def tearDown(self):
+        """
+        Teardown method.
+        """
+
+        self.mapRaw = None
+
+        MapRawTestCase.MapRawTestCase.tearDown(self)
+
+    def testSkeleton(self):
+        """
+        First test to check if the testcase is working with the testing framework.
+        """
+
+        #self.fail("Test if the testcase is working.")
+        self.assertTrue(True)
+
+    def test_init(self):
+        follower = MapRawFollower.MapRawFollower(self.mapRaw, pollInterval_s=0.5)
+        self.assertEqual(0.5, follower.pollInterval_s)
+        self.assertEqual(0, follower.numberRows)
+        self.assertFalse(follower.isComplete())
+
+        mapRaw = MapRawFormat.MapRawFormat(self.rawFilepaths[ParametersFile.RECORED_BY_IMAGE])
+        self.assertRaises(ValueError, MapRawFollower.MapRawFollower, mapRaw)
+
+    def _appendRaw(self, data):
+        with open(self.rawFilepath, 'ab') as rawFile:
+            rawFile.write(np.ascontiguousarray(data).tobytes())
+
+    def test_update(self):
+        follower = self.mapRaw.follow()
+        updates = []
+        follower.subscribe(lambda follower, rowStart, rowEnd: updates.append((rowStart, rowEnd)))
+
+        self.assertEqual(0, follower.update())
+
+        # Three rows and a partial row.
+        self._appendRaw(self.datacube[:3])
+        self._appendRaw(self.datacube[3, :2])
+        self.assertEqual(3, follower.update())
+        self.assertEqual(0, follower.update())
+
+        _channels, spectrum = follower.getSumSpectrum()
+        np.testing.assert_array_equal(np.sum(self.datacube[:3], axis=(0, 1)), spectrum)
+        image = follower.getTotalIntensityImage()
+        np.testing.assert_array_equal(np.sum(self.datacube[:3], axis=2), image[:3])
+        np.testing.assert_array_equal(0, image[3:])
+        self.assertFalse(follower.isComplete())
+
+        self._appendRaw(self.datacube[3, 2:])
+        self._appendRaw(self.datacube[4:])
+        self.assertEqual(6, follower.update())
+        self.assertTrue(follower.isComplete())
+
+        self.assertEqual([(0, 3), (3, 9)], updates)
+        _channels, spectrum = follower.getSumSpectrum()
+        np.testing.assert_array_equal(np.sum(self.datacube, axis=(0, 1)), spectrum)
+        np.testing.assert_array_equal(np.sum(self.datacube, axis=2), follower.getTotalIntensityImage())
+
+    def test_updatePreallocated(self):
+        # The whole file is written at once as a preallocated file.
+        self._appendRaw(self.datacube)
+        follower = self.mapRaw.follow()
+
+        self.assertEqual(3, follower.update(numberCompletedRows=3))
+        self.assertEqual(0, follower.update(numberCompletedRows=3))
+        _channels, spectrum = follower.getSumSpectrum()
+        np.testing.assert_array_equal(np.sum(self.datacube[:3], axis=(0, 1)), spectrum)
+        np.testing.assert_array_equal(0, follower.getTotalIntensityImage()[3:])
+
+        self.assertEqual(6, follower.update(numberCompletedRows=12))
+        self.assertTrue(follower.isComplete())
+        np.testing.assert_array_equal(np.sum(self.datacube, axis=2), follower.getTotalIntensityImage())
+
+    def test_follow(self):
+        follower = self.mapRaw.follow(pollInterval_s=0.01)
+
+        self._appendRaw(self.datacube[:5])
+        self.assertEqual([(0, 5)], list(follower.follow(timeout_s=0.05)))
+        self.assertEqual(5, follower.numberRows)
+
+        self._appendRaw(self.datacube[5:])
+        self.assertEqual([(5, 9)], list(follower))
+        self.assertTrue(follower.isComplete())
+
+    def test_recordByImage(self):
+        rawFilepath = self.rawFilepaths[ParametersFile.RECORED_BY_IMAGE]
+        self.assertRaises(ValueError, MapRawFormat.MapRawFormat(rawFilepath).follow)
+
+if __name__ == '__main__':  # pragma: no cover
+    import nose
+    nose.runmodule()
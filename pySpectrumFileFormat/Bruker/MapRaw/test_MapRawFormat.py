@@ -27,18 +27,24 @@ Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.MapRawFormat`.
 ###############################################################################
 
 # Standard library modules.
-import unittest
+import os.path
+import threading
+import time
+import weakref
 
 # Third party modules.
+import numpy as np
 
 # Local modules.
 
 # Project modules.
 import pySpectrumFileFormat.Bruker.MapRaw.MapRawFormat as MapRawFormat
+import pySpectrumFileFormat.Bruker.MapRaw.ParametersFile as ParametersFile
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawTestCase as MapRawTestCase
 
 # Globals and constants variables.
 
-class TestMapRawFormat(unittest.TestCase):
+class TestMapRawFormat(MapRawTestCase.MapRawTestCase):
     """
     TestCase class for the module `MapRawFormat`.
     """
@@ -48,14 +54,21 @@ class TestMapRawFormat(unittest.TestCase):
         Setup method.
         """
 
-        unittest.TestCase.setUp(self)
+        MapRawTestCase.MapRawTestCase.setUp(self)
+
+        self.mapRaws = {}
+        for recordBy, rawFilepath in self.rawFilepaths.items():
+            # Budget of two rows to force several stripes with a partial last one.
+            self.mapRaws[recordBy] = MapRawFormat.MapRawFormat(rawFilepath, memoryBudget_B=2*7*11*2)
 
     def tearDown(self):
         """
         Teardown method.
         """
 
-        unittest.TestCase.tearDown(self)
+        self.mapRaws = {}
+
+        MapRawTestCase.MapRawTestCase.tearDown(self)
 
     def testSkeleton(self):
         """
@@ -65,6 +78,441 @@ class TestMapRawFormat(unittest.TestCase):
         #self.fail("Test if the testcase is working.")
         self.assert_(True)
 
+    def test_iterRowStripes(self):
+        mapRaw = self.mapRaws[ParametersFile.RECORED_BY_VECTOR]
+
+        self.assertEqual(2, mapRaw._getStripeNumberRows())
+        self.assertEqual([(0, 2), (2, 4), (4, 6), (6, 8), (8, 9)], list(mapRaw._iterRowStripes()))
+        self.assertEqual([(3, 5), (5, 6)], list(mapRaw._iterRowStripes(3, 6)))
+
+        mapRaw.memoryBudget_B = 1
+        self.assertEqual(1, mapRaw._getStripeNumberRows())
+
+        mapRaw.memoryBudget_B = 1024*1024
+        mapRaw.workers = 4
+        self.assertEqual([(0, 3), (3, 6), (6, 9)], list(mapRaw._iterRowStripes()))
+
+    def test_workers(self):
+        for mapRaw in self.mapRaws.values():
+            mapRaw.workers = 3
+
+            _channels, spectrum = mapRaw.getTotalSpectrum()
+            np.testing.assert_array_equal(np.sum(self.datacube, axis=(0, 1)), spectrum)
+
+            image = mapRaw.getTotalIntensityImage()
+            np.testing.assert_array_equal(np.sum(self.datacube, axis=2), image)
+
+            _channels, spectrum = mapRaw.getROISpectrum(2, 4, 1, 7)
+            np.testing.assert_array_equal(np.sum(self.datacube[1:8, 2:5, :], axis=(0, 1)), spectrum)
+
+            image = mapRaw.getRoiIntensityImage((3, 8))
+            np.testing.assert_array_equal(np.sum(self.datacube[..., 3:8], axis=2), image)
+
+            pixels = mapRaw.getMaximumPixelSpectrumPixels()
+            flatPixels = np.argmax(self.datacube.reshape(-1, 11), axis=0)
+            np.testing.assert_array_equal(np.column_stack((flatPixels % 7, flatPixels // 7)), pixels)
+
+    def test_workersInFlight(self):
+        mapRaw = self.mapRaws[ParametersFile.RECORED_BY_VECTOR]
+        mapRaw.workers = 2
+        lock = threading.Lock()
+        numberStarted = [0]
+
+        def reduceStripe(stripe):
+            with lock:
+                numberStarted[0] += 1
+            return np.sum(stripe, axis=(0, 1))
+
+        numberStripes = 0
+        for index, (_rowStart, _rowEnd, _spectrum) in enumerate(mapRaw._mapStripes(reduceStripe)):
+            # Give the workers time to run ahead of this slow consumer.
+            time.sleep(0.01)
+            with lock:
+                self.assertTrue(numberStarted[0] <= index + mapRaw.workers)
+            numberStripes += 1
+
+        self.assertEqual(9, numberStripes)
+
+    def test_enableReadAhead(self):
+        pixels = self.datacube.reshape(-1, 11)
+
+        for mapRaw in self.mapRaws.values():
+            self.assertEqual(None, mapRaw.getReadThroughput_MBps())
+            mapRaw.enableReadAhead(chunkSize_B=3*7*11*2 + 10)
+
+            _channels, spectrum = mapRaw.getSumSpectrum()
+            np.testing.assert_array_equal(np.sum(pixels, axis=0), spectrum)
+            self.assertTrue(mapRaw.getReadThroughput_MBps() >= 0.0)
+
+            statistics = mapRaw.scan()
+            np.testing.assert_array_equal(np.sum(pixels, axis=0), statistics.totalSpectrum)
+            np.testing.assert_array_equal(np.sum(self.datacube, axis=2), statistics.totalIntensityImage)
+            np.testing.assert_array_equal(np.amin(pixels, axis=0), statistics.minimumPixelSpectrum)
+
+            _channels, spectrum = mapRaw.getROISpectrum(2, 4, 1, 7)
+            np.testing.assert_array_equal(np.sum(self.datacube[1:8, 2:5, :], axis=(0, 1)), spectrum)
+
+            labels = np.arange(63).reshape(9, 7) % 4
+            spectra, _counts = mapRaw.getLabelSpectra(labels)
+            np.testing.assert_array_equal(np.sum(self.datacube[labels == 3], axis=0), spectra[3])
+
+            mapRaw.disableReadAhead()
+
+        self.assertTrue(mapRaw.getReadThroughput_MBps() is not None)
+
+    def test_getSpectrum(self):
+        for mapRaw in self.mapRaws.values():
+            for pixelX, pixelY in [(0, 0), (3, 2), (6, 8)]:
+                channels, spectrum = mapRaw.getSpectrum(pixelX, pixelY)
+                np.testing.assert_array_equal(np.arange(11), channels)
+                np.testing.assert_array_equal(self.datacube[pixelY, pixelX, :], spectrum)
+
+    def test_enableSpectrumCache(self):
+        for mapRaw in self.mapRaws.values():
+            mapRaw.enableSpectrumCache(maximumSize_B=20*11*2, tileSize=4)
+            spectrumCache = mapRaw.getSpectrumCache()
+
+            _channels, spectrum = mapRaw.getSpectrum(3, 4)
+            np.testing.assert_array_equal(self.datacube[4, 3, :], spectrum)
+            self.assertEqual(0, spectrumCache.hits)
+            self.assertEqual(1, spectrumCache.misses)
+            self.assertEqual(16, len(spectrumCache))
+
+            for pixelX, pixelY in [(1, 2), (4, 5), (3, 3)]:
+                _channels, spectrum = mapRaw.getSpectrum(pixelX, pixelY)
+                np.testing.assert_array_equal(self.datacube[pixelY, pixelX, :], spectrum)
+            self.assertEqual(3, spectrumCache.hits)
+            self.assertEqual(1, spectrumCache.misses)
+            self.assertAlmostEqual(0.75, spectrumCache.getHitRatio())
+
+            _channels, spectrum = mapRaw.getSpectrum(6, 8)
+            np.testing.assert_array_equal(self.datacube[8, 6, :], spectrum)
+            self.assertEqual(2, spectrumCache.misses)
+            self.assertEqual(20, len(spectrumCache))
+            self.assertEqual(20*11*2, spectrumCache.size_B)
+            self.assertTrue((6, 8) in spectrumCache)
+            self.assertTrue((1, 2) in spectrumCache)
+            self.assertFalse((2, 2) in spectrumCache)
+
+            mapRaw.disableSpectrumCache()
+            self.assertEqual(None, mapRaw.getSpectrumCache())
+
+    def test_getTotalSpectrum(self):
+        expectedSpectrum = np.sum(self.datacube, axis=(0, 1))
+
+        for mapRaw in self.mapRaws.values():
+            channels, spectrum = mapRaw.getTotalSpectrum()
+            np.testing.assert_array_equal(np.arange(11), channels)
+            np.testing.assert_array_equal(expectedSpectrum, spectrum)
+            self.assertEqual(np.uint64, spectrum.dtype)
+
+    def test_getSumSpectrum(self):
+        expectedSpectrum = np.sum(self.datacube, axis=(0, 1))
+
+        for mapRaw in self.mapRaws.values():
+            channels, spectrum = mapRaw.getSumSpectrum()
+            np.testing.assert_array_equal(np.arange(11), channels)
+            np.testing.assert_array_equal(expectedSpectrum, spectrum)
+
+        mapRaw = self.mapRaws[ParametersFile.RECORED_BY_IMAGE]
+        channelStarts = [channelStart for channelStart, _planes in mapRaw._iterChannelPlanes()]
+        self.assertEqual([0, 2, 4, 6, 8, 10], channelStarts)
+
+        with open(mapRaw._rawFilepath, 'r+b') as rawFile:
+            rawFile.truncate(9*7*2*10)
+        self.assertRaises(IOError, mapRaw.getSumSpectrum)
+
+    def test_getTotalIntensityImage(self):
+        expectedImage = np.sum(self.datacube, axis=2)
+
+        for mapRaw in self.mapRaws.values():
+            image = mapRaw.getTotalIntensityImage()
+            np.testing.assert_array_equal(expectedImage, image)
+            self.assertEqual(np.uint64, image.dtype)
+
+    def test_getRoiIntensityImage(self):
+        expectedImage = np.sum(self.datacube[..., 3:8], axis=2)
+
+        for mapRaw in self.mapRaws.values():
+            image = mapRaw.getRoiIntensityImage((3, 8))
+            np.testing.assert_array_equal(expectedImage, image)
+
+    def test_getRoiIntensityImages(self):
+        channelRanges = [(3, 8), (0, 11), (5, 9), (5, 5), (9, 20), (-4, -1), (7, 2), (3, 8)]
+        expectedImages = [np.sum(self.datacube[..., slice(*channelRange)], axis=2) for channelRange in channelRanges]
+
+        for mapRaw in self.mapRaws.values():
+            images = mapRaw.getRoiIntensityImages(channelRanges)
+            self.assertEqual((8, 9, 7), images.shape)
+            np.testing.assert_array_equal(expectedImages, images)
+
+            images = mapRaw.getRoiIntensityImages([(4, 4)])
+            np.testing.assert_array_equal(np.zeros((1, 9, 7)), images)
+
+            mapRaw.memoryBudget_B = 1024*1024
+            mapRaw.buildEnergyIndex()
+            images = mapRaw.getRoiIntensityImages(channelRanges)
+            np.testing.assert_array_equal(expectedImages, images)
+
+    def test_getROISpectrum(self):
+        expectedSpectrum = np.sum(self.datacube[1:6, 2:5, :], axis=(0, 1))
+
+        for mapRaw in self.mapRaws.values():
+            _channels, spectrum = mapRaw.getROISpectrum(2, 4, 1, 5)
+            np.testing.assert_array_equal(expectedSpectrum, spectrum)
+
+    def test_getROISpectra(self):
+        rectangles = np.array([[2, 4, 1, 5], [0, 6, 0, 8], [3, 3, 7, 7], [0, 0, 0, 8]])
+        expectedSpectra = [np.sum(self.datacube[ymin:ymax+1, xmin:xmax+1, :], axis=(0, 1))
+                           for xmin, xmax, ymin, ymax in rectangles]
+
+        for mapRaw in self.mapRaws.values():
+            _channels, spectra = mapRaw.getROISpectra(rectangles)
+            np.testing.assert_array_equal(expectedSpectra, spectra)
+
+            self.assertRaises(ValueError, mapRaw.buildRoiIndex, persist=False)
+            self.assertEqual(None, mapRaw._roiIndex)
+
+            mapRaw.memoryBudget_B = 10*8*11*8
+            mapRaw.buildRoiIndex(persist=False)
+            self.assertEqual((10, 8, 11), mapRaw._roiIndex.shape)
+            _channels, spectra = mapRaw.getROISpectra(rectangles)
+            np.testing.assert_array_equal(expectedSpectra, spectra)
+            self.assertEqual(np.uint64, spectra.dtype)
+
+            for rectangle, expectedSpectrum in zip(rectangles, expectedSpectra):
+                _channels, spectrum = mapRaw.getROISpectrum(*rectangle)
+                np.testing.assert_array_equal(expectedSpectrum, spectrum)
+
+    def test_getROISpectraOutOfBounds(self):
+        rectangles = np.array([[-2, 3, 5, 12], [4, 20, -3, 1], [-5, -1, 0, 8], [8, 10, 0, 8], [5, 2, 0, 8]])
+        expectedSpectra = [np.sum(self.datacube[5:9, 0:4, :], axis=(0, 1)),
+                           np.sum(self.datacube[0:2, 4:7, :], axis=(0, 1)),
+                           np.zeros(11), np.zeros(11), np.zeros(11)]
+
+        for mapRaw in self.mapRaws.values():
+            _channels, spectra = mapRaw.getROISpectra(rectangles)
+            np.testing.assert_array_equal(expectedSpectra, spectra)
+
+            mapRaw.memoryBudget_B = 1024*1024
+            mapRaw.buildRoiIndex(persist=False)
+            _channels, spectra = mapRaw.getROISpectra(rectangles)
+            np.testing.assert_array_equal(expectedSpectra, spectra)
+
+            _channels, spectrum = mapRaw.getROISpectrum(-2, 3, 5, 12)
+            np.testing.assert_array_equal(expectedSpectra[0], spectrum)
+
+    def test_buildRoiIndex(self):
+        mapRaw = self.mapRaws[ParametersFile.RECORED_BY_IMAGE]
+        self.assertFalse(mapRaw.loadRoiIndex())
+
+        mapRaw.buildRoiIndex()
+        indexFilepath = os.path.join(self.path, "map_image" + MapRawFormat.ROI_INDEX_EXTENSION)
+        self.assertTrue(os.path.isfile(indexFilepath))
+
+        mapRaw = MapRawFormat.MapRawFormat(mapRaw._rawFilepath)
+        self.assertTrue(mapRaw.loadRoiIndex())
+        _channels, spectrum = mapRaw.getROISpectrum(1, 5, 2, 6)
+        np.testing.assert_array_equal(np.sum(self.datacube[2:7, 1:6, :], axis=(0, 1)), spectrum)
+
+        # No memory map of the loaded index is left when the rebuilt index replaces its file.
+        loadedIndex = weakref.ref(mapRaw._roiIndex)
+        saveIndex = mapRaw._saveIndex
+        openIndexes = []
+
+        def checkSaveIndex(extension, sourceKey):
+            openIndexes.append(loadedIndex() is not None)
+            saveIndex(extension, sourceKey)
+
+        mapRaw._saveIndex = checkSaveIndex
+        mapRaw.buildRoiIndex()
+        self.assertEqual([False], openIndexes)
+        _channels, spectrum = mapRaw.getROISpectrum(1, 5, 2, 6)
+        np.testing.assert_array_equal(np.sum(self.datacube[2:7, 1:6, :], axis=(0, 1)), spectrum)
+
+        # A query drops the index when the raw file changed.
+        modifiedTime = os.path.getmtime(indexFilepath) + 10.0
+        os.utime(mapRaw._rawFilepath, (modifiedTime, modifiedTime))
+        self.assertEqual(None, mapRaw._getRoiIndex())
+        self.assertTrue(mapRaw.checkIndex())
+        mapRaw = MapRawFormat.MapRawFormat(mapRaw._rawFilepath)
+        self.assertFalse(mapRaw.loadRoiIndex())
+
+        # Only checkIndex compares the rpl file.
+        mapRaw.buildRoiIndex()
+        parameters = mapRaw.getParameters()
+        parameters.energy_keV = 15.0
+        parameters.write(mapRaw._rawFilepath.replace('.raw', '.rpl'))
+        self.assertTrue(mapRaw._getRoiIndex() is not None)
+        self.assertFalse(mapRaw.checkIndex())
+        self.assertEqual(None, mapRaw._getRoiIndex())
+
+    def test_indexRawRewritten(self):
+        mapRaw = self.mapRaws[ParametersFile.RECORED_BY_VECTOR]
+        mapRaw.memoryBudget_B = 1024*1024
+        mapRaw.buildRoiIndex(persist=False)
+        mapRaw.buildEnergyIndex()
+
+        # Same size, new content and a later modification time.
+        datacube = self.datacube + 1
+        MapRawTestCase.createMapRawFile(mapRaw._rawFilepath, datacube, ParametersFile.RECORED_BY_VECTOR)
+        modifiedTime = os.path.getmtime(mapRaw._rawFilepath) + 10.0
+        os.utime(mapRaw._rawFilepath, (modifiedTime, modifiedTime))
+        mapRaw._data = None
+
+        _channels, spectrum = mapRaw.getROISpectrum(2, 4, 1, 5)
+        np.testing.assert_array_equal(np.sum(datacube[1:6, 2:5, :], axis=(0, 1)), spectrum)
+        self.assertEqual(None, mapRaw._roiIndex)
+
+        image = mapRaw.getRoiIntensityImage((3, 8))
+        np.testing.assert_array_equal(np.sum(datacube[..., 3:8], axis=2), image)
+        self.assertEqual(None, mapRaw._energyIndex)
+
+    def test_buildEnergyIndex(self):
+        channelRanges = [(3, 8), (0, 11), (5, 5), (9, 20), (-4, -1), (7, 2)]
+
+        for mapRaw in self.mapRaws.values():
+            self.assertRaises(ValueError, mapRaw.buildEnergyIndex)
+            self.assertEqual(None, mapRaw._energyIndex)
+
+            mapRaw.memoryBudget_B = 12*9*7*8
+            mapRaw.buildEnergyIndex()
+            self.assertEqual((12, 9, 7), mapRaw._energyIndex.shape)
+
+            for channelRange in channelRanges:
+                image = mapRaw.getRoiIntensityImage(channelRange)
+                np.testing.assert_array_equal(np.sum(self.datacube[..., slice(*channelRange)], axis=2), image)
+
+        mapRaw = self.mapRaws[ParametersFile.RECORED_BY_VECTOR]
+        self.assertFalse(mapRaw.loadEnergyIndex())
+        mapRaw.buildEnergyIndex(persist=True)
+        indexFilepath = os.path.join(self.path, "map_vector" + MapRawFormat.ENERGY_INDEX_EXTENSION)
+        self.assertTrue(os.path.isfile(indexFilepath))
+
+        mapRaw = MapRawFormat.MapRawFormat(mapRaw._rawFilepath)
+        self.assertTrue(mapRaw.loadEnergyIndex())
+        np.testing.assert_array_equal(np.sum(self.datacube[..., 2:9], axis=2), mapRaw.getRoiIntensityImage((2, 9)))
+
+        with open(mapRaw._rawFilepath.replace('.raw', '.rpl'), 'a') as parametersFile:
+            parametersFile.write("\n")
+        self.assertTrue(mapRaw._getEnergyIndex() is not None)
+        self.assertFalse(mapRaw.checkIndex())
+        self.assertEqual(None, mapRaw._getEnergyIndex())
+        self.assertFalse(mapRaw.loadEnergyIndex())
+
+    def test_getMaximumPixelSpectrum(self):
+        expectedSpectrum = np.amax(self.datacube, axis=(0, 1))
+
+        for mapRaw in self.mapRaws.values():
+            _channels, spectrum = mapRaw.getMaximumPixelSpectrum()
+            np.testing.assert_array_equal(expectedSpectrum, spectrum)
+
+    def test_getMaximumPixelSpectrumPixels(self):
+        flatPixels = np.argmax(self.datacube.reshape(-1, 11), axis=0)
+        expectedPixels = np.column_stack((flatPixels % 7, flatPixels // 7))
+
+        for mapRaw in self.mapRaws.values():
+            pixels = mapRaw.getMaximumPixelSpectrumPixels()
+            self.assertEqual((11, 2), pixels.shape)
+            np.testing.assert_array_equal(expectedPixels, pixels)
+            for channel, (pixelX, pixelY) in enumerate(pixels):
+                self.assertEqual(self.datacube[..., channel].max(), self.datacube[pixelY, pixelX, channel])
+
+    def test_getMaximumPixelSpectrum2(self):
+        expectedSpectrum = np.amax(self.datacube, axis=(0, 1))
+
+        for mapRaw in self.mapRaws.values():
+            _channels, spectrum = mapRaw.getMaximumPixelSpectrum2()
+            np.testing.assert_array_equal(expectedSpectrum, spectrum)
+
+    def test_getLabelSpectra(self):
+        labels = np.random.RandomState(2).randint(-1, 4, size=(9, 7))
+        labels[:, 6] = 5
+
+        for mapRaw in self.mapRaws.values():
+            for workers in [1, 2]:
+                mapRaw.workers = workers
+                spectra, counts = mapRaw.getLabelSpectra(labels)
+
+                self.assertEqual((6, 11), spectra.shape)
+                self.assertEqual(np.uint64, spectra.dtype)
+                for label in range(6):
+                    np.testing.assert_array_equal(np.sum(self.datacube[labels == label], axis=0), spectra[label])
+                    self.assertEqual(np.count_nonzero(labels == label), counts[label])
+                self.assertEqual(0, counts[4])
+
+        spectra, counts = mapRaw.getLabelSpectra(labels, numberLabels=2)
+        self.assertEqual((2, 11), spectra.shape)
+        np.testing.assert_array_equal(np.sum(self.datacube[labels == 1], axis=0), spectra[1])
+        np.testing.assert_array_equal([np.count_nonzero(labels == 0), np.count_nonzero(labels == 1)], counts)
+
+        spectra, counts = mapRaw.getLabelSpectra(-3*np.ones((9, 7), dtype=int))
+        self.assertEqual((0, 11), spectra.shape)
+        self.assertEqual((0,), counts.shape)
+
+        self.assertRaises(ValueError, mapRaw.getLabelSpectra, labels[:8])
+        self.assertRaises(ValueError, mapRaw.getLabelSpectra, labels.astype(float))
+
+    def test_convertRecordBy(self):
+        for recordBy, mapRaw in self.mapRaws.items():
+            outputRawFilepath = os.path.join(self.path, "converted_%s.raw" % recordBy)
+            mapRaw.convertRecordBy(outputRawFilepath)
+
+            convertedMapRaw = MapRawFormat.MapRawFormat(outputRawFilepath)
+            parameters = convertedMapRaw.getParameters()
+            self.assertNotEqual(recordBy, parameters.recordBy)
+            self.assertEqual(9*7*11*2, os.path.getsize(outputRawFilepath))
+            self.assertEqual(20.0, parameters.energy_keV)
+
+            _channels, datacube = convertedMapRaw.getDataCube()
+            np.testing.assert_array_equal(self.datacube, datacube)
+
+    def test_scan(self):
+        pixels = self.datacube.reshape(-1, 11)
+        flatPixels = np.argmax(pixels, axis=0)
+        expectedPixels = np.column_stack((flatPixels % 7, flatPixels // 7))
+
+        for mapRaw in self.mapRaws.values():
+            statistics = mapRaw.scan()
+
+            self.assertEqual(63, statistics.numberPixels)
+            np.testing.assert_array_equal(np.arange(11), statistics.channels)
+            np.testing.assert_array_equal(np.sum(pixels, axis=0), statistics.totalSpectrum)
+            np.testing.assert_array_equal(np.sum(self.datacube, axis=2), statistics.totalIntensityImage)
+            np.testing.assert_array_equal(np.amax(pixels, axis=0), statistics.maximumPixelSpectrum)
+            np.testing.assert_array_equal(np.amin(pixels, axis=0), statistics.minimumPixelSpectrum)
+            np.testing.assert_array_equal(expectedPixels, statistics.maximumPixelSpectrumPixels)
+            np.testing.assert_allclose(np.mean(pixels, axis=0), statistics.meanSpectrum)
+            np.testing.assert_allclose(np.var(pixels, axis=0), statistics.varianceSpectrum)
+
+        # The stripes are sized on the two float64 temporaries of each value.
+        itemSizes_B = []
+        mapStripes = mapRaw._mapStripes
+
+        def recordItemSize(function, rowStart=0, rowEnd=None, itemSize_B=None):
+            itemSizes_B.append(itemSize_B)
+            return mapStripes(function, rowStart, rowEnd, itemSize_B)
+
+        mapRaw._mapStripes = recordItemSize
+        mapRaw.scan()
+        self.assertEqual([16], itemSizes_B)
+
+    def test_scanEmpty(self):
+        rawFilepath = os.path.join(self.path, "empty.raw")
+        datacube = np.zeros((0, 7, 11), dtype=np.uint16)
+        MapRawTestCase.createMapRawFile(rawFilepath, datacube, ParametersFile.RECORED_BY_VECTOR)
+        mapRaw = MapRawFormat.MapRawFormat(rawFilepath)
+
+        statistics = mapRaw.scan()
+
+        self.assertEqual(0, statistics.numberPixels)
+        self.assertEqual((0, 7), statistics.totalIntensityImage.shape)
+        np.testing.assert_array_equal(np.zeros(11), statistics.totalSpectrum)
+        np.testing.assert_array_equal(np.zeros(11), statistics.meanSpectrum)
+        np.testing.assert_array_equal(np.zeros(11), statistics.varianceSpectrum)
+        self.assertEqual(None, statistics.maximumPixelSpectrum)
+        self.assertEqual(None, statistics.maximumPixelSpectrumPixels)
+
 if __name__ == '__main__':  # pragma: no cover
     import nose
     nose.runmodule()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.test_MapRawWriter
+   :synopsis: Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.MapRawWriter`
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.MapRawWriter`.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import unittest
+import tempfile
+import shutil
+import os.path
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawWriter as MapRawWriter
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawFormat as MapRawFormat
+import pySpectrumFileFormat.Bruker.MapRaw.ParametersFile as ParametersFile
+
+# Globals and constants variables.
+
+class TestMapRawWriter(unittest.TestCase):
+    """
+    TestCase class for the module `MapRawWriter`.
+    """
+
+    def setUp(self):
+        """
+        Setup method.
+        """
+
+        unittest.TestCase.setUp(self)
+
+        self.path = tempfile.mkdtemp()
+
+        randomState = np.random.RandomState(12345)
+        self.datacube = randomState.randint(0, 50, size=(9, 7, 11)).astype(np.uint16)
+
+        self.parameters = ParametersFile.ParametersFile()
+        self.parameters.width = 7
+        self.parameters.height = 9
+        self.parameters.depth = 11
+        self.parameters.energy_keV = 20.0
+        MapRawWriter.setParametersDataType(self.parameters, np.uint16)
+
+    def tearDown(self):
+        """
+        Teardown method.
+        """
+
+        unittest.TestCase.tearDown(self)
+
+        shutil.rmtree(self.path)
+
+    def testSkeleton(self):
+        """
+        First test to check if the testcase is working with the testing framework.
+        """
+
+        #self.fail("Test if the testcase is working.")
+        self.assertTrue(True)
+
+    def _createWriter(self, recordBy, flushInterval_B=MapRawWriter.DEFAULT_FLUSH_INTERVAL_B):
+        self.parameters.recordBy = recordBy
+        rawFilepath = os.path.join(self.path, "map_%s.raw" % recordBy)
+
+        return rawFilepath, MapRawWriter.MapRawWriter(rawFilepath, self.parameters, flushInterval_B)
+
+    def _checkMap(self, rawFilepath, recordBy):
+        mapRaw = MapRawFormat.MapRawFormat(rawFilepath)
+        parameters = mapRaw.getParameters()
+        self.assertEqual(recordBy, parameters.recordBy)
+        self.assertEqual(0, parameters.offset)
+        self.assertEqual(ParametersFile.DATA_TYPE_UNSIGNED, parameters.dataType)
+        self.assertEqual(20.0, parameters.energy_keV)
+
+        _channels, datacube = mapRaw.getDataCube()
+        np.testing.assert_array_equal(self.datacube, datacube)
+
+    def test_writeSpectrum(self):
+        for recordBy in [ParametersFile.RECORED_BY_VECTOR, ParametersFile.RECORED_BY_IMAGE]:
+            rawFilepath, writer = self._createWriter(recordBy)
+            self.assertEqual(9*7*11*2, os.path.getsize(rawFilepath))
+
+            for pixelY in range(9):
+                for pixelX in range(7):
+                    writer.writeSpectrum(pixelX, pixelY, self.datacube[pixelY, pixelX, :])
+
+            self.assertFalse(os.path.isfile(rawFilepath.replace('.raw', '.rpl')))
+            writer.close()
+            self.assertTrue(writer.isClosed())
+            self.assertEqual(9*7*11*2, writer.written_B)
+
+            self._checkMap(rawFilepath, recordBy)
+
+    def test_writeRows(self):
+        for recordBy in [ParametersFile.RECORED_BY_VECTOR, ParametersFile.RECORED_BY_IMAGE]:
+            rawFilepath, writer = self._createWriter(recordBy, flushInterval_B=3*7*11*2)
+            with writer:
+                for rowStart in range(0, 9, 2):
+                    writer.writeRows(rowStart, self.datacube[rowStart:rowStart + 2])
+                    self.assertTrue(writer._unflushed_B < 3*7*11*2)
+
+            self._checkMap(rawFilepath, recordBy)
+            self.assertRaises(ValueError, writer.writeRows, 0, self.datacube)
+
+    def test_writeTile(self):
+        for recordBy in [ParametersFile.RECORED_BY_VECTOR, ParametersFile.RECORED_BY_IMAGE]:
+            rawFilepath, writer = self._createWriter(recordBy, flushInterval_B=None)
+            with writer:
+                for pixelY in range(0, 9, 4):
+                    for pixelX in range(0, 7, 4):
+                        writer.writeTile(pixelX, pixelY, self.datacube[pixelY:pixelY + 4, pixelX:pixelX + 4])
+                self.assertEqual(9*7*11*2, writer._unflushed_B)
+
+            self._checkMap(rawFilepath, recordBy)
+
+    def test_discard(self):
+        for recordBy in [ParametersFile.RECORED_BY_VECTOR, ParametersFile.RECORED_BY_IMAGE]:
+            rawFilepath, writer = self._createWriter(recordBy)
+
+            def writePartialMap():
+                with writer:
+                    writer.writeRows(0, self.datacube[:3])
+                    raise RuntimeError("Acquisition stopped")
+
+            self.assertRaises(RuntimeError, writePartialMap)
+            self.assertTrue(writer.isClosed())
+            self.assertFalse(os.path.isfile(rawFilepath.replace('.raw', '.rpl')))
+            self.assertFalse(os.path.isfile(rawFilepath))
+
+    def test_setParametersDataType(self):
+        parameters = ParametersFile.ParametersFile()
+
+        MapRawWriter.setParametersDataType(parameters, np.float32)
+        self.assertEqual(ParametersFile.DATA_TYPE_FLOAT, parameters.dataType)
+        self.assertEqual(4, parameters.dataLength_B)
+        self.assertEqual(ParametersFile.BYTE_ORDER_LITTLE_ENDIAN, parameters.byteOrder)
+
+        MapRawWriter.setParametersDataType(parameters, np.int8)
+        self.assertEqual(ParametersFile.DATA_TYPE_SIGNED, parameters.dataType)
+        self.assertEqual(1, parameters.dataLength_B)
+
+        self.assertRaises(TypeError, MapRawWriter.setParametersDataType, parameters, np.complex64)
+
+if __name__ == '__main__':  # pragma: no cover
+    import nose
+    nose.runmodule()
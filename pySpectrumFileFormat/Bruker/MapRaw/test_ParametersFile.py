@@ -29,9 +29,12 @@ Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.ParametersFile`
 # Standard library modules.
 import unittest
 import os.path
+import tempfile
+import shutil
 
 # Third party modules.
 from nose.plugins.skip import SkipTest
+import numpy as np
 
 # Local modules.
 
@@ -90,6 +93,58 @@ class TestParametersFile(unittest.TestCase):
 
         #self.fail("Test if the testcase is working.")
 
+    def test_write(self):
+        path = tempfile.mkdtemp()
+        filepath = os.path.join(path, "write.rpl")
+
+        parameters = ParametersFile.ParametersFile()
+        parameters.width = 64
+        parameters.height = 32
+        parameters.depth = 1024
+        parameters.offset = 0
+        parameters.dataLength_B = 2
+        parameters.dataType = ParametersFile.DATA_TYPE_UNSIGNED
+        parameters.byteOrder = ParametersFile.BYTE_ORDER_LITTLE_ENDIAN
+        parameters.recordBy = ParametersFile.RECORED_BY_IMAGE
+        parameters.write(filepath)
+
+        with open(filepath, 'r') as parametersFile:
+            self.assertNotIn("None", parametersFile.read())
+
+        parametersRead = ParametersFile.ParametersFile()
+        parametersRead.read(filepath)
+        shutil.rmtree(path)
+
+        self.assertEqual(64, parametersRead.width)
+        self.assertEqual(32, parametersRead.height)
+        self.assertEqual(1024, parametersRead.depth)
+        self.assertEqual(0, parametersRead.offset)
+        self.assertEqual(2, parametersRead.dataLength_B)
+        self.assertEqual(ParametersFile.DATA_TYPE_UNSIGNED, parametersRead.dataType)
+        self.assertEqual(ParametersFile.BYTE_ORDER_LITTLE_ENDIAN, parametersRead.byteOrder)
+        self.assertEqual(ParametersFile.RECORED_BY_IMAGE, parametersRead.recordBy)
+        self.assertEqual(None, parametersRead.energy_keV)
+        self.assertEqual(None, parametersRead.pixel_size_nm)
+
+    def test_getDataType(self):
+        parameters = ParametersFile.ParametersFile()
+        parameters.dataLength_B = 2
+        parameters.dataType = ParametersFile.DATA_TYPE_UNSIGNED
+        parameters.byteOrder = ParametersFile.BYTE_ORDER_LITTLE_ENDIAN
+        self.assertEqual(np.dtype('<u2'), ParametersFile.getDataType(parameters))
+
+        parameters.dataLength_B = 4
+        parameters.dataType = ParametersFile.DATA_TYPE_FLOAT
+        parameters.byteOrder = 'big-endian'
+        self.assertEqual(np.dtype('>f4'), ParametersFile.getDataType(parameters))
+
+        parameters.dataType = ParametersFile.DATA_TYPE_SIGNED
+        parameters.byteOrder = ParametersFile.BYTE_ORDER_DONT_CARE
+        self.assertEqual(np.dtype('=i4'), ParametersFile.getDataType(parameters))
+
+        parameters.dataType = None
+        self.assertRaises(TypeError, ParametersFile.getDataType, parameters)
+
 if __name__ == '__main__':  # pragma: no cover
     import nose
     nose.runmodule()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.test_ReadAheadReader
+   :synopsis: Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.ReadAheadReader`
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.ReadAheadReader`.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import unittest
+import tempfile
+import shutil
+import os.path
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.ReadAheadReader as ReadAheadReader
+
+# Globals and constants variables.
+
+class TestReadAheadReader(unittest.TestCase):
+    """
+    TestCase class for the module `ReadAheadReader`.
+    """
+
+    def setUp(self):
+        """
+        Setup method.
+        """
+
+        unittest.TestCase.setUp(self)
+
+        self.path = tempfile.mkdtemp()
+
+        self.data = np.random.RandomState(12345).randint(0, 256, size=1000).astype(np.uint8)
+        self.filepath = os.path.join(self.path, "data.raw")
+        self.data.tofile(self.filepath)
+
+    def tearDown(self):
+        """
+        Teardown method.
+        """
+
+        unittest.TestCase.tearDown(self)
+
+        shutil.rmtree(self.path)
+
+    def testSkeleton(self):
+        """
+        First test to check if the testcase is working with the testing framework.
+        """
+
+        #self.fail("Test if the testcase is working.")
+        self.assertTrue(True)
+
+    def test_iter(self):
+        reader = ReadAheadReader.ReadAheadReader(self.filepath, chunkSize_B=128)
+        chunks = [chunk.copy() for chunk in reader]
+
+        self.assertEqual(8, len(chunks))
+        self.assertEqual(1000 - 7*128, len(chunks[-1]))
+        np.testing.assert_array_equal(self.data, np.concatenate(chunks))
+        self.assertEqual(1000, reader.read_B)
+        self.assertTrue(reader.getThroughput_MBps() > 0.0)
+
+        reader = ReadAheadReader.ReadAheadReader(self.filepath, offset=100, length_B=500, chunkSize_B=100)
+        chunks = [chunk.copy() for chunk in reader]
+        self.assertEqual(5, len(chunks))
+        np.testing.assert_array_equal(self.data[100:600], np.concatenate(chunks))
+
+    def test_reusedBuffers(self):
+        reader = ReadAheadReader.ReadAheadReader(self.filepath, chunkSize_B=100)
+
+        buffers = set()
+        for chunk in reader:
+            buffers.add(chunk.__array_interface__['data'][0])
+
+        self.assertEqual(2, len(buffers))
+
+    def test_stop(self):
+        reader = ReadAheadReader.ReadAheadReader(self.filepath, chunkSize_B=10)
+
+        for index, chunk in enumerate(reader):
+            if index == 2:
+                break
+
+        np.testing.assert_array_equal(self.data[20:30], chunk)
+        self.assertTrue(reader.read_B < 1000)
+
+    def test_endOfFile(self):
+        reader = ReadAheadReader.ReadAheadReader(self.filepath, offset=900, length_B=200, chunkSize_B=64)
+
+        self.assertRaises(IOError, list, reader)
+        self.assertRaises(ValueError, ReadAheadReader.ReadAheadReader, self.filepath, chunkSize_B=0)
+
+if __name__ == '__main__':  # pragma: no cover
+    import nose
+    nose.runmodule()
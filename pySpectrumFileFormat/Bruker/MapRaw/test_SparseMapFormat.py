@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.test_SparseMapFormat
+   :synopsis: Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.SparseMapFormat`
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.SparseMapFormat`.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import os.path
+
+# Third party modules.
+import numpy as np
+import scipy.sparse
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.SparseMapFormat as SparseMapFormat
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawFormat as MapRawFormat
+import pySpectrumFileFormat.Bruker.MapRaw.ParametersFile as ParametersFile
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawTestCase as MapRawTestCase
+
+# Globals and constants variables.
+
+class TestSparseMapFormat(MapRawTestCase.MapRawTestCase):
+    """
+    TestCase class for the module `SparseMapFormat`.
+    """
+
+    def setUp(self):
+        """
+        Setup method.
+        """
+
+        MapRawTestCase.MapRawTestCase.setUp(self)
+
+        self.mapRaws = {}
+        self.sparseMaps = {}
+        for recordBy, rawFilepath in self.rawFilepaths.items():
+            self.mapRaws[recordBy] = MapRawFormat.MapRawFormat(rawFilepath, memoryBudget_B=2*7*11*2)
+            self.sparseMaps[recordBy] = self.mapRaws[recordBy].getSparseMap()
+
+    def tearDown(self):
+        """
+        Teardown method.
+        """
+
+        self.mapRaws = {}
+        self.sparseMaps = {}
+
+        MapRawTestCase.MapRawTestCase.tearDown(self)
+
+    def createDatacube(self, randomState):
+        return randomState.poisson(0.1, size=(9, 7, 11)).astype(np.uint16)
+
+    def testSkeleton(self):
+        """
+        First test to check if the testcase is working with the testing framework.
+        """
+
+        #self.fail("Test if the testcase is working.")
+        self.assertTrue(True)
+
+    def test_init(self):
+        parameters = self.mapRaws[ParametersFile.RECORED_BY_VECTOR].getParameters()
+        matrix = scipy.sparse.coo_matrix(self.datacube.reshape(-1, 11))
+
+        sparseMap = SparseMapFormat.SparseMapFormat(parameters, matrix, np.uint32)
+
+        self.assertTrue(parameters is sparseMap.getParameters())
+        self.assertEqual('csr', sparseMap.getMatrix().format)
+        np.testing.assert_array_equal(self.datacube.reshape(-1, 11), sparseMap.getMatrix().toarray())
+        _channels, spectrum = sparseMap.getTotalSpectrum()
+        self.assertEqual(np.uint32, spectrum.dtype)
+
+    def test_getMatrix(self):
+        for sparseMap in self.sparseMaps.values():
+            matrix = sparseMap.getMatrix()
+            self.assertEqual((63, 11), matrix.shape)
+            self.assertEqual(np.count_nonzero(self.datacube), matrix.nnz)
+            self.assertEqual(np.uint16, matrix.dtype)
+            np.testing.assert_array_equal(self.datacube.reshape(-1, 11), matrix.toarray())
+
+            self.assertAlmostEqual(np.count_nonzero(self.datacube)/693.0, sparseMap.getDensity())
+
+    def test_getSparseMap(self):
+        mapRaw = self.mapRaws[ParametersFile.RECORED_BY_VECTOR]
+        sparseFilepath = os.path.join(self.path, "map_vector" + MapRawFormat.SPARSE_EXTENSION)
+        self.assertFalse(os.path.isfile(sparseFilepath))
+
+        mapRaw.getSparseMap(persist=True)
+        self.assertTrue(os.path.isfile(sparseFilepath))
+        self.assertTrue(mapRaw._isSidecarCurrent(sparseFilepath, mapRaw._getSourceKey()))
+
+        sparseMap = MapRawFormat.MapRawFormat(mapRaw._rawFilepath).getSparseMap()
+        np.testing.assert_array_equal(self.datacube.reshape(-1, 11), sparseMap.getMatrix().toarray())
+
+    def test_getSpectrum(self):
+        for sparseMap in self.sparseMaps.values():
+            for pixelX, pixelY in [(0, 0), (3, 2), (6, 8)]:
+                channels, spectrum = sparseMap.getSpectrum(pixelX, pixelY)
+                np.testing.assert_array_equal(np.arange(11), channels)
+                np.testing.assert_array_equal(self.datacube[pixelY, pixelX, :], spectrum)
+
+            for pixelX, pixelY in [(-1, 0), (0, -1), (7, 0), (0, 9)]:
+                self.assertRaises(IndexError, sparseMap.getSpectrum, pixelX, pixelY)
+
+    def test_getROISpectraOutOfBounds(self):
+        rectangles = [(-1, 1, 0, 0), (0, 0, -1, 0), (5, 10, 7, 12), (-3, -1, 0, 8), (7, 9, 0, 8)]
+        mapRaw = self.mapRaws[ParametersFile.RECORED_BY_VECTOR]
+        _channels, expectedSpectra = mapRaw.getROISpectra(rectangles)
+
+        for sparseMap in self.sparseMaps.values():
+            _channels, spectra = sparseMap.getROISpectra(rectangles)
+            np.testing.assert_array_equal(expectedSpectra, spectra)
+            self.assertEqual(np.uint64, spectra.dtype)
+
+            for rectangle, expectedSpectrum in zip(rectangles, expectedSpectra):
+                _channels, spectrum = sparseMap.getROISpectrum(*rectangle)
+                np.testing.assert_array_equal(expectedSpectrum, spectrum)
+
+        np.testing.assert_array_equal(np.sum(self.datacube[0, 0:2, :], axis=0), expectedSpectra[0])
+        np.testing.assert_array_equal(self.datacube[0, 0, :], expectedSpectra[1])
+        np.testing.assert_array_equal(0, expectedSpectra[3:])
+
+    def test_reductions(self):
+        for sparseMap in self.sparseMaps.values():
+            _channels, spectrum = sparseMap.getTotalSpectrum()
+            np.testing.assert_array_equal(np.sum(self.datacube, axis=(0, 1)), spectrum)
+            self.assertEqual(np.uint64, spectrum.dtype)
+
+            _channels, spectrum = sparseMap.getSumSpectrum()
+            np.testing.assert_array_equal(np.sum(self.datacube, axis=(0, 1)), spectrum)
+
+            _channels, spectrum = sparseMap.getROISpectrum(2, 5, 1, 6)
+            np.testing.assert_array_equal(np.sum(self.datacube[1:7, 2:6, :], axis=(0, 1)), spectrum)
+
+            image = sparseMap.getTotalIntensityImage()
+            np.testing.assert_array_equal(np.sum(self.datacube, axis=2), image)
+
+            image = sparseMap.getRoiIntensityImage((3, 8))
+            np.testing.assert_array_equal(np.sum(self.datacube[..., 3:8], axis=2), image)
+
+if __name__ == '__main__':  # pragma: no cover
+    import nose
+    nose.runmodule()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.test_SpectrumCache
+   :synopsis: Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.SpectrumCache`
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.SpectrumCache`.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import unittest
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.SpectrumCache as SpectrumCache
+
+# Globals and constants variables.
+
+class TestSpectrumCache(unittest.TestCase):
+    """
+    TestCase class for the module `SpectrumCache`.
+    """
+
+    def setUp(self):
+        """
+        Setup method.
+        """
+
+        unittest.TestCase.setUp(self)
+
+    def tearDown(self):
+        """
+        Teardown method.
+        """
+
+        unittest.TestCase.tearDown(self)
+
+    def testSkeleton(self):
+        """
+        First test to check if the testcase is working with the testing framework.
+        """
+
+        #self.fail("Test if the testcase is working.")
+        self.assertTrue(True)
+
+    def test_get(self):
+        spectrumCache = SpectrumCache.SpectrumCache(maximumSize_B=3*8*2)
+        self.assertEqual(0.0, spectrumCache.getHitRatio())
+
+        spectrum = np.arange(8, dtype=np.uint16)
+        spectrumCache.put((0, 0), spectrum)
+        spectrum[0] = 100
+
+        cachedSpectrum = spectrumCache.get((0, 0))
+        np.testing.assert_array_equal(np.arange(8), cachedSpectrum)
+        self.assertFalse(cachedSpectrum.flags.writeable)
+        self.assertEqual(None, spectrumCache.get((1, 0)))
+        self.assertEqual(1, spectrumCache.hits)
+        self.assertEqual(1, spectrumCache.misses)
+        self.assertAlmostEqual(0.5, spectrumCache.getHitRatio())
+
+    def test_put(self):
+        spectrumCache = SpectrumCache.SpectrumCache(maximumSize_B=3*8*2)
+
+        for pixelX in range(3):
+            spectrumCache.put((pixelX, 0), np.full(8, pixelX, dtype=np.uint16))
+        self.assertEqual(3, len(spectrumCache))
+        self.assertEqual(48, spectrumCache.size_B)
+
+        spectrumCache.put((1, 0), np.full(8, 10, dtype=np.uint16))
+        self.assertEqual(3, len(spectrumCache))
+        self.assertEqual(48, spectrumCache.size_B)
+
+        # The least recently used pixel is evicted first.
+        spectrumCache.get((0, 0))
+        spectrumCache.put((3, 0), np.full(8, 3, dtype=np.uint16))
+        self.assertEqual(3, len(spectrumCache))
+        self.assertTrue((0, 0) in spectrumCache)
+        self.assertFalse((2, 0) in spectrumCache)
+        np.testing.assert_array_equal(np.full(8, 10), spectrumCache.get((1, 0)))
+
+        spectrumCache.clear()
+        self.assertEqual(0, len(spectrumCache))
+        self.assertEqual(0, spectrumCache.size_B)
+        self.assertEqual(0, spectrumCache.hits)
+
+if __name__ == '__main__':  # pragma: no cover
+    import nose
+    nose.runmodule()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: Bruker.MapRaw.test_StatisticsCache
+   :synopsis: Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.StatisticsCache`
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Tests for the module :py:mod:`pySpectrumFileFormat.Bruker.MapRaw.StatisticsCache`.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import time
+import os.path
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.Bruker.MapRaw.StatisticsCache as StatisticsCache
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawFormat as MapRawFormat
+import pySpectrumFileFormat.Bruker.MapRaw.ParametersFile as ParametersFile
+import pySpectrumFileFormat.Bruker.MapRaw.MapRawTestCase as MapRawTestCase
+
+# Globals and constants variables.
+
+class TestStatisticsCache(MapRawTestCase.MapRawTestCase):
+    """
+    TestCase class for the module `StatisticsCache`.
+    """
+
+    def setUp(self):
+        """
+        Setup method.
+        """
+
+        MapRawTestCase.MapRawTestCase.setUp(self)
+
+        self.cacheDirectory = os.path.join(self.path, "cache")
+
+    def testSkeleton(self):
+        """
+        First test to check if the testcase is working with the testing framework.
+        """
+
+        #self.fail("Test if the testcase is working.")
+        self.assertTrue(True)
+
+    def test_getPut(self):
+        cache = StatisticsCache.StatisticsCache(self.cacheDirectory)
+        rawFilepath = self.rawFilepaths[ParametersFile.RECORED_BY_VECTOR]
+
+        self.assertEqual(None, cache.get(rawFilepath, "key1", "totalSpectrum"))
+
+        cache.put(rawFilepath, "key1", "totalSpectrum", np.arange(11))
+        cache.put(rawFilepath, "key1", "totalIntensityImage", np.ones((9, 7)))
+        np.testing.assert_array_equal(np.arange(11), cache.get(rawFilepath, "key1", "totalSpectrum"))
+        np.testing.assert_array_equal(np.ones((9, 7)), cache.get(rawFilepath, "key1", "totalIntensityImage"))
+        self.assertEqual(1, len(os.listdir(self.cacheDirectory)))
+
+        # Another process sees the same entries.
+        otherCache = StatisticsCache.StatisticsCache(self.cacheDirectory)
+        np.testing.assert_array_equal(np.arange(11), otherCache.get(rawFilepath, "key1", "totalSpectrum"))
+
+        # A changed raw/rpl pair discards the entry.
+        self.assertEqual(None, cache.get(rawFilepath, "key2", "totalSpectrum"))
+        cache.put(rawFilepath, "key2", "maximumPixelSpectrum", np.zeros(11))
+        self.assertEqual(None, cache.get(rawFilepath, "key2", "totalSpectrum"))
+
+        cache.invalidate(rawFilepath)
+        self.assertEqual(None, cache.get(rawFilepath, "key2", "maximumPixelSpectrum"))
+        self.assertEqual(0, cache.getSize_B())
+
+    def test_prune(self):
+        cache = StatisticsCache.StatisticsCache(self.cacheDirectory)
+        images = np.random.RandomState(2).random_sample((4, 1000))
+        rawFilepaths = [os.path.join(self.path, "map%i.raw" % index) for index in range(4)]
+
+        for index in range(3):
+            cache.put(rawFilepaths[index], "key", "image", images[index])
+            accessTime = time.time() - 100 + index
+            os.utime(cache._getEntryFilepath(rawFilepaths[index]), (accessTime, accessTime))
+        entry_B = cache.getSize_B()//3
+
+        # The oldest entry is evicted, the one just written is kept.
+        cache.maximumSize_B = 3*entry_B + 100
+        cache.put(rawFilepaths[3], "key", "image", images[3])
+
+        self.assertEqual(None, cache.get(rawFilepaths[0], "key", "image"))
+        for index in range(1, 4):
+            np.testing.assert_array_equal(images[index], cache.get(rawFilepaths[index], "key", "image"))
+
+        cache.clear()
+        self.assertEqual(0, cache.getSize_B())
+
+    def test_concurrentRemoval(self):
+        cache = StatisticsCache.StatisticsCache(self.cacheDirectory)
+        rawFilepath = self.rawFilepaths[ParametersFile.RECORED_BY_VECTOR]
+        cache.put(rawFilepath, "key", "totalSpectrum", np.arange(11))
+        entryFilepath = cache._getEntryFilepath(rawFilepath)
+
+        # Another process prunes the entry after it was read.
+        readEntry = cache._readEntry
+
+        def readAndRemoveEntry(rawFilepath, sourceKey):
+            statistics = readEntry(rawFilepath, sourceKey)
+            os.remove(entryFilepath)
+            return statistics
+
+        cache._readEntry = readAndRemoveEntry
+        np.testing.assert_array_equal(np.arange(11), cache.get(rawFilepath, "key", "totalSpectrum"))
+        self.assertFalse(os.path.isfile(entryFilepath))
+
+        # Removing an entry already removed by another process is not an error.
+        cache._removeEntry(entryFilepath)
+        self.assertEqual([], cache._getEntries())
+
+    def test_mapRawFormat(self):
+        cache = StatisticsCache.StatisticsCache(self.cacheDirectory)
+
+        for recordBy, rawFilepath in self.rawFilepaths.items():
+            mapRaw = MapRawFormat.MapRawFormat(rawFilepath)
+            mapRaw.enableStatisticsCache(cache)
+            mapRaw.getTotalSpectrum()
+            mapRaw.getSumSpectrum()
+            mapRaw.getTotalIntensityImage()
+            mapRaw.getMaximumPixelSpectrum()
+
+            # A new session reads the statistics from the cache without reading the map.
+            mapRaw = MapRawFormat.MapRawFormat(rawFilepath)
+            mapRaw.enableStatisticsCache(cache)
+            mapRaw._getStripe = None
+            mapRaw._iterChannelPlanes = None
+
+            _channels, spectrum = mapRaw.getTotalSpectrum()
+            np.testing.assert_array_equal(np.sum(self.datacube, axis=(0, 1)), spectrum)
+            _channels, spectrum = mapRaw.getSumSpectrum()
+            np.testing.assert_array_equal(np.sum(self.datacube, axis=(0, 1)), spectrum)
+            np.testing.assert_array_equal(np.sum(self.datacube, axis=2), mapRaw.getTotalIntensityImage())
+            _channels, spectrum = mapRaw.getMaximumPixelSpectrum()
+            np.testing.assert_array_equal(np.amax(self.datacube, axis=(0, 1)), spectrum)
+
+            # Rewriting the map invalidates its statistics.
+            datacube = self.datacube + 1
+            MapRawTestCase.createMapRawFile(rawFilepath, datacube, recordBy)
+            os.utime(rawFilepath, ns=(0, 0))
+            mapRaw = MapRawFormat.MapRawFormat(rawFilepath)
+            mapRaw.enableStatisticsCache(cache)
+            _channels, spectrum = mapRaw.getTotalSpectrum()
+            np.testing.assert_array_equal(np.sum(datacube, axis=(0, 1)), spectrum)
+
+            mapRaw.invalidateStatisticsCache()
+            self.assertFalse(os.path.isfile(cache._getEntryFilepath(rawFilepath)))
+
+if __name__ == '__main__':  # pragma: no cover
+    import nose
+    nose.runmodule()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: MapRawCatalog
+   :synopsis: SQLite catalog of the raw/rpl map files of directories.
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+SQLite catalog of the raw/rpl map files of directories.
+
+The rpl headers of the Bruker and Oxford Instruments variants are parsed in one pass over their lines and stored
+with the size and modification time of the rpl and raw files. A rescan only parses the files that changed and removes
+the ones that disappeared. The directories are walked and the headers parsed by a pool of threads.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import os
+import logging
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Third party modules.
+
+# Local modules.
+
+# Project modules.
+
+# Globals and constants variables.
+FORMAT_BRUKER = "Bruker"
+FORMAT_OXFORD_INSTRUMENTS = "OxfordInstruments"
+
+PARAMETERS_EXTENSION = ".rpl"
+RAW_EXTENSION = ".raw"
+
+OXFORD_INSTRUMENTS_PREFIX = "MLX::"
+
+DEFAULT_WORKERS = 8
+
+_LINE_PATTERN = re.compile(r"^([A-Za-z0-9_\-]+)\s*:?\s*(.*)$")
+
+_INTEGER_KEYS = {"width": "width", "height": "height", "depth": "depth", "offset": "offset",
+                 "data-length": "dataLength_B"}
+_STRING_KEYS = {"data-type": "dataType", "byte-order": "byteOrder"}
+_FLOAT_KEYS = {"e0_kv": "energy_keV", "px_size_nm": "pixelSize_nm"}
+
+_COLUMNS = [("parametersFilepath", "TEXT PRIMARY KEY"),
+            ("rawFilepath", "TEXT"),
+            ("format", "TEXT"),
+            ("width", "INTEGER"),
+            ("height", "INTEGER"),
+            ("depth", "INTEGER"),
+            ("offset", "INTEGER"),
+            ("dataLength_B", "INTEGER"),
+            ("dataType", "TEXT"),
+            ("byteOrder", "TEXT"),
+            ("recordBy", "TEXT"),
+            ("energy_keV", "REAL"),
+            ("pixelSize_nm", "REAL"),
+            ("parametersSize_B", "INTEGER"),
+            ("parametersMtime_ns", "INTEGER"),
+            ("rawSize_B", "INTEGER"),
+            ("rawMtime_ns", "INTEGER"),
+            ("scanTime_s", "REAL")]
+COLUMN_NAMES = [name for name, _type in _COLUMNS]
+
+def parseParameters(lines):
+    """
+    Return a dict of the parameters of the lines of a Bruker or Oxford Instruments rpl file.
+
+    The data type and byte order are lower case whatever the variant, the record-by value is kept as is.
+    """
+    parameters = {"format": FORMAT_BRUKER}
+
+    for line in lines:
+        line = line.replace('(', '').replace(')', '').strip()
+        if line.upper().startswith(OXFORD_INSTRUMENTS_PREFIX):
+            parameters["format"] = FORMAT_OXFORD_INSTRUMENTS
+            line = line[len(OXFORD_INSTRUMENTS_PREFIX):]
+
+        match = _LINE_PATTERN.match(line)
+        if match is None:
+            continue
+        key = match.group(1).lower()
+        value = match.group(2).strip()
+
+        try:
+            if key in _INTEGER_KEYS:
+                parameters[_INTEGER_KEYS[key]] = int(value)
+            elif key in _FLOAT_KEYS:
+                parameters[_FLOAT_KEYS[key]] = float(value)
+            elif key in _STRING_KEYS:
+                parameters[_STRING_KEYS[key]] = value.lower()
+            elif key == "record-by":
+                parameters["recordBy"] = value
+        except ValueError:
+            logging.warning("Invalid value for %s: %s", key, value)
+
+    return parameters
+
+def _getRawFilepath(parametersFilepath):
+    basename, _extension = os.path.splitext(parametersFilepath)
+    for extension in [RAW_EXTENSION, RAW_EXTENSION.upper()]:
+        if os.path.isfile(basename + extension):
+            return basename + extension
+
+    return basename + RAW_EXTENSION
+
+def _statFile(filepath):
+    try:
+        fileStat = os.stat(filepath)
+    except OSError:
+        return None, None
+
+    return fileStat.st_size, fileStat.st_mtime_ns
+
+def _findParametersFilepaths(directory, recursive):
+    filepaths = []
+    for path, directories, filenames in os.walk(directory):
+        filepaths.extend(os.path.abspath(os.path.join(path, filename)) for filename in filenames
+                         if filename.lower().endswith(PARAMETERS_EXTENSION))
+        if not recursive:
+            del directories[:]
+
+    return filepaths
+
+class MapRawCatalog(object):
+    def __init__(self, databaseFilepath, workers=DEFAULT_WORKERS):
+        logging.info("Map catalog: %s", databaseFilepath)
+
+        self.workers = workers
+
+        self._connection = sqlite3.connect(databaseFilepath)
+        self._connection.row_factory = sqlite3.Row
+        columns = ", ".join("%s %s" % column for column in _COLUMNS)
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS maps (%s)" % columns)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM maps").fetchone()[0]
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def scan(self, directories, recursive=True):
+        """
+        Add the new and changed rpl files of the directories to the catalog, remove the missing ones and return the
+        numbers of (added, updated, removed) entries.
+        """
+        if isinstance(directories, str):
+            directories = [directories]
+        directories = [os.path.abspath(directory) for directory in directories]
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            parametersFilepaths = set()
+            for filepaths in executor.map(lambda directory: _findParametersFilepaths(directory, recursive),
+                                          directories):
+                parametersFilepaths.update(filepaths)
+
+            knownFiles = self._getKnownFiles(directories, recursive)
+            entries = [entry for entry in executor.map(self._scanFile, sorted(parametersFilepaths),
+                                                       [knownFiles.get(filepath) for filepath
+                                                        in sorted(parametersFilepaths)])
+                       if entry is not None]
+
+        removedFilepaths = [filepath for filepath in knownFiles if filepath not in parametersFilepaths]
+        numberAdded = sum(1 for entry in entries if entry["parametersFilepath"] not in knownFiles)
+
+        with self._connection:
+            placeholders = ", ".join("?" for _name in COLUMN_NAMES)
+            self._connection.executemany("INSERT OR REPLACE INTO maps (%s) VALUES (%s)" %
+                                         (", ".join(COLUMN_NAMES), placeholders),
+                                         [[entry.get(name) for name in COLUMN_NAMES] for entry in entries])
+            self._connection.executemany("DELETE FROM maps WHERE parametersFilepath = ?",
+                                         [(filepath,) for filepath in removedFilepaths])
+
+        logging.info("Catalog scan: %i added, %i updated, %i removed", numberAdded, len(entries) - numberAdded,
+                     len(removedFilepaths))
+
+        return numberAdded, len(entries) - numberAdded, len(removedFilepaths)
+
+    def query(self, orderBy="parametersFilepath", **criteria):
+        """
+        Return the entries as dicts matching all the criteria, a value or a (minimum, maximum) inclusive range of a
+        column, for example ``query(format=FORMAT_BRUKER, energy_keV=(15.0, 20.0), width=1024)``.
+        """
+        conditions = []
+        values = []
+        for name, value in sorted(criteria.items()):
+            self._checkColumnName(name)
+
+            if value is None:
+                conditions.append("%s IS NULL" % name)
+            elif isinstance(value, (tuple, list)):
+                minimum, maximum = value
+                if minimum is not None:
+                    conditions.append("%s >= ?" % name)
+                    values.append(minimum)
+                if maximum is not None:
+                    conditions.append("%s <= ?" % name)
+                    values.append(maximum)
+            else:
+                conditions.append("%s = ?" % name)
+                values.append(value)
+
+        self._checkColumnName(orderBy)
+        sql = "SELECT * FROM maps"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY %s" % orderBy
+
+        return [dict(row) for row in self._connection.execute(sql, values)]
+
+    def remove(self, parametersFilepath):
+        with self._connection:
+            self._connection.execute("DELETE FROM maps WHERE parametersFilepath = ?",
+                                     (os.path.abspath(parametersFilepath),))
+
+    def _checkColumnName(self, name):
+        if name not in COLUMN_NAMES:
+            raise ValueError("Unknown catalog column: %s" % name)
+
+    def _getKnownFiles(self, directories, recursive):
+        """
+        Return the (rpl size, rpl mtime, raw size, raw mtime) of the entries under the directories.
+        """
+        knownFiles = {}
+        for row in self._connection.execute("SELECT parametersFilepath, parametersSize_B, parametersMtime_ns, "
+                                            "rawSize_B, rawMtime_ns FROM maps"):
+            filepath = row[0]
+            for directory in directories:
+                if recursive:
+                    isInDirectory = filepath.startswith(os.path.join(directory, ''))
+                else:
+                    isInDirectory = os.path.dirname(filepath) == directory
+
+                if isInDirectory:
+                    knownFiles[filepath] = tuple(row[1:])
+                    break
+
+        return knownFiles
+
+    def _scanFile(self, parametersFilepath, knownStat):
+        """
+        Return the catalog entry of the rpl file, or None if it did not change since the last scan.
+        """
+        parametersSize_B, parametersMtime_ns = _statFile(parametersFilepath)
+        if parametersSize_B is None:
+            return None
+
+        rawFilepath = _getRawFilepath(parametersFilepath)
+        rawSize_B, rawMtime_ns = _statFile(rawFilepath)
+
+        if knownStat == (parametersSize_B, parametersMtime_ns, rawSize_B, rawMtime_ns):
+            return None
+
+        try:
+            with open(parametersFilepath, 'r', errors='replace') as parametersFile:
+                entry = parseParameters(parametersFile)
+        except (IOError, OSError) as error:
+            logging.warning("Cannot read %s: %s", parametersFilepath, error)
+            return None
+
+        entry.update({"parametersFilepath": parametersFilepath, "rawFilepath": rawFilepath,
+                      "parametersSize_B": parametersSize_B, "parametersMtime_ns": parametersMtime_ns,
+                      "rawSize_B": rawSize_B, "rawMtime_ns": rawMtime_ns, "scanTime_s": time.time()})
+
+        return entry
@@ -28,8 +28,9 @@ Read Oxford Instruments map in the raw format.
 
 # Standard library modules.
 import os.path
-import struct
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Third party modules.
 import matplotlib.pyplot as plt
@@ -41,17 +42,27 @@ import numpy as np
 import pySpectrumFileFormat.OxfordInstruments.MapRaw.ParametersFile as ParametersFile
 
 # Globals and constants variables.
+DEFAULT_MEMORY_BUDGET_B = 256*1024*1024
+
+RECORED_BY_VECTOR = "VECTOR"
+
+# Requested pixels closer than this gap in a channel plane are read together.
+COALESCE_GAP_B = 64*1024
 
 class MapRawFormat(object):
-    def __init__(self, rawFilepath):
+    def __init__(self, rawFilepath, memoryBudget_B=DEFAULT_MEMORY_BUDGET_B, workers=1):
         logging.info("Raw file: %s", rawFilepath)
 
         self._rawFilepath = rawFilepath
+        self.memoryBudget_B = memoryBudget_B
+        self.workers = workers
         parametersFilepath = self._rawFilepath.replace('.raw', '.rpl')
 
         self._parameters = ParametersFile.ParametersFile()
         self._parameters.read(parametersFilepath)
 
+        self._data = None
+
         self._format = self._generateFormat(self._parameters)
 
     def _generateFormat(self, parameters):
@@ -79,73 +90,177 @@ class MapRawFormat(object):
 
         return spectrumFormat
 
-    def _generateSumSpectraFormat(self, parameters):
-        spectrumFormat = ""
-        if parameters.byteOrder == ParametersFile.BYTE_ORDER_LITTLE_ENDIAN:
-            spectrumFormat += '<'
+    def getSpectrum(self, pixelId):
+        logging.debug("Pixel ID: %i", pixelId)
 
-        spectrumFormat += '%i' % (parameters.width*parameters.height)
+        self._read_data()
 
-        if parameters.dataLength_B == 1:
-            if parameters.dataType == ParametersFile.DATA_TYPE_SIGNED:
-                spectrumFormat += "b"
-            elif parameters.dataType == ParametersFile.DATA_TYPE_UNSIGNED:
-                spectrumFormat += "B"
-        elif parameters.dataLength_B == 2:
-            if parameters.dataType == ParametersFile.DATA_TYPE_SIGNED:
-                spectrumFormat += "h"
-            elif parameters.dataType == ParametersFile.DATA_TYPE_UNSIGNED:
-                spectrumFormat += "H"
-        elif parameters.dataLength_B == 4:
-            if parameters.dataType == ParametersFile.DATA_TYPE_SIGNED:
-                spectrumFormat += "i"
-            elif parameters.dataType == ParametersFile.DATA_TYPE_UNSIGNED:
-                spectrumFormat += "I"
+        pixelY, pixelX = divmod(pixelId, self._parameters.width)
+        if self._isRecordByVector():
+            spectrum = self._data[pixelY, pixelX, :]
+        else:
+            spectrum = self._data[:, pixelY, pixelX]
 
-        logging.info("Format: %s", spectrumFormat)
+        channels = np.arange(0, self._parameters.depth)
 
-        return spectrumFormat
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
 
-    def getSpectrum(self, pixelId):
-        logging.debug("Pixel ID: %i", pixelId)
+    def getSpectra(self, pixelIds):
+        """
+        Return the channels and the (pixels, depth) spectra of the pixel ids in one pass over the file.
 
-        imageOffset = self._parameters.width*self._parameters.height
-        logging.debug("File offset: %i", imageOffset)
-
-        logging.debug("Size: %i", struct.calcsize(self._format))
+        The pixels are sorted by file offset and the nearby ones are read together in each channel plane.
+        """
+        pixelIds = np.asarray(pixelIds, dtype=np.int64).ravel()
+        numberPixels = self._parameters.width*self._parameters.height
+        depth = self._parameters.depth
+        channels = np.arange(0, depth)
+
+        if len(pixelIds) and (pixelIds.min() < 0 or pixelIds.max() >= numberPixels):
+            raise ValueError("Pixel ids must be between 0 and %i." % (numberPixels - 1))
+
+        dataType = self._getDataType()
+        spectra = np.empty((len(pixelIds), depth), dtype=dataType.newbyteorder('='))
+        if len(pixelIds) == 0:
+            return channels, spectra
+
+        uniqueIds, inverse = np.unique(pixelIds, return_inverse=True)
+
+        if self._isRecordByVector():
+            self._read_data()
+            spectra[:] = self._data.reshape(numberPixels, depth)[uniqueIds][inverse]
+            return channels, spectra
+
+        # Runs of nearby pixels read in one call, concatenated in the buffer of each plane.
+        dataLength_B = self._parameters.dataLength_B
+        breaks = np.flatnonzero((np.diff(uniqueIds) - 1)*dataLength_B > COALESCE_GAP_B) + 1
+        runStarts = uniqueIds[np.r_[0, breaks]]
+        runEnds = uniqueIds[np.r_[breaks - 1, len(uniqueIds) - 1]] + 1
+        runLengths = runEnds - runStarts
+        bufferStarts = np.r_[0, np.cumsum(runLengths)[:-1]]
+
+        pixelRuns = np.searchsorted(runStarts, uniqueIds, side='right') - 1
+        positions = (bufferStarts[pixelRuns] + uniqueIds - runStarts[pixelRuns])[inverse]
+
+        bufferLength = int(np.sum(runLengths))
+        isContiguous = bufferLength == numberPixels
+        numberPlanes = int(min(depth, max(1, self.memoryBudget_B // (bufferLength*dataLength_B))))
+        buffer = np.empty((numberPlanes, bufferLength), dtype=dataType)
+        logging.debug("Reading %i pixels in %i runs per plane", len(uniqueIds), len(runStarts))
+
+        with open(self._rawFilepath, 'rb') as rawFile:
+            for channelStart in range(0, depth, numberPlanes):
+                planes = buffer[:min(numberPlanes, depth - channelStart)]
+
+                if isContiguous:
+                    rawFile.seek(self._parameters.offset + channelStart*numberPixels*dataLength_B)
+                    numberBytes = rawFile.readinto(planes)
+                    expected_B = planes.nbytes
+                else:
+                    numberBytes = 0
+                    expected_B = 0
+                    for planeId, plane in enumerate(planes):
+                        planeOffset = (channelStart + planeId)*numberPixels
+                        for runStart, runLength, bufferStart in zip(runStarts, runLengths, bufferStarts):
+                            rawFile.seek(self._parameters.offset + (planeOffset + runStart)*dataLength_B)
+                            numberBytes += rawFile.readinto(plane[bufferStart:bufferStart + runLength])
+                            expected_B += runLength*dataLength_B
+
+                if numberBytes != expected_B:
+                    raise IOError("Unexpected end of file at channel %i: %s" % (channelStart, self._rawFilepath))
+
+                spectra[:, channelStart:channelStart + len(planes)] = planes[:, positions].T
+
+        return channels, spectra
+
+    def getDataCube(self):
+        """
+        Return the channels and a (height, width, depth) view of the map.
+        """
+        self._read_data()
+
+        if self._isRecordByVector():
+            datacube = self._data
+        else:
+            datacube = np.moveaxis(self._data, 0, 2)
+
+        channels = np.arange(0, self._parameters.depth)
+
+        return channels, datacube
+
+    def getROISpectrum(self, pixelXmin, pixelXmax, pixelYmin, pixelYmax):
+        self._read_data()
+
+        channels = np.arange(0, self._parameters.depth)
+        spectrum = np.zeros(self._parameters.depth, dtype=self._getAccumulatorType())
+
+        if self._isRecordByVector():
+            for rowStart, rowEnd in self._iterBlocks(self._parameters.height, pixelYmin, pixelYmax + 1):
+                block = self._data[rowStart:rowEnd, pixelXmin:pixelXmax + 1, :]
+                spectrum += np.sum(block, axis=(0, 1), dtype=spectrum.dtype)
+        else:
+            for channelStart, channelEnd in self._iterBlocks(self._parameters.depth):
+                block = self._data[channelStart:channelEnd, pixelYmin:pixelYmax + 1, pixelXmin:pixelXmax + 1]
+                spectrum[channelStart:channelEnd] = np.sum(block, axis=(1, 2), dtype=spectrum.dtype)
+
+        assert len(channels) == len(spectrum)
+        return channels, spectrum
+
+    def getTotalIntensityImage(self):
+        return self.getRoiIntensityImage((0, self._parameters.depth))
+
+    def getRoiIntensityImage(self, channelRange):
+        channel_min, channel_max = channelRange
+
+        self._read_data()
+        image = np.zeros((self._parameters.height, self._parameters.width), dtype=self._getAccumulatorType())
+
+        if self._isRecordByVector():
+            for rowStart, rowEnd in self._iterBlocks(self._parameters.height):
+                block = self._data[rowStart:rowEnd, :, channel_min:channel_max]
+                image[rowStart:rowEnd] = np.sum(block, axis=2, dtype=image.dtype)
+        else:
+            channel_min, channel_max, _step = slice(channel_min, channel_max).indices(self._parameters.depth)
+            for channelStart, channelEnd in self._iterBlocks(self._parameters.depth, channel_min, channel_max):
+                image += np.sum(self._data[channelStart:channelEnd], axis=0, dtype=image.dtype)
+
+        return image
 
+    def getSumSpectrum(self):
+        """
+        Return the sum spectrum, reading blocks of channel planes in reused buffers spread over the workers.
+        """
         x = np.arange(0, self._parameters.depth)
-        y = np.zeros_like(x)
-        rawFile = open(self._rawFilepath, 'rb')
-        for channel in range(self._parameters.depth):
-            fileOffset = self._parameters.offset + (pixelId + channel*imageOffset)*self._parameters.dataLength_B
-            rawFile.seek(fileOffset)
-            fileBuffer = rawFile.read(struct.calcsize(self._format))
-            items = struct.unpack(self._format, fileBuffer)
-            y[channel] = float(items[0])
+        y = np.zeros(self._parameters.depth, dtype=self._getAccumulatorType())
 
-        rawFile.close()
+        if self._isRecordByVector():
+            self._read_data()
+            for rowStart, rowEnd in self._iterBlocks(self._parameters.height):
+                y += np.sum(self._data[rowStart:rowEnd], axis=(0, 1), dtype=y.dtype)
 
-        return x, y
+            assert len(x) == len(y)
+            return x, y
 
-    def getSumSpectrum(self):
-        imageOffset = self._parameters.width*self._parameters.height
-        x = np.arange(0, self._parameters.depth)
-        y = np.zeros_like(x)
-        rawFile = open(self._rawFilepath, 'rb')
-        fileOffset = self._parameters.offset
-        rawFile.seek(fileOffset)
+        blocks = list(self._iterBlocks(self._parameters.depth))
+        buffers = threading.local()
 
-        sumSpectrumformat = self._generateSumSpectraFormat(self._parameters)
+        def sumPlanes(block):
+            channelStart, channelEnd = block
+            logging.debug("Channels: %i-%i", channelStart, channelEnd)
 
-        for channel in range(self._parameters.depth):
-            logging.info("Channel: %i", channel)
-            fileBuffer = rawFile.read(struct.calcsize(sumSpectrumformat))
-            items = struct.unpack(sumSpectrumformat, fileBuffer)
-            y[channel] = np.sum(items)
+            planes = self._readPlanes(channelStart, channelEnd, buffers)
+            return np.sum(planes, axis=1, dtype=y.dtype)
 
-        rawFile.close()
+        if self.workers > 1 and len(blocks) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for (channelStart, channelEnd), partialSpectrum in zip(blocks, executor.map(sumPlanes, blocks)):
+                    y[channelStart:channelEnd] = partialSpectrum
+        else:
+            for channelStart, channelEnd in blocks:
+                y[channelStart:channelEnd] = sumPlanes((channelStart, channelEnd))
 
+        assert len(x) == len(y)
         return x, y
 
     def getSumSpectrumOld(self):
@@ -161,6 +276,87 @@ class MapRawFormat(object):
 
         return x, ySum
 
+    def getParameters(self):
+        return self._parameters
+
+    def _isRecordByVector(self):
+        """
+        The record-by value of the Oxford Instruments files is an image name, like 'IMAGE "Site of Interest 1"'.
+        """
+        return self._parameters.recordBy.strip().upper().startswith(RECORED_BY_VECTOR)
+
+    def _getAccumulatorType(self):
+        if self._parameters.dataType == ParametersFile.DATA_TYPE_UNSIGNED:
+            return np.uint64
+        else:
+            return np.int64
+
+    def _iterBlocks(self, length, start=0, end=None):
+        """
+        Yield (start, end) of the blocks of channel planes, or rows for a record-by-vector file, fitting the memory
+        budget.
+        """
+        if end is None:
+            end = length
+        end = min(end, length)
+
+        if self._isRecordByVector():
+            item_B = self._parameters.width*self._parameters.depth*self._parameters.dataLength_B
+        else:
+            item_B = self._parameters.width*self._parameters.height*self._parameters.dataLength_B
+        # The blocks processed concurrently by the workers share the memory budget.
+        numberItems = int(max(1, self.memoryBudget_B // (item_B*max(1, self.workers))))
+
+        for blockStart in range(start, end, numberItems):
+            yield blockStart, min(blockStart + numberItems, end)
+
+    def _readPlanes(self, channelStart, channelEnd, buffers):
+        """
+        Read the (channels, height*width) planes [channelStart, channelEnd) into the buffer of the calling thread.
+        """
+        numberPixels = self._parameters.width*self._parameters.height
+        numberPlanes = channelEnd - channelStart
+
+        buffer = getattr(buffers, "planes", None)
+        if buffer is None or len(buffer) < numberPlanes:
+            buffer = np.empty((numberPlanes, numberPixels), dtype=self._getDataType())
+            buffers.planes = buffer
+        planes = buffer[:numberPlanes]
+
+        with open(self._rawFilepath, 'rb') as rawFile:
+            rawFile.seek(self._parameters.offset + channelStart*numberPixels*self._parameters.dataLength_B)
+            numberBytes = rawFile.readinto(planes)
+
+        if numberBytes != planes.nbytes:
+            raise IOError("Unexpected end of file at channel %i: %s" % (channelStart, self._rawFilepath))
+
+        return planes
+
+    def _getDataType(self):
+        if self._parameters.dataType == ParametersFile.DATA_TYPE_SIGNED:
+            dataType = 'i'
+        elif self._parameters.dataType == ParametersFile.DATA_TYPE_UNSIGNED:
+            dataType = 'u'
+        else:
+            raise TypeError('Unknown "data-type" string.')
+
+        if self._parameters.byteOrder == ParametersFile.BYTE_ORDER_LITTLE_ENDIAN:
+            endian = '<'
+        else:
+            endian = '='
+
+        return np.dtype('%s%s%i' % (endian, dataType, int(self._parameters.dataLength_B)))
+
+    def _read_data(self):
+        if self._data is None:
+            if self._isRecordByVector():
+                shape = (self._parameters.height, self._parameters.width, self._parameters.depth)
+            else:
+                shape = (self._parameters.depth, self._parameters.height, self._parameters.width)
+
+            self._data = np.memmap(self._rawFilepath, offset=self._parameters.offset, dtype=self._getDataType(),
+                                   mode='r', shape=shape)
+
 def run():
     path = r"J:\hdemers\work\mcgill2012\results\experimental\McGill\su8000\others\exampleEDS"
     #filename = "Map30kV.raw"
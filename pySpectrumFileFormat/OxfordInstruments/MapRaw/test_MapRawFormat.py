@@ -29,15 +29,47 @@ Tests for module `OxfordInstruments.MapRaw.MapRawFormat`.
 # Standard library modules.
 import unittest
 import logging
+import tempfile
+import shutil
+import os.path
 
 # Third party modules.
+import numpy as np
 
 # Local modules.
 
 # Project modules.
 import pySpectrumFileFormat.OxfordInstruments.MapRaw.MapRawFormat as MapRawFormat
+import pySpectrumFileFormat.OxfordInstruments.MapRaw.ParametersFile as ParametersFile
 
 # Globals and constants variables.
+RECORED_BY_IMAGE = 'IMAGE "Site of Interest 1"'
+
+def createMapRawFile(rawFilepath, datacube, recordBy=RECORED_BY_IMAGE):
+    """
+    Write a (height, width, depth) datacube as an Oxford Instruments raw/rpl pair using the record-by layout.
+    """
+    height, width, depth = datacube.shape
+
+    if datacube.dtype.kind == 'u':
+        dataType = ParametersFile.DATA_TYPE_UNSIGNED
+    else:
+        dataType = ParametersFile.DATA_TYPE_SIGNED
+
+    lines = ["(%s %i)\n" % (ParametersFile.KEY_WIDTH, width),
+             "(%s %i)\n" % (ParametersFile.KEY_HEIGHT, height),
+             "(%s %i)\n" % (ParametersFile.KEY_DEPTH, depth),
+             "(%s %i)\n" % (ParametersFile.KEY_OFFSET, 0),
+             "(%s %i)\n" % (ParametersFile.KEY_DATA_LENGTH_B, datacube.dtype.itemsize),
+             "(%s %s)\n" % (ParametersFile.KEY_DATA_TYPE, dataType),
+             "(%s %s)\n" % (ParametersFile.KEY_BYTE_ORDER, ParametersFile.BYTE_ORDER_LITTLE_ENDIAN),
+             "(%s %s)\n" % (ParametersFile.KEY_RECORED_BY, recordBy)]
+    with open(rawFilepath.replace('.raw', '.rpl'), 'w') as parametersFile:
+        parametersFile.writelines(lines)
+
+    if not recordBy.upper().startswith(MapRawFormat.RECORED_BY_VECTOR):
+        datacube = np.moveaxis(datacube, 2, 0)
+    np.ascontiguousarray(datacube).astype(datacube.dtype.newbyteorder('<')).tofile(rawFilepath)
 
 class TestMapRawFormat(unittest.TestCase):
     """
@@ -51,6 +83,18 @@ class TestMapRawFormat(unittest.TestCase):
 
         unittest.TestCase.setUp(self)
 
+        self.path = tempfile.mkdtemp()
+
+        randomState = np.random.RandomState(12345)
+        self.datacube = randomState.randint(0, 50, size=(9, 7, 11)).astype(np.int16)
+
+        self.mapRaws = {}
+        for recordBy in [RECORED_BY_IMAGE, MapRawFormat.RECORED_BY_VECTOR]:
+            rawFilepath = os.path.join(self.path, "map_%s.raw" % recordBy[:5])
+            createMapRawFile(rawFilepath, self.datacube, recordBy)
+            # Budget of two planes or rows to force several blocks with a partial last one.
+            self.mapRaws[recordBy] = MapRawFormat.MapRawFormat(rawFilepath, memoryBudget_B=2*7*11*2)
+
     def tearDown(self):
         """
         Teardown method.
@@ -58,6 +102,9 @@ class TestMapRawFormat(unittest.TestCase):
 
         unittest.TestCase.tearDown(self)
 
+        self.mapRaws = {}
+        shutil.rmtree(self.path)
+
     def testSkeleton(self):
         """
         First test to check if the testcase is working with the testing framework.
@@ -66,6 +113,96 @@ class TestMapRawFormat(unittest.TestCase):
         #self.fail("Test if the testcase is working.")
         self.assert_(True)
 
+    def test_getSpectrum(self):
+        for mapRaw in self.mapRaws.values():
+            for pixelX, pixelY in [(0, 0), (6, 0), (3, 4), (6, 8)]:
+                channels, spectrum = mapRaw.getSpectrum(pixelY*7 + pixelX)
+                np.testing.assert_array_equal(np.arange(11), channels)
+                np.testing.assert_array_equal(self.datacube[pixelY, pixelX, :], spectrum)
+
+    def test_getSumSpectrum(self):
+        for mapRaw in self.mapRaws.values():
+            for workers in [1, 3]:
+                mapRaw.workers = workers
+                channels, spectrum = mapRaw.getSumSpectrum()
+                np.testing.assert_array_equal(np.arange(11), channels)
+                np.testing.assert_array_equal(np.sum(self.datacube, axis=(0, 1)), spectrum)
+                self.assertEqual(np.int64, spectrum.dtype)
+
+        rawFilepath = os.path.join(self.path, "map_truncated.raw")
+        createMapRawFile(rawFilepath, self.datacube)
+        with open(rawFilepath, 'r+b') as rawFile:
+            rawFile.truncate(10*7*9*2)
+        mapRaw = MapRawFormat.MapRawFormat(rawFilepath, memoryBudget_B=2*7*9*2)
+        self.assertRaises(IOError, mapRaw.getSumSpectrum)
+
+    def test_getSpectra(self):
+        pixelIds = np.array([62, 5, 17, 5, 0, 40, 41, 42])
+        pixels = self.datacube.reshape(-1, 11)
+
+        for mapRaw in self.mapRaws.values():
+            channels, spectra = mapRaw.getSpectra(pixelIds)
+            np.testing.assert_array_equal(np.arange(11), channels)
+            np.testing.assert_array_equal(pixels[pixelIds], spectra)
+
+            _channels, spectra = mapRaw.getSpectra(np.arange(63))
+            np.testing.assert_array_equal(pixels, spectra)
+
+            _channels, spectra = mapRaw.getSpectra([])
+            self.assertEqual((0, 11), spectra.shape)
+
+            self.assertRaises(ValueError, mapRaw.getSpectra, [63])
+            self.assertRaises(ValueError, mapRaw.getSpectra, [-1])
+
+    def test_getSpectraRuns(self):
+        pixelIds = np.array([62, 5, 17, 5, 0, 40, 41, 42])
+        pixels = self.datacube.reshape(-1, 11)
+        mapRaw = self.mapRaws[RECORED_BY_IMAGE]
+
+        # Read each group of adjacent pixels separately.
+        coalesceGap_B = MapRawFormat.COALESCE_GAP_B
+        MapRawFormat.COALESCE_GAP_B = 0
+        try:
+            _channels, spectra = mapRaw.getSpectra(pixelIds)
+        finally:
+            MapRawFormat.COALESCE_GAP_B = coalesceGap_B
+
+        np.testing.assert_array_equal(pixels[pixelIds], spectra)
+
+    def test_getDataCube(self):
+        for mapRaw in self.mapRaws.values():
+            _channels, datacube = mapRaw.getDataCube()
+            self.assertEqual((9, 7, 11), datacube.shape)
+            np.testing.assert_array_equal(self.datacube, datacube)
+
+    def test_getROISpectrum(self):
+        for mapRaw in self.mapRaws.values():
+            _channels, spectrum = mapRaw.getROISpectrum(2, 4, 1, 7)
+            np.testing.assert_array_equal(np.sum(self.datacube[1:8, 2:5, :], axis=(0, 1)), spectrum)
+            self.assertEqual(np.int64, spectrum.dtype)
+
+    def test_getTotalIntensityImage(self):
+        for mapRaw in self.mapRaws.values():
+            image = mapRaw.getTotalIntensityImage()
+            np.testing.assert_array_equal(np.sum(self.datacube, axis=2), image)
+
+    def test_getRoiIntensityImage(self):
+        for mapRaw in self.mapRaws.values():
+            image = mapRaw.getRoiIntensityImage((3, 8))
+            np.testing.assert_array_equal(np.sum(self.datacube[..., 3:8], axis=2), image)
+
+            image = mapRaw.getRoiIntensityImage((9, 20))
+            np.testing.assert_array_equal(np.sum(self.datacube[..., 9:], axis=2), image)
+
+    def test_getParameters(self):
+        parameters = self.mapRaws[RECORED_BY_IMAGE].getParameters()
+
+        self.assertEqual(7, parameters.width)
+        self.assertEqual(9, parameters.height)
+        self.assertEqual(11, parameters.depth)
+        self.assertEqual(ParametersFile.DATA_TYPE_SIGNED, parameters.dataType)
+        self.assertEqual(RECORED_BY_IMAGE, parameters.recordBy)
+
 if __name__ == '__main__':  # pragma: no cover
     import nose
     nose.runmodule()
@@ -33,10 +33,15 @@
 
 # Standard library modules.
 import os
+import re
 import copy
-from collections import MutableMapping
+try:
+    from collections.abc import MutableMapping
+except ImportError: # Python 2
+    from collections import MutableMapping
 
 # Third party modules.
+import numpy as np
 
 # Local modules.
 
@@ -261,8 +266,8 @@ class Emsa(object):
 
         The data of the spectrum can be accessed from the attributes:
 
-          * :attr:`xdata`: x values (typically energy)
-          * :attr:`ydata`: y values (typically counts)
+          * :attr:`xdata`: array of the x values (typically energy)
+          * :attr:`ydata`: array of the y values (typically counts)
           * :meth:`get_data <.Emsa.get_data>`: list of tuples
 
         The header's keywords can be accessed from the attribute :attr:`header`
@@ -284,6 +289,28 @@ class Emsa(object):
         self.xdata = []
         self.ydata = []
 
+    @property
+    def xdata(self):
+        """
+        X values of the spectrum as a NumPy array.
+        """
+        return self._xdata
+
+    @xdata.setter
+    def xdata(self, values):
+        self._xdata = np.asarray(values)
+
+    @property
+    def ydata(self):
+        """
+        Y values of the spectrum as a NumPy array.
+        """
+        return self._ydata
+
+    @ydata.setter
+    def ydata(self, values):
+        self._ydata = np.asarray(values)
+
     @property
     def header(self):
         """
@@ -340,6 +367,9 @@ def _calculate_checksum(lines):
 
     return checksum
 
+_SPECTRUM_PATTERN = re.compile(r"^[ \t]*#[ \t]*%s\b[^\n]*\n?" % SPECTRUM, re.IGNORECASE | re.MULTILINE)
+_ENDOFDATA_PATTERN = re.compile(r"^[ \t]*#[ \t]*%s\b" % ENDOFDATA, re.IGNORECASE | re.MULTILINE)
+
 class EmsaReader(object):
     """
     Class to read EMSA spectrum.
@@ -353,26 +383,41 @@ class EmsaReader(object):
 
         :return: :class:`.Emsa`
         """
-        return self._read_lines(fileobj.readlines())
+        return self._read_text(fileobj.read())
 
-    def _read_lines(self, lines):
+    def _read_text(self, text):
         emsa = Emsa()
         self._checksum = -1
+        self._xdata = []
+        self._ydata = []
+
+        # Parse the keywords line by line and the data block in one call
+        block = self._find_data_block(text)
+        if block is None:
+            for line in text.splitlines():
+                self._parse_line(emsa, line)
+        else:
+            start, end = block
+            for line in text[:start].splitlines() + text[end:].splitlines():
+                self._parse_line(emsa, line)
 
-        # Parse lines
-        for line in lines:
-            self._parse_line(emsa, line)
+            if not self._parse_data_block(emsa, text[start:end]):
+                for line in text[start:end].splitlines():
+                    self._parse_line(emsa, line)
+
+        emsa.xdata = np.asarray(self._xdata, dtype=np.float64)
+        emsa.ydata = np.asarray(self._ydata, dtype=np.float64)
 
         # Validate
         if self._checksum > 0: # only check if a checksum is in the input file
-            checksum = _calculate_checksum(lines)
+            checksum = _calculate_checksum(text.splitlines(True))
             if checksum != self._checksum:
                 raise IOError("The checksums don't match: %i != %i " % \
                     (checksum, self._checksum))
 
         # Create xdata for DATA_TYPE == Y
         emsa.header.npoints = len(emsa.ydata)
-        if not emsa.xdata:
+        if len(emsa.xdata) == 0:
             npoints = len(emsa.ydata)
             offset = emsa.header.offset
             xperchan = emsa.header.xperchan
@@ -401,10 +446,52 @@ class EmsaReader(object):
 
             if DATATYPE in emsa.header and NCOLUMNS in emsa.header:
                 if emsa.header[DATATYPE] == DATA_TYPE_XY:
-                    emsa.xdata.append(row[0])
-                    emsa.ydata.append(row[1])
+                    self._xdata.append(row[0])
+                    self._ydata.append(row[1])
                 elif emsa.header[DATATYPE] == DATA_TYPE_Y:
-                    emsa.ydata.extend(row)
+                    self._ydata.extend(row)
+
+    def _find_data_block(self, text):
+        """
+        Returns the (start, end) character range of the data lines between the
+        ``#SPECTRUM`` and ``#ENDOFDATA`` keywords or ``None`` if either keyword
+        is missing.
+        """
+        match = _SPECTRUM_PATTERN.search(text)
+        if match is None:
+            return None
+        start = match.end()
+
+        match = _ENDOFDATA_PATTERN.search(text, start)
+        if match is None:
+            return None
+        end = match.start()
+
+        return start, end
+
+    def _parse_data_block(self, emsa, block):
+        """
+        Converts all the values of the data block at once.
+        Returns ``False`` if the block must be parsed line by line instead.
+        """
+        if DATATYPE not in emsa.header or NCOLUMNS not in emsa.header:
+            return True
+
+        try:
+            values = np.array(block.replace(',', ' ').split(), dtype=np.float64)
+        except ValueError:
+            return False
+
+        if emsa.header[DATATYPE] == DATA_TYPE_XY:
+            # Only the first two values of each line are x and y
+            if values.size != 2 * len(block.strip().splitlines()):
+                return False
+            self._xdata = np.concatenate((self._xdata, values[0::2]))
+            self._ydata = np.concatenate((self._ydata, values[1::2]))
+        elif emsa.header[DATATYPE] == DATA_TYPE_Y:
+            self._ydata = np.concatenate((self._ydata, values))
+
+        return True
 
     def _is_line_keyword(self, line):
         try:
@@ -448,7 +535,7 @@ class EmsaReader(object):
         return row
 
     def _create_xdata(self, npoints, offset, xperchan):
-        return [offset + xperchan * i for i in range(npoints)]
+        return offset + xperchan * np.arange(npoints, dtype=np.float64)
 
 def read(fileobj):
     """
@@ -31,10 +31,12 @@ import unittest
 import logging
 import tempfile
 import os
+import io
 from six import PY2, PY3
 
 # Third party modules.
 from nose.plugins.skip import SkipTest
+import numpy as np
 
 # Local modules.
 from pySpectrumFileFormat import get_current_module_path
@@ -312,6 +314,77 @@ class TestEmsaWriter(unittest.TestCase):
         for expected, actual in zip(self.LINES, lines):
             self.assertEqual(expected, actual)
 
+class TestEmsaReaderDataBlock(unittest.TestCase):
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+
+        self.reader = emsa.EmsaReader()
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+
+    def _read(self, lines):
+        return self.reader.read(io.StringIO(u"\r\n".join(lines) + u"\r\n"))
+
+    def testskeleton(self):
+        self.assertTrue(True)
+
+    def test_find_data_block(self):
+        text = "#NPOINTS     : 2\n#spectrum    : Spectral Data Starts Here\n1, 2\n3, 4\n#ENDOFDATA   :\n"
+        start, end = self.reader._find_data_block(text)
+        self.assertEqual("1, 2\n3, 4\n", text[start:end])
+
+        self.assertEqual(None, self.reader._find_data_block("#NPOINTS     : 2\n1, 2\n"))
+        self.assertEqual(None, self.reader._find_data_block("#SPECTRUM    :\n1, 2\n"))
+
+    def test_read_xy(self):
+        lines = [line for line in TestEmsaWriter.LINES if not line.startswith('#CHECKSUM')]
+        spectrum = self._read(lines)
+
+        self.assertEqual(np.float64, spectrum.xdata.dtype)
+        self.assertEqual(np.float64, spectrum.ydata.dtype)
+        np.testing.assert_array_equal([0, 1, 2, 3, 4], spectrum.xdata)
+        np.testing.assert_array_equal([10, 20, 30, 40, 50], spectrum.ydata)
+        self.assertEqual(5, spectrum.header.npoints)
+        self.assertEqual("Test EMSA file", spectrum.header.title)
+
+    def test_read_y(self):
+        lines = [line for line in TestEmsaWriter.LINES if not line.startswith('#CHECKSUM')]
+        lines[lines.index('#DATATYPE    : XY')] = '#DATATYPE    : Y'
+        lines[lines.index('#OFFSET      : 0')] = '#OFFSET      : -0.5'
+        start = lines.index('#SPECTRUM    : Spectral Data Starts Here') + 1
+        end = lines.index('#ENDOFDATA   :')
+        lines[start:end] = ['10, 20, 30', '40 50,']
+
+        spectrum = self._read(lines)
+
+        np.testing.assert_array_almost_equal([-0.5, 0.5, 1.5, 2.5, 3.5], spectrum.xdata)
+        np.testing.assert_array_equal([10, 20, 30, 40, 50], spectrum.ydata)
+
+    def test_read_xy_line_by_line(self):
+        lines = [line for line in TestEmsaWriter.LINES if not line.startswith('#CHECKSUM')]
+        start = lines.index('#SPECTRUM    : Spectral Data Starts Here') + 1
+        lines[start] = '0, 10, 100'
+
+        spectrum = self._read(lines)
+
+        np.testing.assert_array_equal([0, 1, 2, 3, 4], spectrum.xdata)
+        np.testing.assert_array_equal([10, 20, 30, 40, 50], spectrum.ydata)
+
+    def test_read_invalid_value(self):
+        lines = list(TestEmsaWriter.LINES)
+        start = lines.index('#SPECTRUM    : Spectral Data Starts Here') + 1
+        lines[start] = '0, ten'
+
+        self.assertRaises(ValueError, self._read, lines)
+
+    def test_read_bad_checksum(self):
+        lines = list(TestEmsaWriter.LINES)
+        lines[-1] = '#CHECKSUM    : 1234'
+
+        self.assertRaises(IOError, self._read, lines)
+
 if __name__ == '__main__':  # pragma: no cover
     import nose
     nose.runmodule()
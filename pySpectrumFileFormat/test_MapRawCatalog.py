@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+.. py:currentmodule:: pySpectrumFileFormat.test_MapRawCatalog
+   :synopsis: Tests for the module :py:mod:`pySpectrumFileFormat.MapRawCatalog`
+
+.. moduleauthor:: Hendrix Demers <hendrix.demers@mail.mcgill.ca>
+
+Tests for the module :py:mod:`pySpectrumFileFormat.MapRawCatalog`.
+"""
+
+###############################################################################
+# Copyright 2012 Hendrix Demers
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+###############################################################################
+
+# Standard library modules.
+import unittest
+import tempfile
+import shutil
+import os
+
+# Third party modules.
+import numpy as np
+
+# Local modules.
+
+# Project modules.
+import pySpectrumFileFormat.MapRawCatalog as MapRawCatalog
+import pySpectrumFileFormat.Bruker.MapRaw.ParametersFile as BrukerParametersFile
+import pySpectrumFileFormat.OxfordInstruments.MapRaw.ParametersFile as OxfordParametersFile
+from pySpectrumFileFormat.Bruker.MapRaw.MapRawTestCase import createMapRawFile as createBrukerMapRawFile
+from pySpectrumFileFormat.OxfordInstruments.MapRaw.test_MapRawFormat import \
+    createMapRawFile as createOxfordMapRawFile
+
+# Globals and constants variables.
+
+class TestMapRawCatalog(unittest.TestCase):
+    """
+    TestCase class for the module `MapRawCatalog`.
+    """
+
+    def setUp(self):
+        """
+        Setup method.
+        """
+
+        unittest.TestCase.setUp(self)
+
+        self.path = tempfile.mkdtemp()
+        self.mapsPath = os.path.join(self.path, "maps")
+        os.makedirs(os.path.join(self.mapsPath, "bruker", "sub"))
+        os.makedirs(os.path.join(self.mapsPath, "oxford"))
+
+        datacube = np.zeros((3, 2, 5), dtype=np.uint16)
+        createBrukerMapRawFile(os.path.join(self.mapsPath, "bruker", "map1.raw"), datacube,
+                               BrukerParametersFile.RECORED_BY_VECTOR)
+        createBrukerMapRawFile(os.path.join(self.mapsPath, "bruker", "sub", "map2.raw"), np.zeros((4, 4, 8), np.uint8),
+                               BrukerParametersFile.RECORED_BY_IMAGE)
+        createOxfordMapRawFile(os.path.join(self.mapsPath, "oxford", "Project 1.raw"), datacube.astype(np.int16))
+
+        self.catalog = MapRawCatalog.MapRawCatalog(os.path.join(self.path, "catalog.sqlite"), workers=2)
+
+    def tearDown(self):
+        """
+        Teardown method.
+        """
+
+        unittest.TestCase.tearDown(self)
+
+        self.catalog.close()
+        shutil.rmtree(self.path)
+
+    def testSkeleton(self):
+        """
+        First test to check if the testcase is working with the testing framework.
+        """
+
+        #self.fail("Test if the testcase is working.")
+        self.assertTrue(True)
+
+    def test_parseParameters(self):
+        filepath = os.path.join(self.mapsPath, "bruker", "map1.rpl")
+        with open(filepath, 'r') as parametersFile:
+            entry = MapRawCatalog.parseParameters(parametersFile)
+        parameters = BrukerParametersFile.ParametersFile()
+        parameters.read(filepath)
+
+        self.assertEqual(MapRawCatalog.FORMAT_BRUKER, entry["format"])
+        self.assertEqual((parameters.width, parameters.height, parameters.depth), (2, 3, 5))
+        self.assertEqual(parameters.width, entry["width"])
+        self.assertEqual(parameters.height, entry["height"])
+        self.assertEqual(parameters.depth, entry["depth"])
+        self.assertEqual(parameters.offset, entry["offset"])
+        self.assertEqual(parameters.dataLength_B, entry["dataLength_B"])
+        self.assertEqual(parameters.dataType, entry["dataType"])
+        self.assertEqual(parameters.byteOrder, entry["byteOrder"])
+        self.assertEqual(parameters.recordBy, entry["recordBy"])
+        self.assertEqual(parameters.energy_keV, entry["energy_keV"])
+        self.assertEqual(parameters.pixel_size_nm, entry["pixelSize_nm"])
+
+        filepath = os.path.join(self.mapsPath, "oxford", "Project 1.rpl")
+        with open(filepath, 'r') as parametersFile:
+            entry = MapRawCatalog.parseParameters(parametersFile)
+        parameters = OxfordParametersFile.ParametersFile()
+        parameters.read(filepath)
+
+        self.assertEqual(MapRawCatalog.FORMAT_OXFORD_INSTRUMENTS, entry["format"])
+        self.assertEqual(parameters.width, entry["width"])
+        self.assertEqual(parameters.height, entry["height"])
+        self.assertEqual(parameters.depth, entry["depth"])
+        self.assertEqual(parameters.dataLength_B, entry["dataLength_B"])
+        self.assertEqual(parameters.dataType.lower(), entry["dataType"])
+        self.assertEqual(parameters.byteOrder.lower(), entry["byteOrder"])
+        self.assertEqual(parameters.recordBy, entry["recordBy"])
+        self.assertFalse("energy_keV" in entry)
+
+    def test_scan(self):
+        self.assertEqual((3, 0, 0), self.catalog.scan(self.mapsPath))
+        self.assertEqual(3, len(self.catalog))
+
+        # Nothing changed.
+        self.assertEqual((0, 0, 0), self.catalog.scan(self.mapsPath))
+
+        # A changed raw file, a new map and a removed map.
+        rawFilepath = os.path.join(self.mapsPath, "bruker", "map1.raw")
+        with open(rawFilepath, 'ab') as rawFile:
+            rawFile.write(b"\0")
+        createBrukerMapRawFile(os.path.join(self.mapsPath, "bruker", "map3.raw"), np.zeros((1, 1, 2), np.uint16),
+                               BrukerParametersFile.RECORED_BY_VECTOR)
+        os.remove(os.path.join(self.mapsPath, "oxford", "Project 1.rpl"))
+
+        self.assertEqual((1, 1, 1), self.catalog.scan(self.mapsPath))
+        self.assertEqual(3, len(self.catalog))
+
+        entries = self.catalog.query(parametersFilepath=os.path.abspath(rawFilepath.replace(".raw", ".rpl")))
+        self.assertEqual(2*3*5*2 + 1, entries[0]["rawSize_B"])
+        self.assertEqual(os.path.abspath(rawFilepath), entries[0]["rawFilepath"])
+
+        # A scan of another directory keeps the entries outside of it.
+        self.assertEqual((0, 0, 0), self.catalog.scan(os.path.join(self.mapsPath, "oxford")))
+        self.assertEqual(3, len(self.catalog))
+
+    def test_scanNotRecursive(self):
+        self.assertEqual((1, 0, 0), self.catalog.scan([os.path.join(self.mapsPath, "bruker")], recursive=False))
+        self.assertEqual((1, 0, 0), self.catalog.scan([os.path.join(self.mapsPath, "bruker", "sub")]))
+        self.assertEqual((0, 0, 0), self.catalog.scan([os.path.join(self.mapsPath, "bruker")], recursive=False))
+        self.assertEqual(2, len(self.catalog))
+
+    def test_query(self):
+        self.catalog.scan([self.mapsPath])
+
+        entries = self.catalog.query(format=MapRawCatalog.FORMAT_OXFORD_INSTRUMENTS)
+        self.assertEqual(1, len(entries))
+        self.assertEqual("Project 1.rpl", os.path.basename(entries[0]["parametersFilepath"]))
+        self.assertEqual(None, entries[0]["energy_keV"])
+
+        entries = self.catalog.query(energy_keV=20.0, orderBy="width")
+        self.assertEqual([2, 4], [entry["width"] for entry in entries])
+
+        entries = self.catalog.query(depth=(6, None), dataType="unsigned")
+        self.assertEqual(1, len(entries))
+        self.assertEqual(8, entries[0]["depth"])
+        self.assertEqual(1, entries[0]["dataLength_B"])
+
+        self.assertEqual(0, len(self.catalog.query(width=(3, 3))))
+        self.assertEqual(1, len(self.catalog.query(energy_keV=None)))
+        self.assertRaises(ValueError, self.catalog.query, unknown=1)
+        self.assertRaises(ValueError, self.catalog.query, orderBy="width; DROP TABLE maps")
+
+        self.catalog.remove(entries[0]["parametersFilepath"])
+        self.assertEqual(2, len(self.catalog))
+
+if __name__ == '__main__':  # pragma: no cover
+    import nose
+    nose.runmodule()